@@ -2,17 +2,28 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import hashlib
+import importlib.util
 import json
 from projectwise.utils.logger import get_logger
 import re
-from copy import deepcopy
+import time
+from collections import OrderedDict
 from json import JSONDecodeError
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Set, Tuple, Optional
 
 from projectwise.services.mcp.adapter import ToolExecutor, MCPToolAdapter
 
+# JSON cepat (opsional): orjson bila tersedia, fallback ke json stdlib
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
 # Lib LLM
-from openai import AsyncOpenAI, BadRequestError, APIConnectionError
+import httpx
+from openai import AsyncOpenAI, BadRequestError, APIConnectionError, APITimeoutError
 
 # Opsional (jika integrasi ke Quart)
 try:
@@ -23,6 +34,7 @@ except Exception:  # pragma: no cover
 # Pydantic v2 untuk structured output
 # try:
 from pydantic import BaseModel, Field, ConfigDict
+from pydantic_core import from_json
 # except Exception:  # pragma: no cover
 #     # fallback minimal (tidak ideal, tapi agar file tetap dapat diimpor)
 #     class BaseModel:  # type: ignore
@@ -49,23 +61,70 @@ from pydantic import BaseModel, Field, ConfigDict
 # =========================
 # Logger sederhana (Indonesia)
 # =========================
-from projectwise.config import ServiceConfigs
+from projectwise.config import ServiceConfigs, get_service_configs
 
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
 
-try:
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> ServiceConfigs:
+    """ServiceConfigs dibaca sekali, saat pertama dibutuhkan (bukan saat import)."""
+    return get_service_configs()
+
+
+# =========================
+# Shared LLM client (satu connection pool untuk semua Actor/Critic/Planner)
+# Dibuat lazy: import modul ini tidak membuat client/pool apa pun.
+# =========================
+@functools.lru_cache(maxsize=1)
+def _shared_httpx() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        # HTTP/2 butuh paket `h2`; tanpa itu tetap keep-alive via HTTP/1.1
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0
+        ),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_client() -> AsyncOpenAI:
+    """AsyncOpenAI bersama; base_url hanya dipakai untuk model non-GPT."""
+    settings = get_settings()
     if str(settings.llm_model).lower().startswith("gpt"):
-        AsyncOpenAI(api_key=settings.llm_api_key)
-    else:
-        AsyncOpenAI(base_url=settings.llm_base_url, api_key=settings.llm_api_key)
-except Exception as e:
-    logger.exception(
-        "Gagal inisialisasi AsyncOpenAI (cek LLM_API_KEY / base_url): %s", e
+        return AsyncOpenAI(api_key=settings.llm_api_key, http_client=_shared_httpx())
+    return AsyncOpenAI(
+        base_url=settings.llm_base_url,
+        api_key=settings.llm_api_key,
+        http_client=_shared_httpx(),
     )
 
 
+@functools.lru_cache(maxsize=1)
+def llm_semaphore() -> asyncio.Semaphore:
+    """Batas panggilan LLM bersamaan (lindungi connection pool bersama saat burst)."""
+    return asyncio.Semaphore(get_settings().llm_max_concurrency or 16)
+
+
+async def aclose_shared_llm() -> None:
+    """Tutup connection pool LLM bersama (dipanggil saat app berhenti)."""
+    if _shared_httpx.cache_info().currsize:
+        await _shared_httpx().aclose()
+    get_llm_client.cache_clear()
+    _shared_httpx.cache_clear()
+    llm_semaphore.cache_clear()
+
+
+def _register_llm_shutdown(app: Quart) -> None:  # type: ignore
+    """Daftarkan penutupan pool LLM ke `after_serving` (sekali per app)."""
+    if app.extensions.get("agent_llm_shutdown"):
+        return
+    app.extensions["agent_llm_shutdown"] = True
+    app.after_serving(aclose_shared_llm)
+
+
 # =========================
 # Skema Pydantic (Critic & Planner)
 # =========================
@@ -113,9 +172,15 @@ class ToolPlan(BaseModel):
     notes: str | None = None
 
 
+# Serializer core (pydantic-core) untuk CriticFeedback; lewati wrapper model_dump_json
+CRITIC_DUMPER = CriticFeedback.__pydantic_serializer__.to_json
+
+
 # ============================================================
 # Prompt instructions (Actor / Critic / Context)
 # ============================================================
+# Prompt statis di-memo: string identik per panggilan (prefix stabil untuk prompt cache)
+@functools.lru_cache(maxsize=1)
 def ACTOR_SYSTEM() -> str:
     """
     Sistem prompt untuk Actor:
@@ -131,6 +196,7 @@ def ACTOR_SYSTEM() -> str:
     )
 
 
+@functools.lru_cache(maxsize=1)
 def CRITIC_SYSTEM() -> str:
     """
     Sistem prompt untuk Critic:
@@ -146,6 +212,7 @@ def CRITIC_SYSTEM() -> str:
     )
 
 
+@functools.lru_cache(maxsize=1)
 def PROMPT_USER_CONTEXT() -> str:
     """
     Instruksi pembentuk konteks (brief memori) agar Actor paham latar belakang user.
@@ -161,82 +228,235 @@ def PROMPT_USER_CONTEXT() -> str:
 # ============================================================
 # Utilitas umum (Indonesia)
 # ============================================================
+def dumps_bytes(x: Any, *, sort_keys: bool = False) -> bytes:
+    """Serialisasi JSON ke bytes UTF-8 (orjson bila ada)."""
+    if orjson is not None:
+        opt = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(x, option=opt)
+    return json.dumps(x, ensure_ascii=False, sort_keys=sort_keys).encode()
+
+
+def dumps_json(x: Any, *, sort_keys: bool = False) -> str:
+    """Serialisasi JSON ke str (pengganti json.dumps(..., ensure_ascii=False))."""
+    return dumps_bytes(x, sort_keys=sort_keys).decode()
+
+
+def loads_json(s: str | bytes) -> Any:
+    """Parse JSON (orjson bila ada). Error tetap turunan json.JSONDecodeError."""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+
 def truncate_args(x: Any, limit: int = 300) -> str:
     """Potong string untuk logging agar tidak membludak."""
-    s = x if isinstance(x, str) else json.dumps(x, ensure_ascii=False)
-    return s if len(s) <= limit else s[:limit] + "…"
+    if isinstance(x, str):
+        return x if len(x) <= limit else x[:limit] + "…"
+    # Potong di level bytes; decode hanya bagian yang dipakai
+    b = dumps_bytes(x)
+    if len(b) <= limit:
+        return b.decode()
+    return b[:limit].decode("utf-8", "ignore") + "…"
+
+
+class LazyTruncate:
+    """
+    Argumen logging yang baru diserialisasi/dipotong saat record benar-benar
+    diformat: bila level log tidak aktif, tidak ada biaya JSON sama sekali.
+    """
+
+    __slots__ = ("x", "limit")
+
+    def __init__(self, x: Any, limit: int = 300) -> None:
+        self.x = x
+        self.limit = limit
+
+    def __str__(self) -> str:
+        return truncate_args(self.x, self.limit)
+
+
+_JSON_TYPES = (str, int, float, bool, type(None))
 
 
 def to_jsonable(x: Any) -> Any:
-    """Ubah objek ke bentuk JSON-able secara defensif."""
+    """Ubah objek ke bentuk JSON-able secara defensif (dispatch per tipe)."""
+    if isinstance(x, _JSON_TYPES):
+        return x
+    if isinstance(x, dict):
+        return {k: to_jsonable(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple, set)):
+        return [to_jsonable(v) for v in x]
+    # Tipe tak dikenal: probe terakhir, fallback repr
     try:
-        json.dumps(x)  # cepat cek
+        dumps_bytes(x)
         return x
     except Exception:
-        # fallback: repr untuk tipe yang tidak serializable
-        if isinstance(x, dict):
-            return {k: to_jsonable(v) for k, v in x.items()}
-        if isinstance(x, (list, tuple, set)):
-            return [to_jsonable(v) for v in x]
         return repr(x)
 
 
-def find_duplicates(items: List[str]) -> List[str]:
-    """Cari duplikat (case-insensitive) untuk validasi nama tool."""
-    seen, dup = set(), []
-    for it in items:
-        if it in seen and it not in dup:
-            dup.append(it)
-        seen.add(it)
-    return dup
+_EXPLICIT_VERBS = r"(?:izinkan|setujui|jalankan|eksekusi|execute|run|pakai|gunakan)\s+(?:tool|alat|fungsi)?"
+_EXPLICIT_PAT = re.compile(_EXPLICIT_VERBS, re.IGNORECASE)
 
+# Penanda "user eksplisit secara umum" (kata kerja eksplisit tanpa menyebut nama tool)
+_ANY_TOOL = "*"
 
-_EXPLICIT_PAT = re.compile(
-    r"(izinkan|setujui|jalankan|eksekusi|execute|run|pakai|gunakan)\s+(tool|alat|fungsi)?",
+# Memo matcher per registry: (key registry, pattern, map lower->nama tool)
+_explicit_memo: Optional[Tuple[Tuple[int, int], "re.Pattern[str]", Dict[str, str]]] = None
+
+
+# Penanda deskripsi tool yang hanya boleh dijalankan atas permintaan eksplisit user
+_EXPLICIT_DESC_RE = re.compile(
+    r"only if user expli[cs]it ask|requires explicit|explicitly requested",
     re.IGNORECASE,
 )
 
 
-def contains_explicit_intent(user_prompt: str, tool_name: str) -> bool:
+def build_explicit_matcher(
+    tools_registry: Dict[str, Dict[str, Any]],
+) -> Tuple["re.Pattern[str]", Dict[str, str]]:
+    """
+    Satu regex gabungan: kata kerja eksplisit | semua nama tool (terpanjang dulu).
+    Di-memo per registry (id + set nama) agar tidak dikompilasi ulang tiap turn.
     """
-    Deteksi sinyal eksplisit dari user untuk menjalankan tool sensitif.
-    Heuristik: cari kata kerja eksplisit atau sebutan tool-name.
+    global _explicit_memo
+    key = (id(tools_registry), hash(tuple(sorted(tools_registry))))
+    if _explicit_memo is not None and _explicit_memo[0] == key:
+        return _explicit_memo[1], _explicit_memo[2]
+
+    names = {n.lower(): n for n in tools_registry if n}
+    alt = "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+    # Lookahead untuk nama tool supaya nama yang saling tumpang-tindih tetap terdeteksi
+    pattern = f"(?P<verb>{_EXPLICIT_VERBS})"
+    if alt:
+        pattern += f"|(?=(?P<tool>{alt}))"
+    matcher = re.compile(pattern, re.IGNORECASE)
+    _explicit_memo = (key, matcher, names)
+    return matcher, names
+
+
+def contains_explicit_intent(
+    user_prompt_lower: str,
+    explicit_matcher: "re.Pattern[str]",
+    names: Optional[Dict[str, str]] = None,
+) -> Set[str]:
     """
-    up = user_prompt or ""
-    if tool_name and tool_name.lower() in up.lower():
-        return True
-    return bool(_EXPLICIT_PAT.search(up))
+    Deteksi sinyal eksplisit dari user untuk menjalankan tool sensitif, sekali scan.
+    Kembalikan nama tool yang disebut user; berisi _ANY_TOOL bila ada kata kerja eksplisit.
+    """
+    hits: Set[str] = set()
+    for m in explicit_matcher.finditer(user_prompt_lower or ""):
+        if m.group("verb"):
+            hits.add(_ANY_TOOL)
+        elif "tool" in explicit_matcher.groupindex and m.group("tool"):
+            t = m.group("tool")
+            hits.add((names or {}).get(t, t))
+    return hits
 
 
-def validate_tool_args(schema: Dict[str, Any], args: Dict[str, Any]) -> Dict[str, Any]:
+def is_explicit_for(hits: Set[str], tool_name: str) -> bool:
+    """True bila user menyebut tool ini atau memberi perintah eksplisit umum."""
+    return _ANY_TOOL in hits or tool_name in hits
+
+
+class MissingToolArgsError(ValueError):
+    """Argumen wajib tool tidak lengkap; pesan baru diformat saat dibaca."""
+
+    def __init__(self, missing: List[str]) -> None:
+        super().__init__(missing)
+        self.missing = missing
+
+    def __str__(self) -> str:
+        return f"Argumen kurang: {self.missing}"
+
+
+def _coerce_untyped(v: str) -> Any:
+    """Nilai args_kv tanpa tipe di schema: coba JSON, lalu angka/bool, lalu string."""
+    try:
+        return loads_json(v)
+    except Exception:
+        # jika angka/bool diserialisasi sebagai string, boleh konversi kecil
+        if v.isdigit():
+            return int(v)
+        if v.replace(".", "", 1).isdigit() and v.count(".") < 2:
+            try:
+                return float(v)
+            except Exception:
+                return v
+        if v.lower() in ("true", "false"):
+            return v.lower() == "true"
+        return v
+
+
+def _typed(conv: Callable[[str], Any]) -> Callable[[str], Any]:
+    def _coerce(v: str) -> Any:
+        try:
+            return conv(v)
+        except (TypeError, ValueError):
+            return _coerce_untyped(v)
+
+    return _coerce
+
+
+# Konversi args_kv (string) sesuai tipe JSON Schema properti
+_ARG_COERCERS: Dict[str, Callable[[str], Any]] = {
+    "string": str,
+    "integer": _typed(int),
+    "number": _typed(float),
+    "boolean": lambda v: v.strip().lower() == "true",
+}
+
+
+def compile_arg_coercers(schema: Any) -> Dict[str, Callable[[str], Any]]:
+    """Peta {nama_properti: konverter} dari schema tool (dihitung sekali per tool)."""
+    props = schema.get("properties") if isinstance(schema, dict) else None
+    if not isinstance(props, dict):
+        return {}
+    out: Dict[str, Callable[[str], Any]] = {}
+    for k, spec in props.items():
+        t = spec.get("type") if isinstance(spec, dict) else None
+        conv = _ARG_COERCERS.get(t) if isinstance(t, str) else None
+        if conv is not None:
+            out[k] = conv
+    return out
+
+
+ArgsValidator = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def compile_tool_args_validator(schema: Any) -> ArgsValidator:
     """
-    Validasi argumen terhadap schema 'type: object'.
+    Kompilasi schema 'type: object' sekali menjadi validator siap pakai:
     - Cek 'required'
     - Hormati 'additionalProperties: false' (jika ada): buang key tak dikenal
     - Kembalikan args ter-filter
     """
-    args = args or {}
-    if not isinstance(schema, dict):
-        return args
-
-    if schema.get("type") != "object":
-        return args
+    if not isinstance(schema, dict) or schema.get("type") != "object":
+        return lambda args: args or {}
+
+    required = tuple(schema.get("required") or ())
+    props = (
+        frozenset(schema.get("properties") or ())
+        if schema.get("additionalProperties", True) is False
+        else None
+    )
 
-    props = schema.get("properties", {}) or {}
-    required = schema.get("required", []) or []
-    addl = schema.get("additionalProperties", True)
+    def _validate(args: Dict[str, Any]) -> Dict[str, Any]:
+        args = args or {}
+        # cek required (jalur umum: semua ada → tanpa alokasi list)
+        for k in required:
+            if k not in args:
+                raise MissingToolArgsError([r for r in required if r not in args])
+        # filter additionalProperties=false
+        if props is not None:
+            return {k: v for k, v in args.items() if k in props}
+        return dict(args)
 
-    # cek required
-    missing = [k for k in required if k not in args]
-    if missing:
-        raise ValueError(f"Argumen kurang: {missing}")
+    return _validate
 
-    # filter additionalProperties=false
-    result = dict(args)
-    if addl is False:
-        result = {k: v for k, v in result.items() if k in props}
 
-    return result
+def validate_tool_args(schema: Dict[str, Any], args: Dict[str, Any]) -> Dict[str, Any]:
+    """Validasi sekali pakai; jalur panas memakai registry[name]["validator"]."""
+    return compile_tool_args_validator(schema)(args)
 
 
 async def build_context_blocks_memory(
@@ -250,35 +470,46 @@ async def build_context_blocks_memory(
 ) -> str:
     """
     Bangun ringkas konteks memori dari LTM + STM (defensif bila service tidak tersedia).
-    - Harapannya: short_term/long_term punya API async untuk fetch data.
-    - Jika tidak, tetap kembalikan string ringkas agar Actor tidak buta konteks.
+    - LTM: long_term.get_memories(query, user_id, limit); STM: short_term.get_history.
+    - Bila gagal/kosong, tetap kembalikan string ringkas agar Actor tidak buta konteks.
     """
-    lt_snips: List[str] = []
-    st_snips: List[str] = []
 
-    # Ambil long-term memory (defensif)
-    try:
-        # Misal: long_term.search_async(user_id, query, k=5)
-        # Di sini gunakan heuristik sederhana saja.
-        lt_snips = [user_message] * 3  # placeholder ringkas agar tidak kosong
-    except Exception:
-        pass
-
-    # Ambil short-term (defensif)
-    try:
-        # Misal: short_term.get_recent_dialogue(user_id, limit=max_history)
-        # Kita isi placeholder jika tidak ada API
-        st_snips = ["- (riwayat singkat tidak tersedia)"]
-    except Exception:
-        st_snips = ["- (riwayat singkat tidak tersedia)"]
-
-    text = (
+    async def _fetch_lt() -> List[str]:
+        if long_term is None:
+            return []
+        try:
+            return await long_term.get_memories(user_message, user_id=user_id, limit=5)
+        except Exception as e:
+            logger.warning("Ambil long-term memory gagal: %s", e)
+            return []
+
+    async def _fetch_st() -> List[Dict[str, Any]]:
+        if short_term is None:
+            return []
+        try:
+            return await short_term.get_history(user_id, limit=max_history)
+        except Exception as e:
+            logger.warning("Ambil short-term history gagal: %s", e)
+            return []
+
+    # LTM & STM diambil paralel (tiap fetch sudah defensif, TaskGroup tidak batal)
+    async with asyncio.TaskGroup() as tg:
+        t_lt = tg.create_task(_fetch_lt())
+        t_st = tg.create_task(_fetch_st())
+
+    # Urutan deterministik: peringkat search (skor menurun), duplikat dibuang,
+    # agar string konteks identik selama data tidak berubah (prompt cache hit)
+    lt_snips = list(dict.fromkeys(s for s in t_lt.result() if s))
+    st_snips = [f"- {m['role']}: {m['content']}" for m in t_st.result()]
+
+    lt_block = "\n".join(f"- {s}" for s in lt_snips) or "- (tidak ada memori relevan)"
+    st_block = "\n".join(st_snips) or "- (riwayat singkat tidak tersedia)"
+    return (
         f"{prompt_instruction}\n"
         "### Briefing Memori\n"
-        f"**Long_Term Memory (relevan):**\n- " + "\n- ".join(lt_snips) + "\n\n"
-        "**Short_Term History (ringkas):**\n" + "\n".join(st_snips)
+        f"**Long_Term Memory (relevan):**\n{lt_block}\n\n"
+        f"**Short_Term History (ringkas):**\n{st_block}"
     )
-    return text
 
 
 # ============================================================
@@ -341,29 +572,34 @@ def normalize_mcp_tools(
         return tools_for_openai, {}
 
     registry: Dict[str, Dict[str, Any]] = {}
-
-    for idx, t in enumerate(tools_for_openai):
-        raw = t
-        func = raw.get("function") or {}
-        name = (raw.get("name") or func.get("name") or "").strip()
+    # Dedup case-insensitive dalam satu pass: nama casefold → index pertama
+    seen_folded: Dict[str, int] = {}
+
+    for idx, raw in enumerate(tools_for_openai):
+        get = raw.get
+        func = get("function") or {}
+        fget = func.get
+        name = (get("name") or fget("name") or "").strip()
         if not name:
             raise ValueError(f"Tool pada index {idx} tidak memiliki 'name'.")
 
-        desc = (raw.get("description") or func.get("description") or "").strip()
+        key = name.casefold()
+        first = seen_folded.setdefault(key, idx)
+        if first != idx:
+            raise ValueError(
+                f"Duplicate tool name terdeteksi (case-insensitive): {name!r} "
+                f"(index {first} dan {idx})"
+            )
+
+        desc = (get("description") or fget("description") or "").strip()
         params_raw = (
-            raw.get("parameters")
-            or func.get("parameters")
-            or raw.get("inputSchema")  # legacy
+            get("parameters")
+            or fget("parameters")
+            or get("inputSchema")  # legacy
             or {}
         )
-        strict_flag = bool(raw.get("strict", False))
-        lower_desc = desc.lower()
-        need_explicit = (
-            "only if user explisit ask" in lower_desc
-            or "only if user explicit ask" in lower_desc
-            or "requires explicit" in lower_desc
-            or "explicitly requested" in lower_desc
-        )
+        strict_flag = bool(get("strict", False))
+        need_explicit = _EXPLICIT_DESC_RE.search(desc) is not None
 
         registry[name] = {
             "name": name,
@@ -371,14 +607,11 @@ def normalize_mcp_tools(
             "strict": strict_flag,
             "need_explicit": need_explicit,
             "description": desc,
-            "raw": deepcopy(raw),
+            "raw": raw,  # referensi langsung; registry tidak memodifikasi raw
+            "validator": compile_tool_args_validator(params_raw),
+            "arg_coercers": compile_arg_coercers(params_raw),
         }
 
-    names = [t.get("name", "") for t in tools_for_openai]
-    dupes = find_duplicates([n.lower() for n in names])
-    if dupes:
-        raise ValueError(f"Duplicate tool name terdeteksi (case-insensitive): {dupes}")
-
     logger.info(
         "normalize_mcp_tools: %d tools diteruskan ke LLM; registry dibuat.",
         len(tools_for_openai),
@@ -386,6 +619,80 @@ def normalize_mcp_tools(
     return tools_for_openai, registry
 
 
+def build_tool_context(
+    mcp_tools: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]], str]:
+    """
+    normalize_mcp_tools + katalog teks untuk Critic.
+    Dipakai lewat MCPToolAdapter.get_tools_and_catalog agar hanya dihitung ulang
+    saat daftar tools MCP berubah.
+    """
+    tools, registry = normalize_mcp_tools(mcp_tools)
+    lines = []
+    for name, meta in registry.items():
+        params = meta.get("parameters_raw") or {}
+        req = ", ".join(params.get("required", []) or [])
+        flag = "EXPLICIT_ONLY" if meta.get("need_explicit") else "-"
+        lines.append(
+            f"- {name} :: {flag} | req: {req} | {meta.get('description', '')}"
+        )
+    return tools, registry, "DAFTAR TOOLS:\n" + "\n".join(lines)
+
+
+# Sistem prompt Planner: statis, selalu di depan (prefix cache-stable)
+_PLANNER_SYSTEM = (
+    "Anda adalah Planner. Susun rencana eksekusi tools MCP yang relevan.\n"
+    "KETENTUAN:\n"
+    "- Pakai HANYA tool yang ada di TOOLS_CATALOG.\n"
+    "- Pertimbangkan CRITIC_FEEDBACK (saran langkah & kandidat tools).\n"
+    "- Setiap langkah wajib memiliki 'step' (int mulai 1), 'tool_name', dan 'args_kv' (list pasangan {key, value}).\n"
+    "- 'value' pada args_kv adalah string; jika butuh tipe lain, string-kan (misal JSON-string).\n"
+    "- Maksimum 5 langkah.\n"
+    "- KELUARKAN HANYA JSON sesuai schema ToolPlan."
+)
+
+
+# ============================================================
+# Cache ToolPlan (exact-match, TTL + LRU)
+# ============================================================
+class _PlanCache:
+    """
+    Cache ToolPlan berbasis hash prompt Planner (system + user, termasuk katalog
+    tools sehingga otomatis invalid saat registry berubah). Planner deterministik
+    (temperature=0.0) jadi input identik aman dijawab dari cache.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl_sec: float = 600.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl_sec
+        self._data: "OrderedDict[str, Tuple[float, ToolPlan]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(system: str, user: str) -> str:
+        return hashlib.blake2b((system + "\x00" + user).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[ToolPlan]:
+        hit = self._data.get(key)
+        if hit is None:
+            return None
+        expires, plan = hit
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return plan.model_copy(deep=True)
+
+    def put(self, key: str, plan: ToolPlan) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, plan.model_copy(deep=True))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+# Dipakai bersama semua instance LLMPlanner (satu per ReflectionActor)
+_PLAN_CACHE = _PlanCache()
+
+
 # ============================================================
 # LLM Planner (di file ini juga) — pakai text_format=ToolPlan
 # ============================================================
@@ -395,31 +702,36 @@ class LLMPlanner:
     - USER_PROMPT
     - CRITIC_FEEDBACK
     - TOOLS_CATALOG (daftar tools yang tersedia)
-    Output dipaksa ke skema ToolPlan via responses.parse(..., text_format=ToolPlan)
+    Output dipaksa ke skema ToolPlan via responses.stream(..., text_format=ToolPlan)
     """
 
-    def __init__(self, *, llm: AsyncOpenAI, model: str, timeout_sec: float) -> None:
-        self.llm = llm
+    def __init__(
+        self,
+        *,
+        llm: Optional[AsyncOpenAI] = None,
+        model: str,
+        timeout_sec: float,
+    ) -> None:
+        self.llm = llm or get_llm_client()
         self.model = model
         self.timeout = timeout_sec
+        # Memo katalog statis: (kunci registry, header TOOLS_CATALOG, prompt_cache_key)
+        self._catalog_memo: Optional[Tuple[Tuple[int, int], str, str]] = None
 
-    async def make_plan(
-        self,
-        *,
-        user_prompt: str,
-        critic: CriticFeedback,
-        tools_registry: Dict[str, Dict[str, Any]],
-    ) -> ToolPlan:
-        # Filter kandidat tools agar hanya yang tersedia
-        available = set(tools_registry.keys())
-        critic_filtered = critic.model_copy()
-        critic_filtered.candidate_tools = [
-            t for t in critic.candidate_tools if t in available
-        ]
+    def _catalog_header(
+        self, tools_registry: Dict[str, Dict[str, Any]]
+    ) -> Tuple[str, str]:
+        """
+        Bangun header TOOLS_CATALOG yang deterministik (urut nama, sort_keys) agar
+        prefix prompt identik antar-request dan prompt caching provider bisa hit.
+        Di-memo per registry (id + hash nama tools).
+        """
+        key = (id(tools_registry), hash(tuple(sorted(tools_registry))))
+        if self._catalog_memo and self._catalog_memo[0] == key:
+            return self._catalog_memo[1], self._catalog_memo[2]
 
-        # Susun katalog untuk prompt
         catalog = []
-        for name, meta in tools_registry.items():
+        for name, meta in sorted(tools_registry.items()):
             params = meta.get("parameters_raw") or {}
             req = ", ".join(params.get("required", []) or [])
             flag = "EXPLICIT_ONLY" if meta.get("need_explicit") else "-"
@@ -431,96 +743,204 @@ class LLMPlanner:
                     "desc": meta.get("description", ""),
                 }
             )
+        catalog_json = dumps_json(catalog, sort_keys=True)
+        header = f"TOOLS_CATALOG(JSON):\n{catalog_json}\n\n"
+        cache_key = hashlib.blake2b(catalog_json.encode()).hexdigest()[:16]
+        self._catalog_memo = (key, header, cache_key)
+        return header, cache_key
+
+    @staticmethod
+    def _emit_complete_items(
+        buf: str, emitted: int, on_item: Callable[[ToolPlanItem], None]
+    ) -> int:
+        """
+        Parse JSON parsial dan kirim item yang sudah pasti lengkap ke `on_item`.
+        Elemen terakhir `items` bisa jadi masih terpotong, jadi ditahan sampai
+        elemen berikutnya muncul (atau stream selesai).
+        """
+        try:
+            partial = from_json(buf, allow_partial=True)
+        except ValueError:
+            return emitted
+        items = partial.get("items") if isinstance(partial, dict) else None
+        if not isinstance(items, list):
+            return emitted
+        while emitted < len(items) - 1:
+            try:
+                item = ToolPlanItem.model_validate(items[emitted])
+            except Exception:
+                break
+            on_item(item)
+            emitted += 1
+        return emitted
+
+    async def _stream_plan(
+        self,
+        *,
+        system: str,
+        user: str,
+        cache_key: str,
+        on_item: Optional[Callable[[ToolPlanItem], None]],
+    ) -> ToolPlan:
+        emitted = 0
+        chunks: List[str] = []
+        async with self.llm.responses.stream(
+            model=self.model,
+            input=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            text_format=ToolPlan,  # <- sesuai instruksi user
+            temperature=0.0,
+            prompt_cache_key=cache_key,
+        ) as stream:
+            async for event in stream:
+                if on_item is None or event.type != "response.output_text.delta":
+                    continue
+                chunks.append(event.delta)
+                # Item baru hanya mungkin lengkap setelah ada penutup objek
+                if "}" in event.delta:
+                    emitted = self._emit_complete_items(
+                        "".join(chunks), emitted, on_item
+                    )
+            final = await stream.get_final_response()
+
+        plan: ToolPlan = final.output_parsed  # type: ignore
+        if on_item is not None:
+            for item in plan.items[emitted:]:
+                on_item(item)
+        return plan
 
-        system = (
-            "Anda adalah Planner. Susun rencana eksekusi tools MCP yang relevan.\n"
-            "KETENTUAN:\n"
-            "- Pakai HANYA tool yang ada di TOOLS_CATALOG.\n"
-            "- Pertimbangkan CRITIC_FEEDBACK (saran langkah & kandidat tools).\n"
-            "- Setiap langkah wajib memiliki 'step' (int mulai 1), 'tool_name', dan 'args_kv' (list pasangan {key, value}).\n"
-            "- 'value' pada args_kv adalah string; jika butuh tipe lain, string-kan (misal JSON-string).\n"
-            "- Maksimum 5 langkah.\n"
-            "- KELUARKAN HANYA JSON sesuai schema ToolPlan."
+    async def _bounded_stream_plan(self, **kwargs: Any) -> ToolPlan:
+        async with llm_semaphore(), asyncio.timeout(self.timeout):
+            return await self._stream_plan(**kwargs)
+
+    async def make_plan(
+        self,
+        *,
+        user_prompt: str,
+        critic: CriticFeedback,
+        tools_registry: Dict[str, Dict[str, Any]],
+        on_item: Optional[Callable[[ToolPlanItem], None]] = None,
+    ) -> ToolPlan:
+        """
+        Susun ToolPlan via streaming. Bila `on_item` diberikan, callback dipanggil
+        untuk setiap ToolPlanItem begitu selesai ter-decode (sebelum plan lengkap),
+        sehingga eksekusi tool bisa dimulai selagi sisa output masih di-stream.
+        """
+        # Filter kandidat tools agar hanya yang tersedia
+        available = set(tools_registry.keys())
+        critic_filtered = critic.model_copy(
+            update={
+                "candidate_tools": [t for t in critic.candidate_tools if t in available]
+            }
         )
 
+        # Field default/None tidak ikut dikirim → prompt lebih ringkas
+        critic_json = CRITIC_DUMPER(
+            critic_filtered, exclude_defaults=True, exclude_none=True
+        ).decode()
+
+        # Bagian statis (katalog tools) di depan, data volatil di belakang
+        catalog_header, cache_key = self._catalog_header(tools_registry)
+
+        system = _PLANNER_SYSTEM
+
         user = (
+            catalog_header
+            + "Jika ada tool yang relevan, buat minimal 1 langkah.\n"
+            'Contoh args_kv: [{"key":"query","value":"analisis proyek"},{"key":"k","value":"5"}]\n\n'
             f"USER_PROMPT:\n{user_prompt}\n\n"
-            f"CRITIC_FEEDBACK(JSON):\n{critic_filtered.model_dump_json()}\n\n"
-            f"TOOLS_CATALOG(JSON):\n{json.dumps(catalog, ensure_ascii=False)}\n\n"
-            "Jika ada tool yang relevan, buat minimal 1 langkah.\n"
-            'Contoh args_kv: [{"key":"query","value":"analisis proyek"},{"key":"k","value":"5"}]'
+            f"CRITIC_FEEDBACK(JSON):\n{critic_json}"
         )
 
-        try:
-            resp = await asyncio.wait_for(
-                self.llm.responses.parse(
-                    model=self.model,
-                    input=[
-                        {"role": "system", "content": system},
-                        {"role": "user", "content": user},
-                    ],
-                    text_format=ToolPlan,  # <- sesuai instruksi user
-                    temperature=0.0,
-                ),
-                timeout=self.timeout,
+        plan_key = _PlanCache.make_key(system, user)
+        cached = _PLAN_CACHE.get(plan_key)
+        if cached is not None:
+            logger.info("Planner cache hit (%d langkah).", len(cached.items))
+            if on_item is not None:
+                for item in cached.items:
+                    on_item(item)
+            return cached
+
+        # Spekulatif: varian "paksa minimal 1 langkah" jalan paralel sejak awal,
+        # dibatalkan bila rencana utama sudah berisi langkah
+        fallback: Optional[asyncio.Task] = None
+        if tools_registry:
+            user_retry = (
+                user + "\n\nPENTING: Buat setidaknya 1 langkah yang paling masuk akal."
             )
-            plan: ToolPlan = resp.output_parsed  # type: ignore
-            if not plan.items and catalog:
-                # Retry kecil untuk mendorong setidaknya 1 langkah
-                user_retry = (
-                    user
-                    + "\n\nPENTING: Buat setidaknya 1 langkah yang paling masuk akal."
+            fallback = asyncio.create_task(
+                self._bounded_stream_plan(
+                    system=system, user=user_retry, cache_key=cache_key, on_item=None
                 )
-                resp2 = await asyncio.wait_for(
-                    self.llm.responses.parse(
-                        model=self.model,
-                        input=[
-                            {"role": "system", "content": system},
-                            {"role": "user", "content": user_retry},
-                        ],
-                        text_format=ToolPlan,
-                        temperature=0.0,
-                    ),
-                    timeout=self.timeout,
-                )
-                plan = resp2.output_parsed  # type: ignore
+            )
+            # Hasil/error fallback yang tidak terpakai jangan jadi warning asyncio
+            fallback.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            plan = await self._bounded_stream_plan(
+                system=system, user=user, cache_key=cache_key, on_item=on_item
+            )
+            if not plan.items and fallback is not None:
+                plan = await fallback
+                if on_item is not None:
+                    for item in plan.items:
+                        on_item(item)
+            if plan.items:
+                _PLAN_CACHE.put(plan_key, plan)
             return plan
         except Exception:
             logger.exception("Planner gagal menyusun ToolPlan, kembalikan kosong.")
             return ToolPlan(
                 intent="execute_tools", items=[], notes="planner_fallback_empty"
             )
+        finally:
+            if fallback is not None and not fallback.done():
+                fallback.cancel()
 
 
 # ============================================================
 # Sanity-check batch input ke LLM (hindari error 400)
 # ============================================================
-def _assert_input_sane(msgs: List[Dict[str, Any]]) -> None:
+def _assert_input_sane(
+    msgs: List[Dict[str, Any]],
+    start: int = 0,
+    pending: Optional[Dict[str, int]] = None,
+) -> Dict[str, int]:
     """
     Pastikan setiap function_call_output punya pasangan function_call
     dengan call_id yang sama pada batch input yang sama.
+    Validasi bisa inkremental: mulai dari `start` dengan `pending`
+    (call_id -> indeks function_call yang belum dibalas) hasil panggilan sebelumnya.
     """
-    seen = set()
-    for i, m in enumerate(msgs):
-        t = m.get("type")
+    pending = {} if pending is None else pending
+    for i in range(start, len(msgs)):
+        t = msgs[i].get("type")
+        if t != "function_call" and t != "function_call_output":
+            continue
+        cid = msgs[i].get("call_id")
+        if not cid:
+            raise ValueError(f"messages[{i}] {t} tanpa call_id")
         if t == "function_call":
-            cid = m.get("call_id")
-            if not cid:
-                raise ValueError(f"messages[{i}] function_call tanpa call_id")
-            seen.add(cid)
-        elif t == "function_call_output":
-            cid = m.get("call_id")
-            if not cid:
-                raise ValueError(f"messages[{i}] function_call_output tanpa call_id")
-            if cid not in seen:
-                raise ValueError(
-                    f"messages[{i}] function_call_output tanpa pasangan function_call (call_id={cid})"
-                )
+            pending[cid] = i
+        elif pending.pop(cid, None) is None:
+            raise ValueError(
+                f"messages[{i}] function_call_output tanpa pasangan function_call (call_id={cid})"
+            )
+    return pending
 
 
 # ============================================================
 # ReflectionActor (Agentic Orchestrator)
 # ============================================================
+class FunctionCall(NamedTuple):
+    """Satu function_call dari output Responses API (tuple ringan, tanpa dict per call)."""
+
+    name: str
+    arguments: str
+    call_id: Optional[str]
+
+
 class ReflectionActor:
     """
     Orkestrator: Actor → (Tool Calls) → Critic → Planner → (Planner Exec) → Finalize.
@@ -538,8 +958,9 @@ class ReflectionActor:
         max_steps: int = 50,
         step_timeout_sec: float = 60.0,
         max_history: int = 20,
+        max_parallel_tools: int = 4,
     ) -> None:
-        self.llm = llm or AsyncOpenAI()
+        self.llm = llm or get_llm_client()
         self.model = llm_model
         self.long_term = long_term
         self.short_term = short_term
@@ -547,6 +968,16 @@ class ReflectionActor:
         self.executor = executor
         self.max_steps = max_steps
         self.step_timeout_sec = step_timeout_sec
+        # Planner stateless per-request (state lewat argumen make_plan) → cukup satu;
+        # memo katalognya juga bertahan antar-request
+        self.planner = LLMPlanner(
+            llm=self.llm, model=llm_model, timeout_sec=step_timeout_sec
+        )
+        # Batas eksekusi tool paralel dalam satu giliran LLM
+        self._tool_sem = asyncio.Semaphore(max_parallel_tools)
+        self.explicit_hits: Set[str] = set()
+        # Kursor validasi pairing: (list pesan terakhir, panjang tervalidasi, pending)
+        self._sane_cursor: Tuple[Optional[list], int, Dict[str, int]] = (None, 0, {})
 
     @classmethod
     def from_quart_app(
@@ -567,11 +998,12 @@ class ReflectionActor:
         long_term = app.extensions["long_term_memory"]  # type: ignore
         short_term = app.extensions["short_term_memory"]  # type: ignore
         executor = MCPToolAdapter(app)
+        _register_llm_shutdown(app)
 
         return cls(
             long_term=long_term,
             short_term=short_term,
-            llm=llm,
+            llm=llm or app.extensions.get("openai_client"),  # type: ignore
             llm_model=llm_model or service_configs.llm_model,
             executor=executor,
             max_history=max_history,
@@ -581,30 +1013,58 @@ class ReflectionActor:
     # Pembungkus panggilan Responses
     # -----------------------------
     async def _call_llm(
-        self, *, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]]
+        self,
+        *,
+        messages: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
     ):
         """
         Panggil Responses API dengan timeout & penanganan error manusiawi.
-        - Selalu jalankan _assert_input_sane agar batch valid.
+        - Selalu jalankan _assert_input_sane agar batch valid (hanya bagian
+          baru bila list pesan yang sama dipanggil ulang).
+        - Bila `on_token` diberikan: pakai responses.stream, teruskan tiap delta
+          teks ke callback, lalu kembalikan respons final (bentuk sama dengan create).
         """
         logger.debug(
             "Memanggil LLM: %d pesan, %d tools", len(messages), len(tools or [])
         )
-        _assert_input_sane(messages)
+        prev, checked, pending = self._sane_cursor
+        if prev is not messages or checked > len(messages):
+            checked, pending = 0, {}
+        self._sane_cursor = (None, 0, {})
+        pending = _assert_input_sane(messages, checked, pending)
+        self._sane_cursor = (messages, len(messages), pending)
         try:
-            return await asyncio.wait_for(
-                self.llm.responses.create(
+            if on_token is None:
+                # Timeout diserahkan ke httpx (per-request), tanpa timer asyncio
+                async with llm_semaphore():
+                    return await self.llm.responses.create(
+                        model=self.model,
+                        input=messages,  # type: ignore
+                        tools=tools,  # type: ignore
+                        timeout=self.step_timeout_sec,
+                    )
+            # Streaming: batas total generasi tetap via asyncio.timeout
+            async with llm_semaphore(), asyncio.timeout(self.step_timeout_sec):
+                async with self.llm.responses.stream(
                     model=self.model,
                     input=messages,  # type: ignore
                     tools=tools,  # type: ignore
-                ),
-                timeout=self.step_timeout_sec,
-            )
+                ) as stream:
+                    async for event in stream:
+                        if event.type == "response.output_text.delta":
+                            await on_token(event.delta)
+                    return await stream.get_final_response()
+        except APITimeoutError as e:
+            # Subclass APIConnectionError → harus ditangkap lebih dulu
+            logger.exception("Timeout saat memanggil LLM (responses.create).")
+            raise asyncio.TimeoutError(str(e)) from e
         except APIConnectionError:
             logger.error("Gagal koneksi ke LLM (APIConnectionError).")
             raise RuntimeError("Koneksi ke LLM bermasalah. Coba lagi sebentar.")
         except asyncio.TimeoutError:
-            logger.exception("Timeout saat memanggil LLM (responses.create).")
+            logger.exception("Timeout saat memanggil LLM (responses.stream).")
             raise
         except BadRequestError as e:
             msg = str(e)
@@ -632,21 +1092,16 @@ class ReflectionActor:
     # Ambil function_call dari respons
     # -----------------------------
     @staticmethod
-    def _iter_function_calls(response) -> List[Dict[str, Any]]:
+    def _iter_function_calls(response) -> List[FunctionCall]:
         """Ekstrak daftar function_call dari Responses API result: name, arguments, call_id."""
-        calls: List[Dict[str, Any]] = []
         output = getattr(response, "output", None)
-        if isinstance(output, list):
-            for it in output:
-                if getattr(it, "type", None) == "function_call":
-                    calls.append(
-                        {
-                            "name": getattr(it, "name", ""),
-                            "arguments": getattr(it, "arguments", "") or "{}",
-                            "call_id": getattr(it, "call_id", None),
-                        }
-                    )
-        return calls
+        if not isinstance(output, list):
+            return []
+        return [
+            FunctionCall(it.name, it.arguments or "{}", it.call_id)
+            for it in output
+            if getattr(it, "type", None) == "function_call"
+        ]
 
     @staticmethod
     def _safe_output_text(resp) -> str:
@@ -688,6 +1143,159 @@ class ReflectionActor:
         )
         logger.info("Balasan tool '%s' dikirim (paired dengan call_id).", name)
 
+    async def _answer_function_call(
+        self, fc: FunctionCall, registry: Dict[str, Dict[str, Any]]
+    ) -> str:
+        """
+        Guard explicit_only → validasi argumen → eksekusi tool.
+        Selalu kembalikan output JSON-string (tidak pernah raise) untuk
+        function_call_output dengan call_id yang sama.
+        """
+        name = fc.name
+        meta = registry.get(name) or {}
+
+        # Guard: explicit_only
+        if meta.get("need_explicit") and not is_explicit_for(self.explicit_hits, name):
+            logger.warning(
+                "Lewati tool %s: butuh permintaan eksplisit dari user.", name
+            )
+            return dumps_json(
+                {
+                    "ok": False,
+                    "error": "GUARDRAIL",
+                    "message": "Aksi ini hanya dijalankan jika pengguna secara eksplisit memintanya.",
+                },
+            )
+
+        # Validasi argumen
+        try:
+            args = loads_json(fc.arguments)
+        except JSONDecodeError:
+            logger.exception("Gagal decode JSON args untuk tool %s.", name)
+            args = {}
+
+        validator = meta.get("validator") or compile_tool_args_validator(
+            meta.get("parameters_raw") or meta.get("parameters_final")
+        )
+        try:
+            valid_args = validator(args)
+        except Exception:
+            logger.exception("Validasi argumen gagal untuk tool %s.", name)
+            return dumps_json(
+                {
+                    "ok": False,
+                    "error": "InvalidArguments",
+                    "message": "Schema validation failed.",
+                },
+            )
+
+        # Jalankan tool
+        try:
+            async with self._tool_sem, asyncio.timeout(self.step_timeout_sec):
+                result = await self.executor.call_tool(name, valid_args)
+            logger.info("Tool %s dieksekusi dengan sukses.", name)
+            return dumps_json({"ok": True, "result": to_jsonable(result)})
+        except asyncio.TimeoutError:
+            logger.exception("Timeout saat menjalankan tool %s.", name)
+            return dumps_json(
+                {
+                    "ok": False,
+                    "error": "Timeout",
+                    "message": f"Tool {name} melebihi {self.step_timeout_sec}s",
+                },
+            )
+        except Exception as e:
+            logger.exception("Gagal menjalankan tool %s.", name)
+            return dumps_json(
+                {"ok": False, "error": type(e).__name__, "message": str(e)},
+            )
+
+    async def _answer_function_calls(
+        self,
+        calls: List[FunctionCall],
+        messages: List[Dict[str, Any]],
+        registry: Dict[str, Dict[str, Any]],
+    ) -> None:
+        """
+        Eksekusi semua function_call satu giliran LLM secara paralel, lalu tambahkan
+        pasangan function_call + function_call_output sesuai urutan call semula.
+        """
+        outputs = await asyncio.gather(
+            *(self._answer_function_call(fc, registry) for fc in calls),
+            return_exceptions=True,
+        )
+        for fc, output in zip(calls, outputs):
+            if isinstance(output, BaseException):
+                output = dumps_json(
+                    {
+                        "ok": False,
+                        "error": type(output).__name__,
+                        "message": str(output),
+                    },
+                )
+            self._append_fc_reply(
+                messages,
+                call_id=fc.call_id,
+                name=fc.name,
+                args_raw=fc.arguments,
+                output_json_str=output,
+            )
+
+    def _prune_messages(
+        self,
+        messages: List[Dict[str, Any]],
+        *,
+        keep_head: int = 3,
+        max_tool_pairs: int = 8,
+        max_observations: int = 6,
+    ) -> None:
+        """
+        Sliding window in-place untuk riwayat Actor:
+        - `keep_head` pesan awal (system, konteks memori, prompt user) utuh
+        - hanya `max_tool_pairs` pasangan function_call/function_call_output terbaru
+          (pasangan selalu dibuang bersama agar pairing call_id tetap valid)
+        - hanya `max_observations` observasi [PLANNER_EXECUTED] terbaru
+        - hanya INSTRUKSI KRITIK terakhir
+        """
+        tail = messages[keep_head:]
+        pairs = obs = critiques = 0
+        keep: List[Dict[str, Any]] = []
+        # Telusuri dari belakang: yang terbaru diprioritaskan
+        for m in reversed(tail):
+            t = m.get("type")
+            if t == "function_call_output":
+                pairs += 1
+                if pairs > max_tool_pairs:
+                    continue
+            elif t == "function_call":
+                # ikut nasib output-nya (ditambahkan berurutan oleh _append_fc_reply)
+                if pairs > max_tool_pairs:
+                    continue
+            else:
+                content = m.get("content")
+                if isinstance(content, str):
+                    if content.startswith("[PLANNER_EXECUTED]"):
+                        obs += 1
+                        if obs > max_observations:
+                            continue
+                    elif content.startswith("INSTRUKSI KRITIK:"):
+                        critiques += 1
+                        if critiques > 1:
+                            continue
+            keep.append(m)
+
+        if len(keep) == len(tail):
+            return
+        keep.reverse()
+        messages[keep_head:] = keep
+        # Isi list berubah di tempat → validasi pairing harus mulai ulang
+        self._sane_cursor = (None, 0, {})
+        logger.info(
+            "Riwayat Actor dipangkas: %d → %d pesan.",
+            keep_head + len(tail),
+            len(messages),
+        )
+
     # -----------------------------
     # Helper: pastikan respons teks meski model masih memanggil tools
     # -----------------------------
@@ -715,95 +1323,8 @@ class ReflectionActor:
             if not calls:
                 break  # tidak ada tool call dan tetap kosong -> keluar
 
-            # Eksekusi semua tool yang diminta
-            for fc in calls:
-                name = fc["name"]
-                args_raw = fc["arguments"]
-                call_id = fc["call_id"]
-
-                # Guard explicit_only
-                # (pakai prompt awal user untuk deteksi intensi eksplisit)
-                if self.tools_registry.get(name, {}).get(
-                    "need_explicit"
-                ) and not contains_explicit_intent(self.last_user_prompt, name):  # type: ignore
-                    output = json.dumps(
-                        {
-                            "ok": False,
-                            "error": "GUARDRAIL",
-                            "message": "Aksi ini hanya dijalankan jika pengguna secara eksplisit memintanya.",
-                        },
-                        ensure_ascii=False,
-                    )
-                    self._append_fc_reply(
-                        messages,
-                        call_id=call_id,
-                        name=name,
-                        args_raw=args_raw,
-                        output_json_str=output,
-                    )
-                    continue
-
-                # Parse & validasi argumen
-                try:
-                    args = json.loads(args_raw or "{}")
-                except JSONDecodeError:
-                    args = {}
-                schema = (
-                    self.tools_registry[name].get("parameters_raw")  # type: ignore
-                    or {"type": "object", "properties": {}}
-                )
-                try:
-                    valid_args = validate_tool_args(schema, args)
-                except Exception:
-                    output = json.dumps(
-                        {
-                            "ok": False,
-                            "error": "InvalidArguments",
-                            "message": "Schema validation failed.",
-                        },
-                        ensure_ascii=False,
-                    )
-                    self._append_fc_reply(
-                        messages,
-                        call_id=call_id,
-                        name=name,
-                        args_raw=args_raw,
-                        output_json_str=output,
-                    )
-                    continue
-
-                # Eksekusi tool
-                try:
-                    result = await asyncio.wait_for(
-                        self.executor.call_tool(name, valid_args),
-                        timeout=self.step_timeout_sec,
-                    )
-                    output = json.dumps(
-                        {"ok": True, "result": to_jsonable(result)}, ensure_ascii=False
-                    )
-                except asyncio.TimeoutError:
-                    output = json.dumps(
-                        {
-                            "ok": False,
-                            "error": "Timeout",
-                            "message": f"Tool {name} melebihi {self.step_timeout_sec}s",
-                        },
-                        ensure_ascii=False,
-                    )
-                except Exception as e:
-                    output = json.dumps(
-                        {"ok": False, "error": type(e).__name__, "message": str(e)},
-                        ensure_ascii=False,
-                    )
-
-                # Kirim pasangan function_call + function_call_output
-                self._append_fc_reply(
-                    messages,
-                    call_id=call_id,
-                    name=name,
-                    args_raw=args_raw,
-                    output_json_str=output,
-                )
+            # Eksekusi semua tool yang diminta (paralel, urutan pairing dijaga)
+            await self._answer_function_calls(calls, messages, self.tools_registry)
 
             # Panggil ulang LLM setelah semua tool dibalas
             resp = await self._call_llm(messages=messages, tools=tools)
@@ -816,14 +1337,88 @@ class ReflectionActor:
     # -----------------------------
     # Alur utama agentic
     # -----------------------------
+    async def _execute_plan_item(
+        self, item: ToolPlanItem, registry: Dict[str, Dict[str, Any]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Eksekusi satu langkah Planner; kembalikan observasi teks untuk konteks Actor
+        (atau None bila langkah dilewati).
+        """
+        name = item.tool_name
+        if name not in registry:
+            logger.info("Lewati langkah %s: tool tidak ada di registry.", name)
+            return None
+        if registry[name].get("need_explicit") and not is_explicit_for(
+            self.explicit_hits, name
+        ):
+            logger.info("Lewati %s (explicit_only, user tidak eksplisit).", name)
+            return None
+
+        validator = registry[name]["validator"]
+        coercers = registry[name]["arg_coercers"]
+        try:
+            # Konversi per tipe schema; properti tanpa tipe → JSON/angka/bool/string
+            args_dict: Dict[str, Any] = {
+                kv.key: coercers.get(kv.key, _coerce_untyped)(kv.value)
+                for kv in item.args_kv or []
+            }
+            try:
+                valid_args = validator(args_dict)
+            except Exception as e:
+                logger.exception(
+                    "Validasi argumen draft gagal (%s): %s | args_dict=%s",
+                    name,
+                    e,
+                    args_dict,
+                )
+                return None
+        except Exception as e:
+            logger.exception("Validasi argumen draft gagal (%s): %s", name, e)
+            return None
+
+        try:
+            async with asyncio.timeout(self.step_timeout_sec):
+                result = await self.executor.call_tool(name, valid_args)
+            function_output = {"ok": True, "result": to_jsonable(result)}
+        except asyncio.TimeoutError:
+            function_output = {
+                "ok": False,
+                "error": "Timeout",
+                "message": f"Tool {name} > {self.step_timeout_sec}s",
+            }
+        except Exception as e:
+            function_output = {
+                "ok": False,
+                "error": type(e).__name__,
+                "message": str(e),
+            }
+
+        logger.info(
+            "Planner mengeksekusi tool %s (hasil dimasukkan ke konteks).", name
+        )
+        # Catat sebagai observasi teks (bukan function_call_output)
+        return {
+            "role": "user",
+            "content": (
+                f"[PLANNER_EXECUTED]\n"
+                f"tool={name}\n"
+                f"args={dumps_json(valid_args)}\n"
+                f"result={dumps_json(function_output)}"
+            ),
+        }
+
     async def reflection_actor_with_mcp(
         self,
         prompt: str,
         user_id: str,
         actor_instruction: Optional[str] = None,
         critic_instruction: Optional[str] = None,
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> str:
         """
+        `on_token` (opsional): callback async yang menerima potongan teks jawaban
+        final selagi di-generate (streaming); nilai kembalian tetap teks lengkap.
+
         1) Bentuk konteks memori (LTM+STM)
         2) Ambil tools MCP (registry)
         3) Actor memulai (boleh minta tool)
@@ -834,28 +1429,39 @@ class ReflectionActor:
         """
         logger.info("Memulai orkestrasi agentic untuk prompt: %r", prompt)
 
-        # 1) Konstruksi konteks memori
-        system_memory = await build_context_blocks_memory(
-            short_term=self.short_term,
-            long_term=self.long_term,
-            user_id=user_id,
-            user_message=prompt,
-            max_history=self.max_history,
-            prompt_instruction=PROMPT_USER_CONTEXT(),
-        )
-        logger.info("Konteks memori siap.")
+        # 1) Konteks memori & 2) Tools MCP + registry + katalog — independen,
+        # jadi dijalankan bersamaan (katalog di-cache per versi tools MCP)
+        async with asyncio.TaskGroup() as tg:
+            t_memory = tg.create_task(
+                build_context_blocks_memory(
+                    short_term=self.short_term,
+                    long_term=self.long_term,
+                    user_id=user_id,
+                    user_message=prompt,
+                    max_history=self.max_history,
+                    prompt_instruction=PROMPT_USER_CONTEXT(),
+                )
+            )
+            t_tools = tg.create_task(
+                self.executor.get_tools_and_catalog(build_tool_context)
+            )
+        system_memory = t_memory.result()
+        tools, registry, tool_catalog_txt = t_tools.result()
+        logger.info("Konteks memori & katalog tools siap.")
 
-        # 2) Tools MCP + registry
-        mcp_tools = await self.executor.get_tools()
-        tools, registry = normalize_mcp_tools(mcp_tools)
         self.tools_registry = registry
         self.last_user_prompt = prompt
+        # Deteksi intensi eksplisit cukup sekali per turn untuk semua tool
+        matcher, names = build_explicit_matcher(registry)
+        self.explicit_hits = contains_explicit_intent(prompt.lower(), matcher, names)
 
         # 3) Actor — panggilan awal
-        sys_text = actor_instruction or ACTOR_SYSTEM()
+        # Pesan statis dibangun sekali; finalisasi memakai referensi dict yang sama
+        sys_msg = {"role": "system", "content": actor_instruction or ACTOR_SYSTEM()}
+        ctx_msg = {"role": "user", "content": f"User Memory Context: {system_memory}"}
         messages: List[Dict[str, Any]] = [
-            {"role": "system", "content": sys_text},
-            {"role": "user", "content": f"User Memory Context: {system_memory}"},
+            sys_msg,
+            ctx_msg,
             {"role": "user", "content": prompt},
         ]
         logger.info("Actor dipanggil pertama kali (model boleh meminta tool).")
@@ -864,151 +1470,53 @@ class ReflectionActor:
         # 4) Tanggapi function_call (bila ada)
         function_calls = self._iter_function_calls(response)
         for fc in function_calls:
-            name = fc["name"]
-            args_raw = fc["arguments"]
-            call_id = fc["call_id"]
             logger.info(
-                "Model meminta tool: %s | args=%s", name, truncate_args(args_raw, 400)
-            )
-
-            # Guard: explicit_only
-            if registry.get(name, {}).get(
-                "need_explicit"
-            ) and not contains_explicit_intent(prompt, name):
-                logger.warning(
-                    "Lewati tool %s: butuh permintaan eksplisit dari user.", name
-                )
-                output = json.dumps(
-                    {
-                        "ok": False,
-                        "error": "GUARDRAIL",
-                        "message": "Aksi ini hanya dijalankan jika pengguna secara eksplisit memintanya.",
-                    },
-                    ensure_ascii=False,
-                )
-                self._append_fc_reply(
-                    messages,
-                    call_id=call_id,
-                    name=name,
-                    args_raw=args_raw,
-                    output_json_str=output,
-                )
-                continue
-
-            # Validasi argumen
-            try:
-                args = json.loads(args_raw or "{}")
-            except JSONDecodeError:
-                logger.exception("Gagal decode JSON args untuk tool %s.", name)
-                args = {}
-
-            schema = (
-                registry[name].get("parameters_raw")
-                or registry[name].get("parameters_final")
-                or {"type": "object", "properties": {}}
-            )
-            try:
-                valid_args = validate_tool_args(schema, args)
-            except Exception:
-                logger.exception("Validasi argumen gagal untuk tool %s.", name)
-                output = json.dumps(
-                    {
-                        "ok": False,
-                        "error": "InvalidArguments",
-                        "message": "Schema validation failed.",
-                    },
-                    ensure_ascii=False,
-                )
-                self._append_fc_reply(
-                    messages,
-                    call_id=call_id,
-                    name=name,
-                    args_raw=args_raw,
-                    output_json_str=output,
-                )
-                continue
-
-            # Jalankan tool
-            try:
-                result = await asyncio.wait_for(
-                    self.executor.call_tool(name, valid_args),
-                    timeout=self.step_timeout_sec,
-                )
-                output = json.dumps(
-                    {"ok": True, "result": to_jsonable(result)}, ensure_ascii=False
-                )
-                logger.info("Tool %s dieksekusi dengan sukses.", name)
-            except asyncio.TimeoutError:
-                logger.exception("Timeout saat menjalankan tool %s.", name)
-                output = json.dumps(
-                    {
-                        "ok": False,
-                        "error": "Timeout",
-                        "message": f"Tool {name} melebihi {self.step_timeout_sec}s",
-                    },
-                    ensure_ascii=False,
-                )
-            except Exception as e:
-                logger.exception("Gagal menjalankan tool %s.", name)
-                output = json.dumps(
-                    {"ok": False, "error": type(e).__name__, "message": str(e)},
-                    ensure_ascii=False,
-                )
-
-            # Pasangan function_call + function_call_output (call_id sama)
-            self._append_fc_reply(
-                messages,
-                call_id=call_id,
-                name=name,
-                args_raw=args_raw,
-                output_json_str=output,
+                "Model meminta tool: %s | args=%s",
+                fc.name,
+                LazyTruncate(fc.arguments, 400),
             )
+        await self._answer_function_calls(function_calls, messages, registry)
 
         # 5) Jawaban interim
         logger.info("Meminta jawaban sementara (interim) dari Actor.")
+        self._prune_messages(messages)
         interim_resp = await self._call_llm(messages=messages, tools=tools)
         interim_result = self._safe_output_text(interim_resp)
         logger.info("Interim dihasilkan (%d karakter).", len(interim_result))
 
         # 6) Refleksi: Critic → Planner → Eksekusi rencana (observasi)
         critique_text = ""
-        # Katalog tools (untuk prompt)
-        tool_catalog_lines = []
-        for name, meta in registry.items():
-            params = meta.get("parameters_raw") or {}
-            req = ", ".join(params.get("required", []) or [])
-            flag = "EXPLICIT_ONLY" if meta.get("need_explicit") else "-"
-            tool_catalog_lines.append(
-                f"- {name} :: {flag} | req: {req} | {meta.get('description', '')}"
-            )
-        tool_catalog_txt = "DAFTAR TOOLS:\n" + "\n".join(tool_catalog_lines)
 
-        # Planner
-        planner = LLMPlanner(
-            llm=self.llm, model=self.model, timeout_sec=self.step_timeout_sec
-        )
+        # Bagian statis prompt Critic & finalisasi: dibangun sekali, bukan per iterasi
+        critic_system_msg = {
+            "role": "system",
+            "content": critic_instruction or CRITIC_SYSTEM(),
+        }
+        critic_prefix = f"{tool_catalog_txt}\n\nUSER REQUEST:\n{prompt}\n\n"
+        final_prefix = [
+            sys_msg,
+            ctx_msg,
+            {"role": "user", "content": f"Permintaan awal: {prompt}"},
+        ]
 
         for i in range(self.max_steps):
             logger.info("Iterasi refleksi #%d dimulai.", i + 1)
-            critic_sys = critic_instruction or CRITIC_SYSTEM()
             critic_msgs = [
-                {"role": "system", "content": critic_sys},
+                critic_system_msg,
                 {
                     "role": "user",
-                    "content": f"{tool_catalog_txt}\n\nUSER REQUEST:\n{prompt}\n\nACTOR OUTPUT (INTERIM):\n{interim_result}",
+                    "content": f"{critic_prefix}ACTOR OUTPUT (INTERIM):\n{interim_result}",
                 },
             ]
             # Critic terstruktur
             try:
-                critic_resp = await asyncio.wait_for(
-                    self.llm.responses.parse(
+                async with llm_semaphore(), asyncio.timeout(self.step_timeout_sec):
+                    critic_resp = await self.llm.responses.parse(
                         model=self.model,
                         input=critic_msgs,  # type: ignore
                         text_format=CriticFeedback,  # sesuai SDK Anda
                         temperature=0.0,
-                    ),
-                    timeout=self.step_timeout_sec,
-                )
+                    )
                 critic_obj: CriticFeedback = critic_resp.output_parsed  # type: ignore
                 logger.info("Critic menghasilkan feedback terstruktur.")
             except Exception:
@@ -1018,115 +1526,40 @@ class ReflectionActor:
             # Ringkas kritik untuk dorongan perbaikan
             critique_text = self._summarize_critic_for_actor(critic_obj)
 
-            # Planner (ToolPlan)
-            plan: ToolPlan = await planner.make_plan(
+            # FINALIZE: observasi Planner hanya dipakai Actor di iterasi berikutnya
+            # (finalisasi tidak membacanya), jadi Planner & tool-nya dilewati
+            if "FINALIZE" in (critique_text or "").upper():
+                logger.info(
+                    "Critic menyarankan FINALIZE pada iterasi #%d — keluar dari loop.",
+                    i + 1,
+                )
+                break
+
+            # Planner (ToolPlan) — tiap langkah langsung dieksekusi begitu
+            # selesai ter-decode, overlap dengan sisa stream Planner
+            scheduled: List[asyncio.Task] = []
+
+            def _schedule(item: ToolPlanItem) -> None:
+                if len(scheduled) < self.max_steps:
+                    scheduled.append(
+                        asyncio.create_task(self._execute_plan_item(item, registry))
+                    )
+
+            plan: ToolPlan = await self.planner.make_plan(
                 user_prompt=prompt,
                 critic=critic_obj,
                 tools_registry=registry,
+                on_item=_schedule,
             )
             logger.info(
                 "Planner menyusun langkah: %s",
                 [f"{it.step}:{it.tool_name}" for it in plan.items],
             )
 
-            # Eksekusi rencana Planner — hasil sebagai observasi teks
-            for item in plan.items[: self.max_steps]:
-                name = item.tool_name
-                if name not in registry:
-                    logger.info("Lewati langkah %s: tool tidak ada di registry.", name)
-                    continue
-                if registry[name].get("need_explicit") and not contains_explicit_intent(
-                    prompt, name
-                ):
-                    logger.info(
-                        "Lewati %s (explicit_only, user tidak eksplisit).", name
-                    )
-                    continue
-
-                schema = registry[name].get("parameters_raw") or {
-                    "type": "object",
-                    "properties": {},
-                }
-                try:
-                    args_dict: Dict[str, Any] = {}
-                    for kv in item.args_kv or []:
-                        v = kv.value
-                        # coba parse json; kalau gagal, pakai string apa adanya
-                        try:
-                            args_dict[kv.key] = json.loads(v)
-                        except Exception:
-                            # jika angka/bool diserialisasi sebagai string, boleh konversi kecil
-                            if v.isdigit():
-                                args_dict[kv.key] = int(v)
-                            elif v.replace(".", "", 1).isdigit() and v.count(".") < 2:
-                                try:
-                                    args_dict[kv.key] = float(v)
-                                except Exception:
-                                    args_dict[kv.key] = v
-                            elif v.lower() in ("true", "false"):
-                                args_dict[kv.key] = v.lower() == "true"
-                            else:
-                                args_dict[kv.key] = v
-
-                    schema = registry[name].get("parameters_raw") or {
-                        "type": "object",
-                        "properties": {},
-                    }
-                    try:
-                        valid_args = validate_tool_args(schema, args_dict)
-                    except Exception as e:
-                        logger.exception(
-                            "Validasi argumen draft gagal (%s): %s | args_dict=%s",
-                            name,
-                            e,
-                            args_dict,
-                        )
-                        continue
-                except Exception as e:
-                    logger.exception("Validasi argumen draft gagal (%s): %s", name, e)
-                    continue
-
-                try:
-                    result = await asyncio.wait_for(
-                        self.executor.call_tool(name, valid_args),
-                        timeout=self.step_timeout_sec,
-                    )
-                    function_output = {"ok": True, "result": to_jsonable(result)}
-                except asyncio.TimeoutError:
-                    function_output = {
-                        "ok": False,
-                        "error": "Timeout",
-                        "message": f"Tool {name} > {self.step_timeout_sec}s",
-                    }
-                except Exception as e:
-                    function_output = {
-                        "ok": False,
-                        "error": type(e).__name__,
-                        "message": str(e),
-                    }
-
-                # Catat sebagai observasi teks (bukan function_call_output)
-                messages.append(
-                    {
-                        "role": "user",
-                        "content": (
-                            f"[PLANNER_EXECUTED]\n"
-                            f"tool={name}\n"
-                            f"args={json.dumps(valid_args, ensure_ascii=False)}\n"
-                            f"result={json.dumps(function_output, ensure_ascii=False)}"
-                        ),
-                    }
-                )
-                logger.info(
-                    "Planner mengeksekusi tool %s (hasil dimasukkan ke konteks).", name
-                )
-
-            if "FINALIZE" in (critique_text or "").upper():
-                logger.info(
-                    "Critic menyarankan FINALIZE pada iterasi #%d — keluar dari loop.",
-                    i + 1,
-                )
-                break
+            # Hasil rencana Planner — observasi teks, urut sesuai langkah
+            for observation in await asyncio.gather(*scheduled):
+                if observation is not None:
+                    messages.append(observation)
 
             # Dorong Actor untuk perbaikan
             if critique_text:
@@ -1134,14 +1567,24 @@ class ReflectionActor:
                     {"role": "user", "content": f"INSTRUKSI KRITIK:\n{critique_text}"}
                 )
             logger.info("Memanggil Actor untuk perbaikan pasca refleksi #%d.", i + 1)
+            prev_interim = interim_result
+            self._prune_messages(messages)
             interim_resp = await self._call_llm(messages=messages, tools=tools)
             interim_result = self._safe_output_text(interim_resp)
 
+            # Tanpa observasi baru & interim identik → Critic (temperature 0) akan
+            # melihat input yang sama; iterasi berikutnya tidak menambah apa pun
+            if not plan.items and interim_result == prev_interim:
+                logger.info(
+                    "Interim tidak berubah dan Planner tanpa langkah — "
+                    "berhenti pada iterasi #%d.",
+                    i + 1,
+                )
+                break
+
         # 7) Finalisasi jawaban
         final_msgs = [
-            {"role": "system", "content": sys_text},
-            {"role": "user", "content": f"User Memory Context: {system_memory}"},
-            {"role": "user", "content": f"Permintaan awal: {prompt}"},
+            *final_prefix,
             {"role": "user", "content": f"Output interim: {interim_result}"},
             {
                 "role": "user",
@@ -1149,15 +1592,20 @@ class ReflectionActor:
             },
         ]
         logger.info("Memanggil Actor untuk finalisasi jawaban.")
-        final_resp = await self._call_llm(messages=final_msgs, tools=tools)
+        final_resp = await self._call_llm(
+            messages=final_msgs, tools=tools, on_token=on_token
+        )
 
         # 🔁 Pastikan kalau model masih ingin memanggil tool, kita balas sampai keluar teks
-        final_text = await self._ensure_text_response(
-            base_messages=final_msgs,
-            tools=tools,
-            first_resp=final_resp,
-            max_rounds=3,
-        )
+        # (hanya bila final kosong DAN memang ada function_call yang perlu dibalas)
+        final_text = self._safe_output_text(final_resp)
+        if not final_text and self._iter_function_calls(final_resp):
+            final_text = await self._ensure_text_response(
+                base_messages=final_msgs,
+                tools=tools,
+                first_resp=final_resp,
+                max_rounds=3,
+            )
 
         # Fallback agar user tidak menerima string kosong
         if not final_text:
@@ -1170,21 +1618,19 @@ class ReflectionActor:
 
     @staticmethod
     def _summarize_critic_for_actor(critic: CriticFeedback) -> str:
-        """Ringkasan singkat untuk mendorong perbaikan Actor."""
-        parts: List[str] = []
-        if critic.findings:
-            reasons = [
-                f"- {f.reason}"
-                for f in critic.findings[:3]
-                if getattr(f, "reason", None)
-            ]
-            if reasons:
-                parts.append("Temuan:\n" + "\n".join(reasons))
+        """Ringkasan singkat untuk mendorong perbaikan Actor (satu join di akhir)."""
+        lines: List[str] = []
+        reasons = [f.reason for f in critic.findings[:3] if f.reason]
+        if reasons:
+            lines.append("Temuan:")
+            lines.extend(f"- {r}" for r in reasons)
         if critic.suggested_steps:
-            steps = [f"{i + 1}. {s}" for i, s in enumerate(critic.suggested_steps[:5])]
-            parts.append("Saran langkah:\n" + "\n".join(steps))
+            lines.append("Saran langkah:")
+            lines.extend(
+                f"{i}. {step}" for i, step in enumerate(critic.suggested_steps[:5], 1)
+            )
         if critic.candidate_tools:
-            parts.append("Candidate tools: " + ", ".join(critic.candidate_tools[:6]))
+            lines.append("Candidate tools: " + ", ".join(critic.candidate_tools[:6]))
         if critic.decision and critic.decision.finalize:
-            parts.append("FINALIZE")
-        return "\n".join(parts).strip()
+            lines.append("FINALIZE")
+        return "\n".join(lines).strip()
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import asyncio
+import os
 from hypercorn.asyncio import serve
 from hypercorn.config import Config as HyperConfig
 from projectwise import create_app
@@ -16,5 +17,16 @@ async def main():
     await serve(app, cfg, mode="asgi")
 
 
+def _loop_factory():
+    """uvloop bila tersedia (tidak ada di Windows); LOOP=asyncio untuk menonaktifkan."""
+    if os.environ.get("LOOP", "uvloop").lower() != "uvloop":
+        return None
+    try:
+        import uvloop  # type: ignore
+    except ImportError:
+        return None
+    return uvloop.new_event_loop
+
+
 if __name__ == "__main__":
-    asyncio.run(main(), debug=True)
+    asyncio.run(main(), debug=True, loop_factory=_loop_factory())
@@ -1,12 +1,12 @@
 # projectwise/__init__.py
 from __future__ import annotations
 
-import os
 from quart import Quart
 from quart_schema import QuartSchema
 
 from .config import get_config
 from .utils.logger import get_logger
+from .utils.json_provider import install_orjson_provider
 from .extensions import init_extensions, shutdown_extensions
 from .routes.main import main_bp
 from .routes.chat import chat_bp
@@ -30,14 +30,18 @@ async def create_app(config_object: object | None = None) -> Quart:
     """
 
     app = Quart(__name__, instance_relative_config=True)
-    
-    QuartSchema(app)
 
-    env = os.environ.get("APP_ENV", "default")
+    # QuartSchema tetap dibutuhkan oleh @validate_request/@validate_response di
+    # routes/chat.py; validasi bersifat opt-in per-route, tanpa konversi casing
+    # global yang menambah kerja di setiap request/WS frame.
+    QuartSchema(app, convert_casing=False)
+    # JSON response/request via orjson (di atas provider QuartSchema)
+    install_orjson_provider(app)
+
     if config_object:
         app.config.from_object(config_object)
     else:
-        app.config.from_object(get_config(env))
+        app.config.from_object(get_config())
 
     # Inisialisasi logger global
     logger = get_logger("quart.app")
@@ -53,12 +57,15 @@ async def create_app(config_object: object | None = None) -> Quart:
         logger.info("Extensions shutdown successfully")
 
     # Register blueprints
-    app.register_blueprint(main_bp)
-    app.register_blueprint(chat_bp, url_prefix="/chat")
-    app.register_blueprint(ws_chat_bp)
-    # app.register_blueprint(api_bp, url_prefix="/api")
-    app.register_blueprint(mcp_control_bp, url_prefix="/mcp")
-    app.register_blueprint(ingestion_bp)
+    for blueprint, url_prefix in (
+        (main_bp, None),
+        (chat_bp, "/chat"),
+        (ws_chat_bp, None),
+        # (api_bp, "/api"),
+        (mcp_control_bp, "/mcp"),
+        (ingestion_bp, None),
+    ):
+        app.register_blueprint(blueprint, url_prefix=url_prefix)
     logger.info("Blueprints registered")
 
     return app
@@ -1,9 +1,10 @@
 # projectwise/config.py
 from __future__ import annotations
 
-import os
+from functools import lru_cache
 from pathlib import Path
-from dotenv import load_dotenv
+
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,8 +13,13 @@ ENV_PATH = Path(BASE_DIR) / ".env"
 DB_DIR = BASE_DIR / "database"
 DB_DIR.mkdir(parents=True, exist_ok=True)
 
-# Load .env
-load_dotenv(ENV_PATH)
+# .env dibaca langsung oleh pydantic-settings (satu sumber, tanpa load_dotenv)
+_ENV_CONFIG = SettingsConfigDict(
+    env_file=str(ENV_PATH),
+    env_file_encoding="utf-8",
+    extra="ignore",
+    case_sensitive=False,
+)
 
 
 class ServiceConfigs(BaseSettings):
@@ -22,52 +28,101 @@ class ServiceConfigs(BaseSettings):
     # ====================================
     # Model dan parameter LLM
     # ====================================
-    llm_base_url: str = os.getenv("LLM_BASE_URL", "https://api.openai.com")
-    llm_api_key: str = os.getenv("LLM_API_KEY", "")
-    llm_model: str = os.getenv("LLM_MODEL", "qwen/qwen25-72b-instruct")
-    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
-    openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    llm_base_url: str = "https://api.openai.com"
+    llm_api_key: str = ""
+    llm_model: str = "qwen/qwen25-72b-instruct"
+    openai_api_key: str = ""
+    openai_model: str = "gpt-4o-mini"
     max_token: int = (
         16000  # context window 32k token untuk ringkasan - qwen25-72b-instruct
     )
-    llm_temperature: float = float(os.getenv("LLM_TEMPERATURE", 0.2))
-    embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
-    embedding_model_api_key: str = os.getenv("EMBEDDING_MODEL_API_KEY", "")
+    llm_temperature: float = 0.2
+    llm_max_concurrency: int = 16
+    embedding_model: str = "text-embedding-3-small"
+    embedding_model_api_key: str = ""
 
     # ====================================
     # MCP
     # ====================================
-    mcp_server_url: str = os.getenv(
-        "MCP_SERVER_URL", "http://localhost:5000/projectwise/mcp/"
-    )
+    mcp_server_url: str = "http://localhost:5000/projectwise/mcp/"
 
     # ====================================
     # Agent Workflow
     # ====================================
-    intent_classification_threshold: float = float(
-        os.getenv("INTENT_CLASSIFICATION_THRESHOLD", 0.60)
-    )
+    intent_classification_threshold: float = 0.60
+
+    # ====================================
+    # Semantic response cache (per user)
+    # ====================================
+    semcache_enabled: bool = True
+    semcache_threshold: float = 0.95
+    semcache_ttl_sec: int = 900
+
+    # ====================================
+    # MCP tool result cache (exact match, 0 = nonaktif)
+    # ====================================
+    tool_cache_retrieval_ttl_sec: int = 1800
+    tool_cache_websearch_ttl_sec: int = 300
 
     # ====================================
     # Database Vector Mem0ai
     # ====================================
     qdrant_llm_provider: str = "openai"
-    qdrant_host: str = os.getenv("QDRANT_HOST", "localhost")
-    qdrant_port: int = int(os.getenv("QDRANT_PORT", 6333))
-    vector_dim: int = int(os.getenv("VECTOR_DIM", "1536"))
-    collection_name: str = os.getenv("COLLECTION_NAME","projectwise_client")
+    qdrant_host: str = "localhost"
+    qdrant_port: int = 6333
+    vector_dim: int = 1536
+    collection_name: str = "projectwise_client"
 
     # ====================================
     # Base config ENV
     # ====================================
-    max_concurrent_proccess: int = int(os.getenv("MAX_CONCURRENT_PROCCESS", "8"))
-    max_cpu_workers: int = max(1, int(os.getenv("MAX_CPU_WORKERS", "4")))
+    max_concurrent_proccess: int = 8
+    max_cpu_workers: int = 4
+
+    log_retention: int = 90
+    app_env: str = "development"
+    model_config = _ENV_CONFIG
+
+    @field_validator("max_cpu_workers")
+    @classmethod
+    def _at_least_one_worker(cls, v: int) -> int:
+        return max(1, v)
 
-    log_retention: int = int(os.getenv("LOG_RETENTION", 90))
-    app_env: str = os.getenv("APP_ENV", "development")
-    model_config = SettingsConfigDict(
-        env_file=str(ENV_PATH), env_file_encoding="utf-8", extra="ignore"
-    )
+
+class AppSettings(BaseSettings):
+    """Nilai ENV untuk konfigurasi Quart (dipetakan ke atribut BaseConfig)."""
+
+    app_env: str = "development"
+    secret_key: str = "change-me-secret-key"
+    session_cookie_name: str = "quart_session"
+
+    log_level: str = "INFO"
+    log_format: str = "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
+    log_retention: int = 90
+    log_mode: str = "file"  # file | stdout | socket
+    log_console: bool = True
+    log_console_level: str = ""
+    log_month_format: str = "%Y-%m"
+    log_use_utc: bool = False
+    log_socket_host: str = "127.0.0.1"
+    log_socket_port: int = 9020
+    log_root_dir: str = ""
+    model_config = _ENV_CONFIG
+
+
+@lru_cache(maxsize=1)
+def get_service_configs() -> ServiceConfigs:
+    """ServiceConfigs singleton: .env dibaca & divalidasi sekali per proses."""
+    return ServiceConfigs()
+
+
+@lru_cache(maxsize=1)
+def get_app_settings() -> AppSettings:
+    """AppSettings singleton untuk atribut BaseConfig & pemilihan environment."""
+    return AppSettings()
+
+
+_app_settings = get_app_settings()
 
 
 class BaseConfig:
@@ -84,34 +139,29 @@ class BaseConfig:
     # ====================
     # App Config
     # ====================
-    ENV = os.getenv("APP_ENV", "development")
-    SECRET_KEY = os.getenv("SECRET_KEY", "change-me-secret-key")
-    SESSION_COOKIE_NAME = os.getenv("SESSION_COOKIE_NAME", "quart_session")
+    ENV = _app_settings.app_env
+    SECRET_KEY = _app_settings.secret_key
+    SESSION_COOKIE_NAME = _app_settings.session_cookie_name
     DEBUG = False
     TESTING = False
 
     # ====================
     # Logger Config
     # ====================
-    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-    LOG_FORMAT = os.getenv(
-        "LOG_FORMAT", "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
-    )
-    LOG_RETENTION = int(os.getenv("LOG_RETENTION", 90))
-    LOG_MODE = os.getenv("LOG_MODE", "file")  # file | stdout | socket
-    LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() == "true"
-    LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "") or None
-    LOG_MONTH_FORMAT = os.getenv("LOG_MONTH_FORMAT", "%Y-%m")
-    LOG_USE_UTC = os.getenv("LOG_USE_UTC", "false").lower() == "true"
-
-    LOG_SOCKET_HOST = os.getenv("LOG_SOCKET_HOST", "127.0.0.1")
-    LOG_SOCKET_PORT = int(os.getenv("LOG_SOCKET_PORT", "9020"))
-    _LOG_ROOT_DIR_RAW = os.getenv("LOG_ROOT_DIR", "").strip()
+    LOG_LEVEL = _app_settings.log_level
+    LOG_FORMAT = _app_settings.log_format
+    LOG_RETENTION = _app_settings.log_retention
+    LOG_MODE = _app_settings.log_mode  # file | stdout | socket
+    LOG_CONSOLE = _app_settings.log_console
+    LOG_CONSOLE_LEVEL = _app_settings.log_console_level or None
+    LOG_MONTH_FORMAT = _app_settings.log_month_format
+    LOG_USE_UTC = _app_settings.log_use_utc
+
+    LOG_SOCKET_HOST = _app_settings.log_socket_host
+    LOG_SOCKET_PORT = _app_settings.log_socket_port
+    _LOG_ROOT_DIR_RAW = _app_settings.log_root_dir.strip()
     LOG_ROOT_DIR = Path(_LOG_ROOT_DIR_RAW).resolve() if _LOG_ROOT_DIR_RAW else None
 
-    LOG_SOCKET_HOST = os.getenv("LOG_SOCKET_HOST", "127.0.0.1")
-    LOG_SOCKET_PORT = int(os.getenv("LOG_SOCKET_PORT", "9020"))
-
     JSON_SORT_KEYS = False
     JSONIFY_PRETTYPRINT_REGULAR = False
 
@@ -140,8 +190,15 @@ config_map = {
 }
 
 
+@lru_cache(maxsize=8)
 def get_config(env: str | None = None) -> type[BaseConfig]:
-    """Return the configuration class corresponding to the given environment."""
+    """Return the configuration class corresponding to the given environment.
+
+    Hasil di-cache per ``env``. Agar pemilihan environment default (APP_ENV)
+    mengikuti perubahan env di tengah proses (mis. di test harness), panggil
+    ``get_app_settings.cache_clear()`` lalu ``get_config.cache_clear()``.
+    Atribut BaseConfig (SECRET_KEY, LOG_*, dst.) tetap nilai saat import.
+    """
     if not env:
-        env = os.getenv("APP_ENV", "default")
+        env = get_app_settings().app_env
     return config_map.get(env, config_map["default"])
@@ -2,19 +2,31 @@
 from __future__ import annotations
 
 import asyncio
+import importlib.util
+
+import httpx
+from openai import AsyncOpenAI
 from quart import Quart
 
-from .config import ServiceConfigs
+from .config import ServiceConfigs, get_service_configs
 from .utils.logger import get_logger
-from .services.mcp.client import MCPClient
-from .services.memory.short_term_memory import ShortTermMemory
-from .services.memory.long_term_memory import Mem0Manager
-from projectwise.models.models import ModelDB
 
 
-# Module-level references to the singletons
-_mcp_client: MCPClient | None = None
-_service_configs: ServiceConfigs | None = None
+def _build_openai_client(service_configs: ServiceConfigs) -> AsyncOpenAI:
+    """Satu AsyncOpenAI (dan satu pool httpx) untuk seluruh app."""
+    http_client = httpx.AsyncClient(
+        # HTTP/2 butuh paket `h2`; tanpa itu tetap keep-alive via HTTP/1.1
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+        timeout=httpx.Timeout(60.0, connect=5.0, write=10.0, pool=2.0),
+    )
+    if str(service_configs.llm_model).lower().startswith("gpt"):
+        return AsyncOpenAI(api_key=service_configs.llm_api_key, http_client=http_client)
+    return AsyncOpenAI(
+        base_url=service_configs.llm_base_url,
+        api_key=service_configs.llm_api_key,
+        http_client=http_client,
+    )
 
 
 async def init_extensions(app: Quart) -> None:
@@ -24,10 +36,21 @@ async def init_extensions(app: Quart) -> None:
     resulting objects are stored on ``app.extensions`` for later use.
     """
 
+    # Import service berat (SQLAlchemy, Mem0/Qdrant, tiktoken) ditunda ke sini
+    from projectwise.models.models import ModelDB
+    from .services.memory.short_term_memory import ShortTermMemory
+    from .services.memory.long_term_memory import Mem0Manager
+    from .services.memory.persist_queue import MemoryPersistQueue
+    from .services.llm_chain.llm_chains import LLMChains
+    from .services.workflow.chat_with_memory import ChatWithMemory
+    from .services.cache.semantic_cache import SemanticCache, openai_embedder
+    from .services.cache.tool_cache import ToolResultCache
+    from .services.cache.embedding_cache import EmbeddingCache
+
     logger = get_logger(__name__)
 
     # Load service configuration from environment (via pydantic)
-    service_configs = ServiceConfigs()
+    service_configs = get_service_configs()
     
     # Check LLM API KEY
     if not service_configs.llm_api_key:
@@ -36,6 +59,9 @@ async def init_extensions(app: Quart) -> None:
     app.extensions["service_configs"] = service_configs
     logger.info(f"ServiceConfigs loaded: MCP URL = {service_configs.mcp_server_url}")
 
+    # Shared LLM client (dipakai ulang Actor/Critic/Planner, satu connection pool)
+    app.extensions["openai_client"] = _build_openai_client(service_configs)
+
     # Siapkan state MCP (tidak connect di startup)
     app.extensions["mcp"] = None
     app.extensions["mcp_lock"] = asyncio.Lock()
@@ -46,36 +72,114 @@ async def init_extensions(app: Quart) -> None:
     }
     logger.info("MCP state initialised")
 
-    # Initialise Models Database
+    # Initialise Models Database, short‑term memory & long‑term memory (vector store)
+    # — schema SQLite (berurutan: kedua metadata sama-sama membuat chat_sessions)
+    #   dijalankan bersamaan dengan init Qdrant/Mem0
     db_url = app.config["SQLALCHEMY_DATABASE_URI"]
     models_db = ModelDB(db_url)
-    await models_db.init_models()
+    # Satu engine/pool (dan PRAGMA WAL) untuk ModelDB & ShortTermMemory
+    short_term_memory = ShortTermMemory(engine=models_db.engine, max_history=20)
+    # Cache embedding global (Mem0 search/add & SemanticCache, model embedding sama)
+    embed_cache = EmbeddingCache()
+    app.extensions["embed_cache"] = embed_cache
+    long_term_memory = Mem0Manager(service_configs, embedding_cache=embed_cache)
+
+    async def _init_sqlite() -> None:
+        await models_db.init_models()
+        await short_term_memory.init_models()
+
+    db_result, ltm_result = await asyncio.gather(
+        _init_sqlite(),
+        long_term_memory.init(),
+        return_exceptions=True,
+    )
+    if isinstance(db_result, BaseException):
+        raise db_result
+    if isinstance(ltm_result, BaseException):
+        logger.warning("LongTermMemory init error (will run degraded): %s", ltm_result)
+
     app.extensions["db"] = models_db
-    
-    # Initialise short‑term memory using the database URI from the app config
-    short_term_memory = ShortTermMemory(db_url=db_url, echo=False, max_history=20)
-    await short_term_memory.init_models()
     app.extensions["short_term_memory"] = short_term_memory
-
-    # Initialise long‑term memory (vector store)
-    long_term_memory = Mem0Manager(service_configs)
-    try:
-        await long_term_memory.init()
-    except Exception as e:
-        logger.warning("LongTermMemory init error (will run degraded): %s", e)
-        
     app.extensions["long_term_memory"] = long_term_memory
     logger.info(
         "LongTermMemory (Mem0Manager) initialised (ready=%s, degraded=%s)",
         long_term_memory.ready, long_term_memory.degraded
     )
 
+    # Persist STM/LTM di background (di luar jalur response)
+    persist_queue = MemoryPersistQueue(
+        short_term=short_term_memory, long_term=long_term_memory
+    )
+    persist_queue.start()
+    app.extensions["persist_queue"] = persist_queue
+
+    # Layanan chat stateless: dibuat sekali, memakai shared OpenAI client
+    openai_client = app.extensions["openai_client"]
+    app.extensions["llm_chains"] = LLMChains(prefer="chat", client=openai_client)
+    app.extensions["chat_ai"] = ChatWithMemory(
+        service_configs=service_configs,
+        long_term=long_term_memory,
+        short_term=short_term_memory,
+        llm=openai_client,
+        max_history=5,  # = HISTORY_LIMIT di routes/chat.py
+    )
+    # Registry actor/orchestrator per-app (ReflectionActor.from_quart_app ikut mengisi)
+    app.extensions["actors"] = {"memory": app.extensions["chat_ai"]}
+    logger.info("Chat services (LLMChains, ChatWithMemory) initialised")
+
+    # Cache hasil MCP tool (exact match; websearch TTL pendek demi kesegaran)
+    app.extensions["tool_cache"] = ToolResultCache(
+        {
+            "retrieval_tool": service_configs.tool_cache_retrieval_ttl_sec,
+            "websearch_tool": service_configs.tool_cache_websearch_ttl_sec,
+        }
+    )
+
+    # Semantic cache jawaban /chat/message (embedding sama dengan Mem0 embedder)
+    app.extensions["semantic_cache"] = None
+    if service_configs.semcache_enabled and service_configs.embedding_model_api_key:
+        embedding_client = AsyncOpenAI(api_key=service_configs.embedding_model_api_key)
+        app.extensions["embedding_client"] = embedding_client
+        app.extensions["semantic_cache"] = SemanticCache(
+            openai_embedder(embedding_client, service_configs.embedding_model),
+            threshold=service_configs.semcache_threshold,
+            ttl_sec=service_configs.semcache_ttl_sec,
+            embedding_cache=embed_cache,
+        )
+        logger.info(
+            "SemanticCache enabled (threshold=%.2f, ttl=%ss)",
+            service_configs.semcache_threshold,
+            service_configs.semcache_ttl_sec,
+        )
+
 
 async def shutdown_extensions(app: Quart) -> None:
     """Clean up all asynchronous extensions on application shutdown."""
-    client = app.extensions["mcp"]
+    client = app.extensions.get("mcp")
     logger = get_logger(__name__)
     if client:
         await client.__aexit__(None, None, None)
         logger.info("MCPClient disconnected")
-        client = None
+        app.extensions["mcp"] = None
+
+    openai_client = app.extensions.pop("openai_client", None)
+    if openai_client is not None:
+        await openai_client.close()
+        logger.info("Shared OpenAI client closed")
+
+    embedding_client = app.extensions.pop("embedding_client", None)
+    if embedding_client is not None:
+        await embedding_client.close()
+
+    # Selesaikan antrian persist sebelum STM/DB ditutup
+    persist_queue = app.extensions.pop("persist_queue", None)
+    if persist_queue is not None:
+        await persist_queue.aclose()
+
+    # STM dulu (engine pinjaman → no-op), lalu pemilik engine
+    short_term_memory = app.extensions.pop("short_term_memory", None)
+    if short_term_memory is not None:
+        await short_term_memory.aclose()
+    models_db = app.extensions.pop("db", None)
+    if models_db is not None:
+        await models_db.aclose()
@@ -4,6 +4,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from sqlalchemy import (
+    event,
     String,
     Text,
     DateTime,
@@ -11,11 +12,16 @@ from sqlalchemy import (
     select,
     Index,
     ForeignKey,
-    Column,
-    Integer,
 )
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.exc import SQLAlchemyError
 
 from projectwise.utils.helper import truncate_by_tokens
@@ -23,22 +29,33 @@ from projectwise.utils.logger import get_logger
 
 
 logger = get_logger(__name__)
+
+# Dialek dengan INSERT ... ON CONFLICT DO NOTHING
+_ON_CONFLICT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
 Base = declarative_base()
 
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
-    id = Column(Integer, primary_key=True)
-    user_id = Column(String(64), unique=True, nullable=False)
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[str] = mapped_column(String(64), unique=True)
 
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
-    id = Column(Integer, primary_key=True)
-    user_id = Column(String(64), ForeignKey("chat_sessions.user_id"), nullable=False)
-    role = Column(String(16), nullable=False)
-    content = Column(Text, nullable=False)
-    timestamp = Column(DateTime, server_default=func.now())
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[str] = mapped_column(
+        String(64), ForeignKey("chat_sessions.user_id")
+    )
+    role: Mapped[str] = mapped_column(String(16))
+    content: Mapped[str] = mapped_column(Text())
+    timestamp: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, server_default=func.now()
+    )
 
 
 class WsMessage(Base):
@@ -54,6 +71,30 @@ class WsMessage(Base):
 
 
 Index("ix_ws_messages_room_ts", WsMessage.room_id, WsMessage.ts)
+# History per user: WHERE user_id=? ORDER BY id DESC LIMIT n → index range scan
+ix_chat_messages_user_id_id = Index(
+    "ix_chat_messages_user_id_id", ChatMessage.user_id, ChatMessage.id.desc()
+)
+
+
+# PRAGMA per koneksi: WAL (reader tidak memblok writer), fsync lebih ringan,
+# tunggu lock alih-alih langsung "database is locked"
+_SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-20000",
+)
+
+
+def _apply_sqlite_pragmas(dbapi_conn, _record) -> None:
+    cursor = dbapi_conn.cursor()
+    try:
+        for pragma in _SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
 
 
 class ModelDB:
@@ -64,7 +105,15 @@ class ModelDB:
         self._initialized = False
 
         try:
-            self._engine = create_async_engine(self.db_url, echo=False, future=True)
+            is_sqlite = self.db_url.startswith("sqlite")
+            self._engine = create_async_engine(
+                self.db_url,
+                echo=False,
+                future=True,
+                connect_args={"timeout": 30} if is_sqlite else {},
+            )
+            if is_sqlite:
+                event.listen(self._engine.sync_engine, "connect", _apply_sqlite_pragmas)
             self.Session = async_sessionmaker(
                 bind=self._engine,
                 class_=AsyncSession,
@@ -75,6 +124,23 @@ class ModelDB:
             logger.error("Gagal inisialisasi database: %s", e)
             raise
 
+    @property
+    def engine(self) -> AsyncEngine:
+        """AsyncEngine bersama (dipakai juga oleh ShortTermMemory)."""
+        return self._engine
+
+    async def aclose(self) -> None:
+        """Tutup pool koneksi (file handle SQLite) milik engine."""
+        await self._engine.dispose()
+        logger.info("ModelDB engine disposed")
+
+    async def __aenter__(self) -> "ModelDB":
+        await self.init_models()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
     async def init_models(self):
         """Init DB sekali dan buat tabel jika belum ada."""
         global _initialized
@@ -82,6 +148,8 @@ class ModelDB:
             return
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            # create_all melewati index untuk tabel yang sudah ada (DB lama)
+            await conn.run_sync(ix_chat_messages_user_id_id.create, checkfirst=True)
         self._initialized = True
 
 
@@ -95,14 +163,24 @@ class ModelDB:
 
         async with self.Session() as s:  # type: ignore
             try:
-                # Pastikan session ada
-                result = await s.execute(select(ChatSession).filter_by(user_id=user_id))
-                chat_session = result.scalars().first()
-                if not chat_session:
+                # Pastikan session ada: upsert idempoten bila dialek mendukung
+                # ON CONFLICT, selain itu SELECT lalu insert
+                insert_fn = _ON_CONFLICT_INSERTS.get(self._engine.dialect.name)
+                if insert_fn is not None:
+                    await s.execute(
+                        insert_fn(ChatSession)
+                        .values(user_id=user_id)
+                        .on_conflict_do_nothing(index_elements=["user_id"])
+                    )
+                elif (
+                    await s.scalar(
+                        select(ChatSession.id).filter_by(user_id=user_id).limit(1)
+                    )
+                ) is None:
                     s.add(ChatSession(user_id=user_id))
-                    await s.commit()
+                    await s.flush()
 
-                # Save chat ke db
+                # Save chat ke db — satu transaksi/commit untuk session + pesan
                 s.add(ChatMessage(user_id=user_id, role=role, content=content))
                 await s.commit()
             except Exception as ex:
@@ -116,27 +194,30 @@ class ModelDB:
         """Ambil chat history terbaru untuk user_id tertentu, urut dari lama ke baru.
         Format return: List[{"role": role, "content": content}, ...]
         """
-        limit = limit
+        # N pesan terbaru (DESC), lalu diurutkan ulang ASC di level SQL
+        # Hanya kolom yang dipakai (tuple Row, tanpa objek ORM/identity map)
+        latest = (
+            select(ChatMessage.id, ChatMessage.role, ChatMessage.content)
+            .filter_by(user_id=user_id)
+            .order_by(ChatMessage.id.desc())
+            .limit(limit)
+            .subquery()
+        )
 
         async with self.Session() as s:
             try:
                 result = await s.execute(
-                    select(ChatMessage)
-                    .filter_by(user_id=user_id)
-                    .order_by(ChatMessage.id.desc())
-                    .limit(limit)
+                    select(latest.c.role, latest.c.content).order_by(latest.c.id.asc())
                 )
-                raw = list(result.scalars().all())[::-1]  # Message object
+                rows = result.all()
             except Exception as ex:
                 logger.error("Gagal ambil history untuk user %s: %s", user_id, ex)
                 raise
 
-        lines: List[Dict[str, Any]] = []
-        for m in raw:
-            snippet = truncate_by_tokens(getattr(m, "content"), 1500)
-            lines.append({"role": getattr(m, "role"), "content": snippet})
-
-        return lines
+        return [
+            {"role": role, "content": truncate_by_tokens(content, 1500)}
+            for role, content in rows
+        ]
 
 
     # * --------------------------------------------------
@@ -155,20 +236,27 @@ class ModelDB:
         self, room_id: str, limit: int = 100
     ) -> List[Dict[str, Any]]:
         async with self.Session() as s:
+            # ts diformat di SQLite; CURRENT_TIMESTAMP tanpa pecahan detik sehingga
+            # hasilnya identik dengan datetime.isoformat() sebelumnya
             stmt = (
-                select(WsMessage)
+                select(
+                    WsMessage.type,
+                    WsMessage.sender,
+                    WsMessage.content,
+                    func.strftime("%Y-%m-%dT%H:%M:%S", WsMessage.ts),
+                )
                 .where(WsMessage.room_id == room_id)
                 .order_by(WsMessage.ts.asc())
                 .limit(limit)
             )
-            rows = (await s.execute(stmt)).scalars().all()
+            rows = (await s.execute(stmt)).all()
             return [
                 {
                     "room": room_id,
-                    "type": r.type,
-                    "from": r.sender,
-                    "content": r.content,
-                    "ts": r.ts.isoformat(),
+                    "type": mtype,
+                    "from": sender,
+                    "content": content,
+                    "ts": ts,
                 }
-                for r in rows
+                for mtype, sender, content, ts in rows
             ]
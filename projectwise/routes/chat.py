@@ -1,16 +1,39 @@
 # projectwise/routes/chat.py
 from __future__ import annotations
 
-from typing import Any, Dict, Tuple, Union, Optional
+import asyncio
+import re
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple, Union, Optional
 
 from quart import Blueprint, current_app, request, Response, jsonify
 
 from projectwise.utils.logger import get_logger
 from projectwise.utils.helper import response_error_toast, response_success_with_toast
+from projectwise.utils.json_provider import dumps_bytes, loads_bytes
 
 from projectwise.services.workflow.intent_classification import route_based_on_intent
 from projectwise.services.llm_chain.llm_chains import LLMChains
 from projectwise.services.workflow.chat_with_memory import ChatWithMemory
+from projectwise.services.cache.semantic_cache import SemanticCache
+from projectwise.services.cache.tool_cache import ToolResultCache
+from projectwise.services.llm_chain.llm_utils import serialize_tool_output
+from projectwise.services.mcp.client import MCPToolError
+from projectwise.services.memory.persist_queue import MemoryPersistQueue
+from projectwise.services.retrieval.query_synthesis import (
+    build_retrieval_query,
+    needs_llm_rewrite,
+)
+from projectwise.services.workflow.prompt_builder import (
+    KAK_FINALIZE_MSG,
+    KAK_TOOL_VALIDATORS,
+    KAK_TOOLS,
+    build_calc_messages,
+    build_kak_messages,
+    build_kak_query_rewrite_messages,
+    build_web_answer_messages,
+    build_web_query_rewrite_messages,
+)
 
 from dataclasses import dataclass
 from datetime import datetime
@@ -21,81 +44,99 @@ chat_bp = Blueprint("chat", __name__)
 logger = get_logger(__name__)
 
 # Tipe alias untuk hasil handler
-HandlerReply = Union[str, Dict[str, Any], Response, Tuple[Response, int]]
+# (AsyncIterator[str] = potongan jawaban final yang di-stream ke klien SSE)
+HandlerReply = Union[
+    str, Dict[str, Any], Response, Tuple[Response, int], AsyncIterator[str]
+]
 
 # Konstanta lokal
 HISTORY_LIMIT = 5
-
-
-@chat_bp.post("/message")
-async def chat_message() -> Tuple[Response, int]:
+# Kemiripan minimum untuk memakai ulang query-rewrite + hasil tool (KAK/Web)
+RETRIEVAL_CACHE_THRESHOLD = 0.90
+
+# Body response error konstan (diserialisasi sekali saat import)
+_ERR_BAD_JSON = dumps_bytes({"status": "error", "message": "Payload harus JSON."})
+_ERR_EMPTY_MESSAGE = dumps_bytes(
+    {"status": "error", "message": "Pesan tidak boleh kosong."}
+)
+_ERR_SERVER = dumps_bytes(
+    {
+        "status": "error",
+        "message": "Terjadi kesalahan pada server saat memproses pesan.",
+    }
+)
+
+_NOT_FOUND_MSG = "Maaf, saya tidak dapat menemukan informasi yang Anda butuhkan."
+# Angka dalam pertanyaan (mis. "10 mbps" vs "20 mbps") memisahkan namespace cache
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Argumen tetap MCP 'read_product_sizing_tool' (handler kalkulator)
+_CALC_SIZING_ARGS: Dict[str, str] = {
+    "filename": "internet_dedicated",
+    "category": "datacom",
+    "product": "internet_dedicated",
+    "tahun": "2025",
+}
+
+
+# ============================================================
+# Konteks per-request (dibangun sekali di chat_message)
+# ============================================================
+@dataclass(slots=True)
+class RequestCtx:
     """
-    Endpoint utama percakapan.
-
-    High level flow:
-      1) Ambil payload user.
-      2) Siapkan dependency dari app.extensions (MCP, LLM, STM/LTM, service configs).
-      3) Definisikan handler per-intent (KAK, Web, Proposal, Calc, Other).
-      4) Klasifikasikan intent & route ke handler terkait.
-      5) Persist ke Short-Term & Long-Term memory (disentralisasi di sini).
-      6) Normalisasi & kirim HTTP response.
-
-    Returns:
-        (Response, http_status)
+    Dependency & state satu request /message. Helper dan handler per-intent
+    berada di level modul dan menerima ctx ini secara eksplisit (tanpa closure
+    baru per request).
     """
-    # ----------------------------
-    # 1) Ambil payload user
-    # ----------------------------
-    try:
-        request_data = await request.get_json(force=True)
-    except Exception:
-        logger.exception("[chat] Payload bukan JSON valid.")
-        return jsonify({"status": "error", "message": "Payload harus JSON."}), 400
 
-    user_id: str = (request_data.get("user_id") or "default").strip()
-    user_text: str = (request_data.get("message") or "").strip()
-
-    if not user_text:
-        return jsonify({"status": "error", "message": "Pesan tidak boleh kosong."}), 400
-
-    logger.info(
-        "[chat] POST /message start | user=%s | msg.len=%d", user_id, len(user_text)
-    )
-
-    # ----------------------------
-    # 2) Ambil dependency dari app
-    # ----------------------------
-    app = current_app
-    mcp_client = app.extensions["mcp"]
-    llm_client = LLMChains(prefer="chat")
-    short_term = app.extensions["short_term_memory"]
-    long_term = app.extensions["long_term_memory"]
-    service_configs = app.extensions["service_configs"]
-    mcp_status = app.extensions.get("mcp_status", {"connected": False})
-
-    memory_orchestrator = ChatWithMemory(
-        long_term=long_term,
-        short_term=short_term,
-        service_configs=service_configs,
-        max_history=HISTORY_LIMIT,
-    )
+    user_id: str
+    user_text: str
+    want_stream: bool
+    mcp_client: Any
+    llm_client: LLMChains
+    mcp_status: Dict[str, Any]
+    memory_orchestrator: ChatWithMemory
+    persist_queue: MemoryPersistQueue
+    tool_cache: ToolResultCache
+    semantic_cache: Optional[SemanticCache]
+    # Prefetch STM/LTM (berjalan paralel dengan klasifikasi intent)
+    history_task: "asyncio.Task[Any]"
+    memories_task: "asyncio.Task[Any]"
+    # False bila jawaban tidak boleh masuk semantic cache (fallback/error, atau
+    # intent yang jawabannya bergantung pada data volatil: KAK, kalkulator)
+    reply_cacheable: bool = True
 
     # ----------------------------
     # Helper: MCP connection check
     # ----------------------------
-    def mcp_required() -> Optional[Tuple[Response, int]]:
+    def mcp_required(self) -> Optional[Tuple[Response, int]]:
         """Early-return Response apabila MCP belum terhubung."""
-        if not mcp_status.get("connected"):
+        if not self.mcp_status.get("connected"):
             logger.warning("[chat] MCP belum terhubung.")
             return response_error_toast(
                 status="error", message="MCP belum terhubung.", http_status=503
             )
         return None
 
+    # ----------------------------
+    # Helper: jawaban final LLM (stream untuk klien SSE, teks penuh selain itu)
+    # ----------------------------
+    async def final_answer(
+        self, messages: List[Dict[str, Any]]
+    ) -> Union[str, AsyncIterator[str]]:
+        """
+        Error saat stream baru muncul ketika iterasi (dikirim sebagai event
+        'error' oleh _sse_response), bukan di try/except handler.
+        """
+        if self.want_stream:
+            return self.llm_client.chat_completions_stream(messages)
+        return await self.llm_client.chat_completions_text(messages=messages)
+
     # ----------------------------
     # Helper: safe call MCP tool
     # ----------------------------
-    async def safe_call_mcp_tool(tool_name: str, args: Dict[str, Any]) -> Any:
+    async def safe_call_mcp_tool(self, tool_name: str, args: Dict[str, Any]) -> Any:
         """
         Membungkus pemanggilan MCP tool dengan penanganan error dan logging standard.
 
@@ -104,15 +145,30 @@ async def chat_message() -> Tuple[Response, int]:
             args: Argumen untuk tool tersebut.
 
         Returns:
-            Hasil dari MCP tool (apa adanya). Jika gagal, mengembalikan dict error ringkas.
+            Hasil dari MCP tool (apa adanya). Jika gagal (exception atau isError dari
+            tool), mengembalikan dict error ringkas yang tidak pernah dicache.
+            Hanya hasil sukses tool cacheable (retrieval/websearch) masuk tool_cache.
         """
+        cached = self.tool_cache.get(tool_name, args)
+        if cached is not None:
+            return cached
         try:
             logger.info(
                 "[chat] MCP call_tool start | tool=%s | args=%s", tool_name, args
             )
-            result = await mcp_client.call_tool(tool_name, args)
+            result = await self.mcp_client.call_tool(
+                tool_name, args, raise_on_error=True
+            )
             logger.info("[chat] MCP call_tool done  | tool=%s", tool_name)
+            self.tool_cache.put(tool_name, args, result)
             return result
+        except MCPToolError as e:
+            # Error di sisi tool: isi error tetap diteruskan ke LLM, tanpa cache
+            return {
+                "status": "error",
+                "message": f"Tool '{tool_name}' mengembalikan error.",
+                "detail": serialize_tool_output(e.content),
+            }
         except Exception:
             logger.exception("[chat] Gagal memanggil MCP tool '%s'.", tool_name)
             return {
@@ -120,292 +176,352 @@ async def chat_message() -> Tuple[Response, int]:
                 "message": f"Gagal memanggil tool '{tool_name}'. Silakan coba lagi.",
             }
 
-    # ============================================================
-    # 3) Handlers per-intent
-    # ============================================================
-    async def _handle_kak(q: str, _cls: Any) -> HandlerReply:
-        """
-        Handler untuk intent 'KAK Analyzer':
-        - Membangun query retrieval berbasis history & long-term memory.
-        - Mengambil konteks dari MCP 'retrieval_tool'.
-        - Meminta LLM melakukan function-call 'read_kak_analysis_tool' bila perlu.
-        - Menghasilkan jawaban final dari LLM.
-        """
-        # Pastikan MCP terhubung
-        mcp_error = mcp_required()
-        if mcp_error:
-            return mcp_error
+    # ----------------------------
+    # Helper: cache query-rewrite + hasil tool (per handler & user)
+    # ----------------------------
+    async def retrieval_cache_get(
+        self, kind: str, q: str
+    ) -> Optional[Tuple[str, Any]]:
+        """(query_text, hasil_tool) dari pertanyaan serupa sebelumnya, atau None."""
+        if self.semantic_cache is None:
+            return None
+        return await self.semantic_cache.lookup(
+            f"{kind}:{self.user_id}", q, threshold=RETRIEVAL_CACHE_THRESHOLD
+        )
+
+    def retrieval_cache_put(
+        self, kind: str, q: str, query_text: str, result: Any
+    ) -> None:
+        """Simpan di background; hasil error dari safe_call_mcp_tool tidak dicache."""
+        if self.semantic_cache is None:
+            return
+        if isinstance(result, dict) and result.get("status") == "error":
+            return
+        self.semantic_cache.store_later(
+            f"{kind}:{self.user_id}", q, (query_text, result)
+        )
+
+    # ----------------------------
+    # Helper: persist ke memori (best-effort, background via persist_queue)
+    # ----------------------------
+    def remember(self, text: str, *, cacheable: bool = True) -> bool:
+        """Jadwalkan persist (+ semantic cache); False bila antrian persist penuh."""
+        queued = self.persist_queue.submit(self.user_id, self.user_text, text)
+        # Hanya jawaban teks yang ditandai cacheable oleh handler (lihat fallback())
+        if (
+            self.semantic_cache is not None
+            and cacheable
+            and self.reply_cacheable
+            and text
+        ):
+            self.semantic_cache.store_later(
+                _reply_cache_ns(self.user_id, self.user_text), self.user_text, text
+            )
+        return queued
+
+    def fallback(self, text: str) -> str:
+        """Pesan fallback/error handler: dikirim ke user, tidak masuk semantic cache."""
+        self.reply_cacheable = False
+        return text
+
 
-        # 0) Bangun query pencarian untuk retrieval (maks 300 char, hanya text)
+# ============================================================
+# Handlers per-intent
+# ============================================================
+async def _handle_kak(ctx: RequestCtx, q: str, _cls: Any) -> HandlerReply:
+    """
+    Handler untuk intent 'KAK Analyzer':
+    - Membangun query retrieval dari template (q + history); LLM bila ambigu.
+    - Mengambil konteks dari MCP 'retrieval_tool'.
+    - Meminta LLM melakukan function-call 'read_kak_analysis_tool' bila perlu.
+    - Menghasilkan jawaban final dari LLM.
+    """
+    # Jawaban bergantung pada isi dokumen terindeks (berubah setelah ingestion)
+    ctx.reply_cacheable = False
+    # Pastikan MCP terhubung
+    mcp_error = ctx.mcp_required()
+    if mcp_error:
+        return mcp_error
+
+    # 0) Bangun query pencarian untuk retrieval (maks 300 char, hanya text)
+    #    — dilewati bila pertanyaan serupa baru saja diproses (cache);
+    #    LLM hanya dipakai bila pertanyaan ambigu (pendek / berisi kata ganti)
+    cached = await ctx.retrieval_cache_get("kak", q)
+    if cached is not None:
+        search_query_text, retrieve = cached
+        memories = await ctx.memories_task
+    else:
         try:
-            search_query_text = await llm_client.chat_completions_text(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Hasilkan maksimal '300 text' query instruction untuk pencarian retrieval "
-                            "vectordb yang tepat berdasarkan informasi yang diberikan. "
-                            "Output hanya text query tanpa penjelasan dan format apapun."
-                        ),
-                    },
-                    {
-                        "role": "system",
-                        "content": f"Conversation History:\n{await short_term.get_history(user_id, limit=HISTORY_LIMIT)}",
-                    },
-                    {
-                        "role": "system",
-                        "content": f"Relevan memory:\n{await long_term.get_memories_v2(query=q, user_id=user_id, limit=HISTORY_LIMIT)}",
-                    },
-                    {"role": "user", "content": q},
-                ]
+            # STM & LTM (prefetch) — LTM dipakai ulang di langkah 1
+            history, memories = await asyncio.gather(
+                ctx.history_task, ctx.memories_task
             )
+            if needs_llm_rewrite(q):
+                search_query_text = await ctx.llm_client.chat_completions_text(
+                    messages=build_kak_query_rewrite_messages(q, history, memories)
+                )
+            else:
+                search_query_text = build_retrieval_query(q, history)
         except Exception:
             logger.exception("[chat] Gagal membangun query retrieval (LLM).")
-            return "Maaf, terjadi kendala saat menyiapkan pencarian konteks."
+            return ctx.fallback(
+                "Maaf, terjadi kendala saat menyiapkan pencarian konteks."
+            )
 
         # 0.1) Ambil dokumen relevan dari MCP
-        retrieve = await safe_call_mcp_tool(
+        retrieve = await ctx.safe_call_mcp_tool(
             "retrieval_tool", {"query": search_query_text, "k": 5}
         )
+        ctx.retrieval_cache_put("kak", q, search_query_text, retrieve)
 
-        # 1) Siapkan pesan awal untuk LLM
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "Anda adalah asisten yang membantu menjawab pertanyaan berdasarkan hasil analysis proyek. "
-                    "Gunakan tools yang tersedia untuk mendapatkan informasi yang dibutuhkan."
-                ),
-            },
-            {"role": "system", "content": f"Context dari MCP:\n{retrieve}"},
-            {
-                "role": "system",
-                "content": f"Relevan memory:\n{await long_term.get_memories_v2(query=q, user_id=user_id, limit=HISTORY_LIMIT)}",
-            },
-            {"role": "user", "content": q},
-        ]
-
-        # 2) Skema tools (OpenAI Chat Completions)
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "read_kak_analysis_tool",
-                    "description": "Read KAK analysis.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "filename": {
-                                "type": "string",
-                                "description": "Nama file KAK.",
-                            },
-                            "pelanggan": {
-                                "type": "string",
-                                "description": "Nama pelanggan.",
-                            },
-                            "project": {
-                                "type": "string",
-                                "description": "Nama project.",
-                            },
-                            "tahun": {
-                                "type": "string",
-                                "description": "Tahun project KAK (YYYY).",
-                            },
-                        },
-                        "required": ["filename", "pelanggan", "project", "tahun"],
-                        "additionalProperties": False,
-                    },
-                },
-            }
-        ]
-
-        # 3) Minta model melakukan function-call
-        try:
-            tool_calls, _raw = await llm_client.chat_function_call(
-                messages=messages, tools=tools, tool_choice="auto"
-            )
-        except Exception:
-            logger.exception("[chat] Gagal menghasilkan function-call (LLM).")
-            return "Maaf, terjadi kendala saat menyiapkan langkah-langkah analisis."
-
-        # 4) Eksekusi tool yang diminta model dan lampirkan hasilnya
-        if tool_calls:
-            for call in tool_calls:
-                tool_name = call["name"]
-                tool_args = call["arguments"]  # sudah dict
-                out = await safe_call_mcp_tool(tool_name, tool_args)
-
-                messages.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": call["id"],
-                        "name": tool_name,
-                        "content": str(out),  # OpenAI merekomendasikan string
-                    }
-                )
+    # 1) Siapkan pesan awal untuk LLM
+    messages = build_kak_messages(q, retrieve, memories)
 
-        # 5) Tambahkan instruksi kecil untuk merangkum hasil tool
-        messages.append(
-            {
-                "role": "user",
-                "content": "Gunakan hasil tool di atas lalu berikan jawaban final.",
-            }
+    # 2) Function-call (skema: KAK_TOOLS) + eksekusi tool paralel, satu await
+    try:
+        messages, direct_text = await ctx.llm_client.chat_tool_round(
+            messages,
+            tools=KAK_TOOLS,
+            executor=ctx.safe_call_mcp_tool,
+            validators=KAK_TOOL_VALIDATORS,
+        )
+    except Exception:
+        logger.exception("[chat] Gagal menjalankan function-call (LLM/MCP).")
+        return ctx.fallback(
+            "Maaf, terjadi kendala saat menyiapkan langkah-langkah analisis."
         )
 
-        # 6) Jawaban final dari model (tanpa tools)
-        try:
-            final_text = await llm_client.chat_completions_text(messages=messages)
-        except Exception:
-            logger.exception("[chat] Gagal menghasilkan jawaban final (LLM).")
-            return "Maaf, terjadi kendala saat menghasilkan jawaban final."
+    # 3) Model menjawab tanpa tool → jawaban itu final (tanpa LLM call tambahan)
+    if direct_text:
+        return direct_text
 
-        return final_text
+    # 4) Tambahkan instruksi kecil untuk merangkum hasil tool
+    messages.append(KAK_FINALIZE_MSG)
 
-    async def _handle_web(q: str, _cls: Any) -> HandlerReply:
-        """
-        Handler untuk intent 'Web Search':
-        - Membangun query pencarian web dari history/memori.
-        - Memanggil MCP 'websearch_tool'.
-        - Menggabungkan hasil pencarian + memori untuk merumuskan jawaban.
-        """
-        mcp_error = mcp_required()
-        if mcp_error:
-            return mcp_error
+    # 5) Jawaban final dari model (tanpa tools)
+    try:
+        final_text = await ctx.final_answer(messages)
+    except Exception:
+        logger.exception("[chat] Gagal menghasilkan jawaban final (LLM).")
+        return ctx.fallback("Maaf, terjadi kendala saat menghasilkan jawaban final.")
+
+    return final_text
 
+
+async def _handle_web(ctx: RequestCtx, q: str, _cls: Any) -> HandlerReply:
+    """
+    Handler untuk intent 'Web Search':
+    - Membangun query pencarian web dari template (q + history); LLM bila ambigu.
+    - Memanggil MCP 'websearch_tool'.
+    - Menggabungkan hasil pencarian + memori untuk merumuskan jawaban.
+    """
+    mcp_error = ctx.mcp_required()
+    if mcp_error:
+        return mcp_error
+
+    # Query-rewrite + hasil websearch dipakai ulang untuk pertanyaan serupa (cache);
+    # query-rewrite via LLM hanya untuk pertanyaan ambigu
+    cached = await ctx.retrieval_cache_get("web", q)
+    if cached is not None:
+        search_query_text, search_results = cached
+        memories = await ctx.memories_task
+    else:
         try:
-            search_query_text = await llm_client.chat_completions_text(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Hasilkan maksimal '300 text' query instruction untuk pencarian web yang tepat "
-                            "berdasarkan informasi memory. Output hanya text query tanpa penjelasan dan format apapun."
-                        ),
-                    },
-                    {
-                        "role": "system",
-                        "content": f"Memory:\n{await short_term.get_history(user_id, limit=HISTORY_LIMIT)}",
-                    },
-                    {"role": "user", "content": q},
-                ]
+            # STM (untuk query-rewrite) & LTM (untuk jawaban) dari prefetch
+            history, memories = await asyncio.gather(
+                ctx.history_task, ctx.memories_task
             )
+            if needs_llm_rewrite(q):
+                search_query_text = await ctx.llm_client.chat_completions_text(
+                    messages=build_web_query_rewrite_messages(q, history)
+                )
+            else:
+                search_query_text = build_retrieval_query(q, history)
         except Exception:
             logger.exception("[chat] Gagal membangun query web (LLM).")
-            return "Maaf, terjadi kendala saat menyiapkan pencarian web."
+            return ctx.fallback("Maaf, terjadi kendala saat menyiapkan pencarian web.")
 
-        search_results = await safe_call_mcp_tool(
+        search_results = await ctx.safe_call_mcp_tool(
             "websearch_tool", {"query": search_query_text, "max_results": 7}
         )
+        ctx.retrieval_cache_put("web", q, search_query_text, search_results)
 
-        try:
-            result_text = await llm_client.chat_completions_text(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Bertindak sebagai asisten yang membantu menjawab pertanyaan berdasarkan hasil pencarian. "
-                            "Berikan informasi apapun yang dapat Anda temukan beserta sumbernya."
-                        ),
-                    },
-                    {
-                        "role": "assistant",
-                        "content": f"Hasil pencarian web:\n{search_results}",
-                    },
-                    {
-                        "role": "system",
-                        "content": f"Relevan memory:\n{await long_term.get_memories_v2(query=q, user_id=user_id, limit=HISTORY_LIMIT)}",
-                    },
-                    {"role": "user", "content": q},
-                ]
-            )
-        except Exception:
-            logger.exception(
-                "[chat] Gagal merumuskan jawaban dari hasil pencarian (LLM)."
-            )
-            return "Maaf, terjadi kendala saat merangkum hasil pencarian."
+    if isinstance(search_results, dict) and search_results.get("status") == "error":
+        # Jawaban dari hasil pencarian yang gagal tidak dicache
+        ctx.reply_cacheable = False
 
-        return (
-            result_text
-            or "Maaf, saya tidak dapat menemukan informasi yang Anda butuhkan."
+    try:
+        result_text = await ctx.final_answer(
+            build_web_answer_messages(q, search_results, memories)
         )
+    except Exception:
+        logger.exception(
+            "[chat] Gagal merumuskan jawaban dari hasil pencarian (LLM)."
+        )
+        return ctx.fallback("Maaf, terjadi kendala saat merangkum hasil pencarian.")
 
-    async def _handle_proposal(_q: str, _cls: Any) -> HandlerReply:
-        """
-        Handler untuk intent 'Proposal Generation' (mode terbatas / placeholder).
-        """
-        mcp_error = mcp_required()
-        if mcp_error:
-            return mcp_error
-
-        return response_success_with_toast(
-            reply="Fitur belum tersedia penuh.",
-            message="Fitur belum tersedia (mode terbatas).",
-            severity="warning",
-            http_status=200,
+    return result_text or ctx.fallback(_NOT_FOUND_MSG)
+
+
+async def _handle_proposal(ctx: RequestCtx, _q: str, _cls: Any) -> HandlerReply:
+    """
+    Handler untuk intent 'Proposal Generation' (mode terbatas / placeholder).
+    """
+    mcp_error = ctx.mcp_required()
+    if mcp_error:
+        return mcp_error
+
+    return response_success_with_toast(
+        reply="Fitur belum tersedia penuh.",
+        message="Fitur belum tersedia (mode terbatas).",
+        severity="warning",
+        http_status=200,
+    )
+
+
+async def _handle_calc(ctx: RequestCtx, q: str, _cls: Any) -> HandlerReply:
+    """
+    Handler untuk intent 'Product Calculator':
+    - Membaca panduan pricing via MCP 'read_product_sizing_tool'.
+    - Meminta LLM melakukan perhitungan berdasarkan panduan.
+    """
+    # Harga bergantung pada parameter numerik yang mudah lolos ambang kemiripan
+    ctx.reply_cacheable = False
+    mcp_error = ctx.mcp_required()
+    if mcp_error:
+        return mcp_error
+
+    try:
+        # Ambil panduan pricing (MCP) & history (STM, prefetch) bersamaan
+        sizing, history = await asyncio.gather(
+            ctx.safe_call_mcp_tool("read_product_sizing_tool", _CALC_SIZING_ARGS),
+            ctx.history_task,
+        )
+        result_text = await ctx.final_answer(build_calc_messages(q, sizing, history))
+    except Exception:
+        logger.exception("[chat] Gagal menghasilkan hasil perhitungan (LLM).")
+        return ctx.fallback(
+            "Maaf, terjadi kendala saat menghitung harga berdasarkan panduan."
         )
 
-    async def _handle_calc(q: str, _cls: Any) -> HandlerReply:
-        """
-        Handler untuk intent 'Product Calculator':
-        - Membaca panduan pricing via MCP 'read_product_sizing_tool'.
-        - Meminta LLM melakukan perhitungan berdasarkan panduan.
-        """
-        mcp_error = mcp_required()
-        if mcp_error:
-            return mcp_error
-
-        # Ambil panduan pricing
-        sizing = await safe_call_mcp_tool(
-            "read_product_sizing_tool",
-            {
-                "filename": "internet_dedicated",
-                "category": "datacom",
-                "product": "internet_dedicated",
-                "tahun": "2025",
-            },
+    return result_text or ctx.fallback(_NOT_FOUND_MSG)
+
+
+async def _handle_other(ctx: RequestCtx, q: str, _cls: Any) -> HandlerReply:
+    """
+    Handler fallback untuk intent 'Other':
+    - Menggunakan ChatWithMemory untuk percakapan kontekstual berbasis STM/LTM.
+    """
+    # Jawaban bergantung pada history STM (mis. "lanjutkan", "yang kedua?"),
+    # bukan pertanyaan saja → jangan masuk semantic cache
+    ctx.reply_cacheable = False
+    try:
+        history, memories = await asyncio.gather(ctx.history_task, ctx.memories_task)
+        reply = await ctx.memory_orchestrator.chat(
+            user_id=ctx.user_id, user_message=q, history=history, memories=memories
+        )
+        return reply
+    except Exception:
+        logger.exception("[chat] Gagal menjalankan ChatWithMemory.")
+        return ctx.fallback(
+            "Maaf, terjadi kendala saat menjalankan percakapan berbasis memori."
         )
 
-        try:
-            result_text = await llm_client.chat_completions_text(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Tugas Anda adalah menghitung harga produk berdasarkan panduan yang tersedia. "
-                            "Berikan jawaban yang jelas dan ringkas. Jika ada asumsi yang Anda buat, sebutkan secara eksplisit."
-                        ),
-                    },
-                    {
-                        "role": "system",
-                        "content": f"Panduan menghitung harga:\n{sizing}",
-                    },
-                    {
-                        "role": "system",
-                        "content": f"Conversation History:\n{await short_term.get_history(user_id, limit=HISTORY_LIMIT)}",
-                    },
-                    {"role": "user", "content": q},
-                ]
-            )
-        except Exception:
-            logger.exception("[chat] Gagal menghasilkan hasil perhitungan (LLM).")
-            return "Maaf, terjadi kendala saat menghitung harga berdasarkan panduan."
 
-        return (
-            result_text
-            or "Maaf, saya tidak dapat menemukan informasi yang Anda butuhkan."
+@chat_bp.post("/message")
+async def chat_message() -> Tuple[Response, int]:
+    """
+    Endpoint utama percakapan.
+
+    High level flow:
+      1) Ambil payload user.
+      2) Siapkan dependency dari app.extensions (MCP, LLM, STM/LTM, service configs).
+      3) Bangun RequestCtx (handler per-intent ada di level modul).
+      4) Klasifikasikan intent & route ke handler terkait.
+      5) Jadwalkan persist Short-Term & Long-Term memory (background queue).
+      6) Normalisasi & kirim HTTP response (JSON, atau SSE bila klien mengirim
+         `Accept: text/event-stream`).
+
+    Returns:
+        (Response, http_status)
+    """
+    # ----------------------------
+    # 1) Ambil payload user
+    # ----------------------------
+    # Body mentah di-parse langsung (orjson); Content-Type diabaikan seperti force=True
+    try:
+        request_data = loads_bytes(await request.get_data(cache=False))
+    except Exception:
+        logger.exception("[chat] Payload bukan JSON valid.")
+        return _json_bytes_response(_ERR_BAD_JSON), 400
+    if not isinstance(request_data, dict):
+        return _json_bytes_response(_ERR_BAD_JSON), 400
+
+    user_id: str = (request_data.get("user_id") or "default").strip()
+    user_text: str = (request_data.get("message") or "").strip()
+
+    if not user_text:
+        return _json_bytes_response(_ERR_EMPTY_MESSAGE), 400
+
+    # Klien SSE menerima jawaban final per token (TTFB = latensi token pertama)
+    want_stream = "text/event-stream" in request.headers.get("Accept", "")
+
+    logger.info(
+        "[chat] POST /message start | user=%s | msg.len=%d", user_id, len(user_text)
+    )
+
+    # ----------------------------
+    # 2) Ambil dependency dari app
+    # ----------------------------
+    app = current_app
+    llm_client: LLMChains = app.extensions["llm_chains"]
+    short_term = app.extensions["short_term_memory"]
+    long_term = app.extensions["long_term_memory"]
+    service_configs = app.extensions["service_configs"]
+    semantic_cache: Optional[SemanticCache] = app.extensions.get("semantic_cache")
+    persist_queue: MemoryPersistQueue = app.extensions["persist_queue"]
+
+    # ----------------------------
+    # Semantic cache: pertanyaan (hampir) sama dari user yang sama → jawaban tersimpan
+    # (hanya diisi intent yang jawabannya bergantung pada pertanyaan saja, mis. web)
+    # ----------------------------
+    if semantic_cache is not None:
+        cached_reply = await semantic_cache.lookup(
+            _reply_cache_ns(user_id, user_text), user_text
         )
+        if cached_reply is not None:
+            persist_queue.submit(user_id, user_text, cached_reply, long_term=False)
+            logger.info("[chat] semantic cache hit | user=%s", user_id)
+            if want_stream:
+                return _sse_response(_iter_once(cached_reply), lambda _text: None)
+            return _normalize_reply_to_http(cached_reply)
 
-    async def _handle_other(q: str, _cls: Any) -> HandlerReply:
-        """
-        Handler fallback untuk intent 'Other':
-        - Menggunakan ChatWithMemory untuk percakapan kontekstual berbasis STM/LTM.
-        """
-        try:
-            reply = await memory_orchestrator.chat(user_id=user_id, user_message=q)
-            return reply
-        except Exception:
-            logger.exception("[chat] Gagal menjalankan ChatWithMemory.")
-            return "Maaf, terjadi kendala saat menjalankan percakapan berbasis memori."
+    # ============================================================
+    # 3) Konteks request
+    #    — STM/LTM di-prefetch paralel dengan LLM klasifikasi; handler
+    #      meng-await task yang sudah berjalan (q == user_text).
+    # ============================================================
+    ctx = RequestCtx(
+        user_id=user_id,
+        user_text=user_text,
+        want_stream=want_stream,
+        mcp_client=app.extensions["mcp"],
+        llm_client=llm_client,
+        mcp_status=app.extensions.get("mcp_status", {"connected": False}),
+        # Dibuat sekali di init_extensions (max_history = HISTORY_LIMIT)
+        memory_orchestrator=app.extensions["chat_ai"],
+        persist_queue=persist_queue,
+        tool_cache=app.extensions["tool_cache"],
+        semantic_cache=semantic_cache,
+        history_task=asyncio.create_task(
+            short_term.get_history(user_id, limit=HISTORY_LIMIT)
+        ),
+        memories_task=asyncio.create_task(
+            long_term.get_memories_v2(
+                query=user_text, user_id=user_id, limit=HISTORY_LIMIT
+            )
+        ),
+    )
 
     # ============================================================
     # 4) Klasifikasi intent & routing ke handler
@@ -413,13 +529,14 @@ async def chat_message() -> Tuple[Response, int]:
     try:
         reply, cls_info = await route_based_on_intent(
             query=user_text,
-            on_proposal_generation=_handle_proposal,
-            on_kak_analyzer=_handle_kak,
-            on_product_calculator=_handle_calc,
-            on_web_search=_handle_web,
-            on_other=_handle_other,
+            on_proposal_generation=partial(_handle_proposal, ctx),
+            on_kak_analyzer=partial(_handle_kak, ctx),
+            on_product_calculator=partial(_handle_calc, ctx),
+            on_web_search=partial(_handle_web, ctx),
+            on_other=partial(_handle_other, ctx),
             confidence_threshold=service_configs.intent_classification_threshold,
             prefer="chat",
+            llm=llm_client,
         )
         logger.info(
             "[chat] intent routed | cls=%s | reply.type=%s",
@@ -428,36 +545,93 @@ async def chat_message() -> Tuple[Response, int]:
         )
     except Exception:
         logger.exception("[chat] Gagal memproses routing/handler.")
-        return jsonify(
-            {
-                "status": "error",
-                "message": "Terjadi kesalahan pada server saat memproses pesan.",
-            }
-        ), 500
+        return _json_bytes_response(_ERR_SERVER), 500
+    finally:
+        # Prefetch yang tidak dipakai handler (mis. proposal) dibatalkan/diambil
+        # hasilnya agar tidak ada "Task exception was never retrieved".
+        for task in (ctx.history_task, ctx.memories_task):
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
 
     # ============================================================
-    # 5) Persist ke memori (best-effort, disentralisasi)
+    # 5-6) Persist ke memori (ctx.remember) & kirim response
     # ============================================================
-    try:
-        await short_term.save(user_id, "user", user_text)
-        await short_term.save(user_id, "assistant", str(reply))
-        await long_term.add_memory_v2(
-            [
-                {"role": "user", "content": user_text},
-                {"role": "assistant", "content": str(reply)},
-            ],
-            user_id=user_id,
-        )
-        logger.info("[chat] memory persisted | user=%s", user_id)
-    except Exception:
-        logger.exception("[chat] Gagal menyimpan memori (STM/LTM).")
+    if want_stream and isinstance(reply, str):
+        reply = _iter_once(reply)
+    if hasattr(reply, "__aiter__"):
+        # Persist dijadwalkan setelah stream selesai (teks lengkap)
+        return _sse_response(reply, ctx.remember)  # type: ignore[arg-type]
 
-    # ============================================================
-    # 6) Normalisasi & kirim response
-    # ============================================================
+    # Konversi ke teks sekali saja; dipakai bersama oleh persist & response
+    if isinstance(reply, (bytes, bytearray)):
+        reply = reply.decode(errors="ignore")
+    elif not isinstance(reply, (str, dict, tuple, Response)):
+        reply = str(reply)
+
+    if isinstance(reply, str):
+        if not ctx.remember(reply):
+            # Backpressure: jawaban tetap dikirim, user diberi peringatan (toast)
+            return response_success_with_toast(
+                reply=reply,
+                message="Server sibuk: percakapan ini tidak tersimpan ke memori.",
+                severity="warning",
+            )
+    else:
+        ctx.remember(str(reply), cacheable=False)
     return _normalize_reply_to_http(reply)
 
 
+def _json_bytes_response(body: bytes) -> Response:
+    """Response JSON dari body yang sudah diserialisasi (Content-Length dari bytes)."""
+    return Response(body, content_type="application/json")
+
+
+def _reply_cache_ns(user_id: str, text: str) -> str:
+    """Namespace semantic cache jawaban: user + angka di pertanyaan (bila ada)."""
+    numbers = _NUMBER_RE.findall(text)
+    if not numbers:
+        return user_id
+    return f"{user_id}#{'-'.join(numbers)}"
+
+
+async def _iter_once(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+def _sse_response(
+    chunks: AsyncIterator[str], on_complete: Callable[[str], None]
+) -> Tuple[Response, int]:
+    """
+    Kirim jawaban sebagai Server-Sent Events:
+    `delta` per potongan teks, lalu `completed` (berisi teks lengkap) atau `error`.
+    on_complete(teks_lengkap) dipanggil sekali setelah stream selesai tanpa error.
+    """
+    dumps = current_app.json.dumps
+
+    async def _events() -> AsyncIterator[str]:
+        parts: List[str] = []
+        try:
+            async for delta in chunks:
+                parts.append(delta)
+                yield f"data: {dumps({'type': 'delta', 'content': delta})}\n\n"
+        except Exception:
+            logger.exception("[chat] Gagal men-stream jawaban final (LLM).")
+            message = "Maaf, terjadi kendala saat menghasilkan jawaban final."
+            yield f"data: {dumps({'type': 'error', 'message': message})}\n\n"
+            return
+        text = "".join(parts)
+        on_complete(text)
+        yield f"data: {dumps({'type': 'completed', 'reply': text})}\n\n"
+
+    response = Response(_events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # nonaktifkan buffering proxy
+    response.timeout = None  # durasi stream mengikuti panjang generasi
+    return response, 200
+
+
 def _normalize_reply_to_http(reply: HandlerReply) -> Tuple[Response, int]:
     """
     Menormalkan berbagai tipe hasil handler menjadi (Response, status).
@@ -486,7 +660,9 @@ def _normalize_reply_to_http(reply: HandlerReply) -> Tuple[Response, int]:
     if not isinstance(reply, str):
         reply = str(reply)
 
-    return jsonify({"status": "success", "reply": reply}), 200
+    # Payload str murni → serialisasi langsung ke bytes (tanpa jsonify)
+    body = dumps_bytes({"status": "success", "reply": reply})
+    return _json_bytes_response(body), 200
 
 
 @chat_bp.post("/echo")
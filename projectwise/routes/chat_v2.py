@@ -1,23 +1,93 @@
 # projectwise/routes/chat.py
 from __future__ import annotations
 
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
 from quart import Blueprint, current_app, request, Response, jsonify
 
 from projectwise.utils.logger import get_logger
 from projectwise.utils.helper import response_error_toast, response_success_with_toast
+from projectwise.utils.json_provider import loads_bytes
 
 from projectwise.services.workflow.intent_classification import route_based_on_intent
-from projectwise.services.llm_chain.llm_chains import LLMChains
-from projectwise.services.workflow.chat_with_memory import ChatWithMemory
+from projectwise.services.mcp.client import MCPToolError
+from projectwise.services.workflow.prompt_builder import (
+    KAK_FINALIZE_MSG,
+    KAK_TOOL_VALIDATORS,
+    KAK_TOOLS,
+    build_calc_messages,
+    build_kak_messages,
+    build_kak_query_rewrite_messages,
+    build_web_answer_messages,
+    build_web_query_rewrite_messages,
+)
 
 
 chat_bp = Blueprint("chat", __name__)
 logger = get_logger(__name__)
 
+# LRU hasil query-rewrite (LLM) untuk retrieval/websearch;
+# kunci = hash(jenis, q, history, memories) → giliran identik tidak memanggil LLM lagi
+_QREWRITE_MAXSIZE = 256
+_QREWRITE_CACHE: OrderedDict[bytes, str] = OrderedDict()
+
+
+def _qrewrite_key(*parts: Any) -> bytes:
+    raw = "\0".join(str(p) for p in parts).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+async def _cached_rewrite(key: bytes, produce: Callable[[], Awaitable[str]]) -> str:
+    cached = _QREWRITE_CACHE.get(key)
+    if cached is not None:
+        _QREWRITE_CACHE.move_to_end(key)
+        return cached
+    text = await produce()
+    if text:
+        _QREWRITE_CACHE[key] = text
+        if len(_QREWRITE_CACHE) > _QREWRITE_MAXSIZE:
+            _QREWRITE_CACHE.popitem(last=False)
+    return text
+
+
+async def _call_tool_cached(mcp, tool_cache, name: str, args: Dict[str, Any]) -> Any:
+    """
+    MCP call_tool via ToolResultCache (TTL per tool, lihat config tool_cache_*).
+    Hasil isError dikembalikan apa adanya (seperti sebelumnya) tetapi tidak dicache.
+    """
+    cached = tool_cache.get(name, args)
+    if cached is not None:
+        return cached
+    try:
+        result = await mcp.call_tool(name, args, raise_on_error=True)
+    except MCPToolError as e:
+        return e.content
+    tool_cache.put(name, args, result)
+    return result
+
+
+def _require_mcp(app) -> Optional[Tuple[Response, int]]:
+    """Response 503 bila MCP belum terhubung; None bila siap."""
+    if not app.extensions["mcp_status"]["connected"]:
+        logger.warning("MCP belum terhubung.")
+        return response_error_toast(
+            status="error", message="MCP belum terhubung.", http_status=503
+        )
+    return None
+
 
 @chat_bp.post("/message")
 async def chat_message():
-    data = await request.get_json(force=True)
+    try:
+        data = loads_bytes(await request.get_data(cache=False))
+    except Exception:
+        logger.exception("Payload bukan JSON valid.")
+        data = None
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Payload harus JSON."}), 400
     user_id: str = data.get("user_id") or "default"
     user_message: str = data.get("message") or ""
 
@@ -26,208 +96,101 @@ async def chat_message():
     # ===============================================
     app = current_app
     mcp = app.extensions["mcp"]
-    llm = LLMChains(prefer="chat")
+    llm = app.extensions["llm_chains"]
     stm = app.extensions["short_term_memory"]
     ltm = app.extensions["long_term_memory"]
 
     service_configs = app.extensions["service_configs"]
-    memory = ChatWithMemory(
-        long_term=ltm, short_term=stm, service_configs=service_configs, max_history=5
-    )
+    memory = app.extensions["chat_ai"]
+    persist_queue = app.extensions["persist_queue"]
+    tool_cache = app.extensions["tool_cache"]
 
     # ===============================================
     # Handlers untuk tiap intent
     # ===============================================
     async def _h_kak(q, cls):
-        # Check status MCP
-        if not app.extensions["mcp_status"]["connected"]:
-            response: tuple[Response, int] = response_error_toast(
-                status="error", message="MCP belum terhubung.", http_status=503
-            )
-            return response
+        if mcp_error := _require_mcp(app):
+            return mcp_error
 
-        # 0) Ambil konteks retrieval dari MCP
-        context_search = await llm.chat_completions_text(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Hasilkan maksimal '300 text' query instruction untuk pencarian retrieval vectordb yang tepat berdasarkan informasi yang diberikan. output hanya text query tanpa penjelasan dan format apapun.",
-                },
-                {
-                    "role": "system",
-                    "content": f"Conversation History:\n{await stm.get_history(user_id, limit=5)}",
-                },
-                {
-                    "role": "system",
-                    "content": f"Relevan memory:\n{await ltm.get_memories_v2(query=q, user_id=user_id, limit=5)}",
-                },
-                {"role": "user", "content": q},
-            ]
+        # STM & LTM diambil paralel sekali; memories dipakai ulang di langkah 1
+        history, memories = await asyncio.gather(
+            stm.get_history(user_id, limit=5),
+            ltm.get_memories_v2(query=q, user_id=user_id, limit=5),
         )
 
-        retrieve = await mcp.call_tool(
-            "retrieval_tool", {"query": context_search, "k": 5}
+        # 0) Ambil konteks retrieval dari MCP
+        context_search = await _cached_rewrite(
+            _qrewrite_key("kak", q, history, memories),
+            lambda: llm.chat_completions_text(
+                messages=build_kak_query_rewrite_messages(q, history, memories)
+            ),
         )
 
-        # 1) Pesan awal
-        messages = [
-            {
-                "role": "system",
-                "content": "Anda adalah asisten yang membantu menjawab pertanyaan berdasarkan hasil analysis proyek. gunakan tools yang tersedia untuk mendapatkan informasi yang dibutuhkan.",
-            },
-            {"role": "system", "content": f"context dari MCP:\n{retrieve}"},
-            {
-                "role": "system",
-                "content": f"Relevan memory:\n{await ltm.get_memories_v2(query=q, user_id=user_id, limit=5)}",
-            },
-            {"role": "user", "content": q},
-        ]
-
-        # 2) Skema tools (format OpenAI Chat Completions)
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "read_kak_analysis_tool",
-                    "description": "Read KAK analysis.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "filename": {
-                                "type": "string",
-                                "description": "Nama project.",
-                            },
-                            "pelanggan": {
-                                "type": "string",
-                                "description": "Nama pelanggan.",
-                            },
-                            "project": {
-                                "type": "string",
-                                "description": "Nama project.",
-                            },
-                            "tahun": {
-                                "type": "string",
-                                "description": "Tahun project KAK (YYYY).",
-                            },
-                        },
-                        "required": ["filename", "pelanggan", "project", "tahun"],
-                        "additionalProperties": False,
-                    },
-                },
-            }
-        ]
-
-        # 3) Minta model melakukan function-call
-        tool_calls, _raw = await llm.chat_function_call(
-            messages=messages,
-            tools=tools,
-            tool_choice="auto",
+        retrieve = await _call_tool_cached(
+            mcp, tool_cache, "retrieval_tool", {"query": context_search, "k": 5}
         )
 
-        # 4) Eksekusi tool yang diminta model
-        if tool_calls:
-            # eksekutor fungsi
-            async def exec_tool(name: str, args: dict) -> dict:
-                kak_summaries = await mcp.call_tool(name, args)
-                return kak_summaries
-
-            # Jalankan semua panggilan tool dari model, lalu lampirkan kembali hasilnya sebagai pesan role="tool"
-            for call in tool_calls:
-                fname = call["name"]
-                fargs = call["arguments"]  # sudah berupa dict dari LLMChains
-                out = await exec_tool(fname, fargs)
-                # logger.info(f"Tool {fname} executed with args {fargs}, got: {out}")
-                messages.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": call["id"],
-                        "name": fname,
-                        "content": str(
-                            out
-                        ),  # string/JSON; OpenAI merekomendasikan string
-                    }
-                )
+        # 1-2) Pesan awal & skema tools (konstanta prompt_builder, dibangun sekali)
+        messages = build_kak_messages(q, retrieve, memories)
+
+        async def exec_tool(name: str, args: dict) -> Any:
+            # Error satu tool tidak menggagalkan tool lain yang berjalan paralel
+            try:
+                return await mcp.call_tool(name, args)
+            except Exception as e:
+                logger.warning("Tool %s gagal: %s", name, e)
+                return {"error": str(e)}
+
+        # 3-4) Function-call; semua tool_calls dieksekusi paralel (asyncio.gather,
+        #      argumen divalidasi terhadap skema) lalu dilampirkan sebagai role="tool"
+        messages, direct_text = await llm.chat_tool_round(
+            messages,
+            tools=KAK_TOOLS,
+            executor=exec_tool,
+            validators=KAK_TOOL_VALIDATORS,
+        )
+        if direct_text:
+            return direct_text
 
         # 5) (Opsional) Tambah instruksi kecil agar model merangkum hasil tool
-        messages.append(
-            {
-                "role": "user",
-                "content": "Gunakan hasil tool di atas lalu berikan jawaban final.",
-            }
-        )
+        messages.append(KAK_FINALIZE_MSG)
 
         # 6) Minta jawaban final dari model (tanpa tools)
         final_text = await llm.chat_completions_text(messages=messages)
-        
-        # Persist ke memori (best‑effort)
-        await ltm.add_memory_v2(
-            [
-                {"role": "user", "content": user_message},
-                {"role": "assistant", "content": str(final_text)},
-            ],
-            user_id=user_id,
-        )
-        
         return final_text
 
     async def _h_web(q, cls):
-        # Check status MCP
-        if not app.extensions["mcp_status"]["connected"]:
-            response: tuple[Response, int] = response_error_toast(
-                status="error", message="MCP belum terhubung.", http_status=503
-            )
-            return response
-
-        context_search = await llm.chat_completions_text(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Hasilkan maksimal '300 text' query instruction untuk pencarian web yang tepat berdasarkan informasi memory. output hanya text query tanpa penjelasan dan format apapun.",
-                },
-                {
-                    "role": "system",
-                    "content": f"Memory:\n{await stm.get_history(user_id, limit=5)}",
-                },
-                {"role": "user", "content": q},
-            ]
+        if mcp_error := _require_mcp(app):
+            return mcp_error
+
+        # STM (query-rewrite) & LTM (jawaban) diambil paralel
+        history, memories = await asyncio.gather(
+            stm.get_history(user_id, limit=5),
+            ltm.get_memories_v2(query=q, user_id=user_id, limit=5),
+        )
+        context_search = await _cached_rewrite(
+            _qrewrite_key("web", q, history),
+            lambda: llm.chat_completions_text(
+                messages=build_web_query_rewrite_messages(q, history)
+            ),
         )
-        search = await mcp.call_tool(
-            "websearch_tool", {"query": context_search, "max_results": 7}
+        search = await _call_tool_cached(
+            mcp,
+            tool_cache,
+            "websearch_tool",
+            {"query": context_search, "max_results": 7},
         )
         # logger.info(f"Websearch results: {search}")
         result = await llm.chat_completions_text(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Bertindak sebagai asisten yang membantu menjawab pertanyaan berdasarkan hasil pencarian. berikan informasi apapun yang dapat anda temukan beserta sumbernya.",
-                },
-                {"role": "assistant", "content": f"Hasil pencarian web:\n{search}"},
-                {
-                    "role": "system",
-                    "content": f"Relevan memory:\n{await ltm.get_memories_v2(query=q, user_id=user_id, limit=5)}",
-                },
-                {"role": "user", "content": q},
-            ]
-        )
-        # Persist ke memori (best‑effort)
-        await ltm.add_memory_v2(
-            [
-                {"role": "user", "content": user_message},
-                {"role": "assistant", "content": str(result)},
-            ],
-            user_id=user_id,
+            messages=build_web_answer_messages(q, search, memories)
         )
         return (
             result or "Maaf, saya tidak dapat menemukan informasi yang Anda butuhkan."
         )
 
     async def _h_proposal(q, cls):
-        # Check status MCP
-        if not app.extensions["mcp_status"]["connected"]:
-            response: tuple[Response, int] = response_error_toast(
-                status="error", message="MCP belum terhubung.", http_status=503
-            )
-            return response
+        if mcp_error := _require_mcp(app):
+            return mcp_error
 
         return response_success_with_toast(
             reply="Fitur belum tersedia penuh.",
@@ -237,48 +200,25 @@ async def chat_message():
         )
 
     async def _h_calc(q, cls):
-        # Check status MCP
-        if not app.extensions["mcp_status"]["connected"]:
-            response: tuple[Response, int] = response_error_toast(
-                status="error", message="MCP belum terhubung.", http_status=503
-            )
-            return response
-
-        retrieve_sizing = await mcp.call_tool(
-            "read_product_sizing_tool",
-            {
-                "filename": "internet_dedicated",
-                "category": "datacom",
-                "product": "internet_dedicated",
-                "tahun": "2025",
-            },
-        )
+        if mcp_error := _require_mcp(app):
+            return mcp_error
 
-        result = await llm.chat_completions_text(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Tugas anda adalah menghitung harga produk berdasarkan panduan yang tersedia. Berikan jawaban yang jelas dan ringkas. Jika ada asumsi yang anda buat, sebutkan secara eksplisit.",
-                },
-                {
-                    "role": "system",
-                    "content": f"Panduan menghitung harga:\n{retrieve_sizing}",
-                },
+        # Panduan pricing (MCP) & history (STM) independen → paralel
+        retrieve_sizing, history = await asyncio.gather(
+            mcp.call_tool(
+                "read_product_sizing_tool",
                 {
-                    "role": "system",
-                    "content": f"Conversation History:\n{await stm.get_history(user_id, limit=5)}",
+                    "filename": "internet_dedicated",
+                    "category": "datacom",
+                    "product": "internet_dedicated",
+                    "tahun": "2025",
                 },
-                {"role": "user", "content": q},
-            ]
+            ),
+            stm.get_history(user_id, limit=5),
         )
-        
-        # Persist ke memori (best‑effort)
-        await ltm.add_memory_v2(
-            [
-                {"role": "user", "content": user_message},
-                {"role": "assistant", "content": str(result)},
-            ],
-            user_id=user_id,
+
+        result = await llm.chat_completions_text(
+            messages=build_calc_messages(q, retrieve_sizing, history)
         )
         return (
             result or "Maaf, saya tidak dapat menemukan informasi yang Anda butuhkan."
@@ -286,14 +226,6 @@ async def chat_message():
 
     async def _h_other(q, cls):
         reply = await memory.chat(user_id=user_id, user_message=q)
-        # Persist ke memori (best‑effort)
-        await ltm.add_memory_v2(
-            [
-                {"role": "user", "content": user_message},
-                {"role": "assistant", "content": str(reply)},
-            ],
-            user_id=user_id,
-        )
         return reply
 
     # ===============================================
@@ -322,18 +254,8 @@ async def chat_message():
     # ===============================================
     # Persist ke memori (best‑effort)
     # ===============================================
-    try:
-        await stm.save(user_id, "user", user_message)
-        await stm.save(user_id, "assistant", str(reply))
-        await ltm.add_memory_v2(
-            [
-                {"role": "user", "content": user_message},
-                {"role": "assistant", "content": str(reply)},
-            ],
-            user_id=user_id,
-        )
-    except Exception:
-        logger.exception("Gagal menyimpan memori.")
+    # Background (persist_queue): response tidak menunggu tulis STM/LTM
+    persist_queue.submit(user_id, user_message, str(reply))
 
     # ===============================================
     # Bentuk response HTTP
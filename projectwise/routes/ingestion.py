@@ -243,6 +243,17 @@ async def proxy_check_status(job_id: str):
         # biarkan status lain apa adanya (mis. 'success')
         pass
 
+    # Dokumen baru masuk vector store → hasil retrieval lama tidak lagi valid
+    if status == "success":
+        tool_cache = current_app.extensions.get("tool_cache")
+        if tool_cache is not None:
+            tool_cache.invalidate("retrieval_tool")
+        # Semantic cache: (query, hasil retrieval) per user di namespace "kak:<user>".
+        # Jawaban KAK sendiri tidak pernah dicache (RequestCtx.reply_cacheable).
+        semantic_cache = current_app.extensions.get("semantic_cache")
+        if semantic_cache is not None:
+            semantic_cache.invalidate_prefix("kak:")
+
     return jsonify(
         {
             "status": status,
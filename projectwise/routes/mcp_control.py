@@ -6,6 +6,7 @@ from quart import Blueprint, current_app, jsonify
 
 from ..utils.logger import get_logger
 from ..services.mcp.client import MCPClient
+from ..services.mcp.adapter import bump_tools_version
 
 
 logger = get_logger(__name__)
@@ -37,6 +38,7 @@ async def connect():
                 client.__aenter__(), timeout=CONNECT_TIMEOUT_SECS
             )
             current_app.extensions["mcp"] = client
+            bump_tools_version(current_app)
             status.update({"connected": True})
             return jsonify({"status": "connected"})
         except asyncio.TimeoutError:
@@ -75,6 +77,7 @@ async def disconnect():
         await client.__aexit__(None, None, None)
     finally:
         current_app.extensions["mcp"] = None
+        bump_tools_version(current_app)
         current_app.extensions["mcp_status"].update(
             {"connected": False, "connecting": False, "error": None}
         )
@@ -0,0 +1,86 @@
+# projectwise/services/cache/embedding_cache.py
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional, Sequence
+
+from projectwise.utils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+EmbedFn = Callable[[str], Awaitable[Sequence[float]]]
+
+
+class _Entry(NamedTuple):
+    vec: List[float]
+    ts: float
+
+
+def _normalize_text(text: str) -> str:
+    """Normalisasi ringan untuk kunci exact-match (spasi & huruf besar/kecil)."""
+    return " ".join(text.casefold().split())
+
+
+class EmbeddingCache:
+    """
+    Cache embedding global per-app: SHA-256(teks ternormalisasi) → vektor, LRU (+TTL
+    opsional). Dipakai bersama oleh SemanticCache dan embedder Mem0 (model embedding
+    yang sama), sehingga teks identik hanya di-embed sekali ke provider.
+
+    Akses dilindungi threading.Lock karena embedder Mem0 dipanggil dari thread
+    (asyncio.to_thread); bagian kritisnya hanya operasi dict, tanpa I/O.
+    """
+
+    def __init__(self, *, max_entries: int = 4096, ttl_sec: float = 0.0) -> None:
+        self.max_entries = int(max_entries)
+        self.ttl_sec = float(ttl_sec)  # 0 = tidak kedaluwarsa (embedding deterministik)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(_normalize_text(text).encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self.key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl_sec and time.monotonic() - entry.ts > self.ttl_sec:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry.vec
+
+    def put(self, text: str, vec: Sequence[float]) -> List[float]:
+        vec = list(vec)
+        with self._lock:
+            self._entries[self.key(text)] = _Entry(vec, time.monotonic())
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vec
+
+    async def embed(self, text: str, provider: EmbedFn) -> List[float]:
+        """Embedding dari cache, atau dari provider (lalu disimpan) bila miss."""
+        vec = self.get(text)
+        if vec is not None:
+            return vec
+        return self.put(text, await provider(text))
+
+    def wrap_sync(self, embed: Callable[..., Any]) -> Callable[..., Any]:
+        """Bungkus embedder sinkron (mis. Mem0 `embedding_model.embed(text, action)`)."""
+
+        def _cached_embed(text: str, *args: Any, **kwargs: Any) -> Any:
+            if not isinstance(text, str):
+                return embed(text, *args, **kwargs)
+            vec = self.get(text)
+            if vec is not None:
+                return vec
+            return self.put(text, embed(text, *args, **kwargs))
+
+        return _cached_embed
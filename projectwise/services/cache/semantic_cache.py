@@ -0,0 +1,155 @@
+# projectwise/services/cache/semantic_cache.py
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from array import array
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from projectwise.utils.logger import get_logger
+from projectwise.services.cache.embedding_cache import EmbedFn, EmbeddingCache
+
+
+logger = get_logger(__name__)
+
+
+class _Entry(NamedTuple):
+    vec: array  # unit vector (float32)
+    reply: Any
+    ts: float
+
+
+def _unit(vec: Sequence[float]) -> Optional[array]:
+    norm = math.sqrt(math.sumprod(vec, vec))
+    if not norm:
+        return None
+    return array("f", (x / norm for x in vec))
+
+
+class SemanticCache:
+    """
+    Cache hasil berbasis kemiripan embedding, dinamespace (mis. user_id, atau
+    "kak:<user_id>" untuk hasil retrieval per handler).
+
+    - lookup(): embed teks (via EmbeddingCache bersama) lalu cari entri
+      dengan cosine similarity >= threshold di namespace tersebut.
+    - store(): simpan (embedding, payload) setelah pipeline penuh selesai.
+
+    Pencarian brute-force atas vektor unit (dot product via math.sumprod, C-level);
+    jumlah entri per user dibatasi (LRU) dan kedaluwarsa setelah ttl detik.
+    """
+
+    def __init__(
+        self,
+        embed: EmbedFn,
+        *,
+        threshold: float = 0.95,
+        ttl_sec: float = 900.0,
+        max_entries_per_user: int = 256,
+        embedding_cache: Optional[EmbeddingCache] = None,
+    ) -> None:
+        self._embed = embed
+        self.threshold = float(threshold)
+        self.ttl_sec = float(ttl_sec)
+        self.max_entries_per_user = int(max_entries_per_user)
+
+        self._entries: Dict[str, OrderedDict[str, _Entry]] = {}
+        self._embedding_cache = embedding_cache or EmbeddingCache()
+        self._pending: Set[asyncio.Task] = set()
+
+    # ---------- Embedding (cache exact-match bersama) ----------
+    async def _embedding_for(self, text: str) -> Tuple[str, Optional[array]]:
+        vec = await self._embedding_cache.embed(text, self._embed)
+        return EmbeddingCache.key(text), _unit(vec)
+
+    # ---------- API utama ----------
+    async def lookup(
+        self, user_id: str, text: str, *, threshold: Optional[float] = None
+    ) -> Any:
+        """Kembalikan payload tersimpan bila ada entri cukup mirip; None bila miss/gagal."""
+        bucket = self._entries.get(user_id)
+        if not bucket:
+            return None
+        try:
+            _key, vec = await self._embedding_for(text)
+        except Exception as e:
+            logger.warning("SemanticCache embed gagal (lookup dilewati): %s", e)
+            return None
+        if vec is None:
+            return None
+
+        now = time.monotonic()
+        best_key: Optional[str] = None
+        best_sim = self.threshold if threshold is None else threshold
+        # Tanpa await di bagian ini → atomik terhadap coroutine lain (tanpa lock)
+        for key, entry in list(bucket.items()):
+            if now - entry.ts > self.ttl_sec:
+                del bucket[key]
+                continue
+            sim = math.sumprod(vec, entry.vec)
+            if sim >= best_sim:
+                best_key, best_sim = key, sim
+        if best_key is None:
+            return None
+        bucket.move_to_end(best_key)
+        reply = bucket[best_key].reply
+
+        logger.info("SemanticCache hit | user=%s | sim=%.4f", user_id, best_sim)
+        return reply
+
+    async def store(self, user_id: str, text: str, reply: Any) -> None:
+        """Simpan pasangan (pertanyaan, payload) di namespace; gagal embed = no-op."""
+        try:
+            key, vec = await self._embedding_for(text)
+        except Exception as e:
+            logger.warning("SemanticCache embed gagal (store dilewati): %s", e)
+            return
+        if vec is None:
+            return
+
+        bucket = self._entries.setdefault(user_id, OrderedDict())
+        bucket[key] = _Entry(vec, reply, time.monotonic())
+        bucket.move_to_end(key)
+        while len(bucket) > self.max_entries_per_user:
+            bucket.popitem(last=False)
+
+    def store_later(self, user_id: str, text: str, reply: Any) -> None:
+        """store() di background agar embedding tidak menambah latensi response."""
+        task = asyncio.create_task(self.store(user_id, text, reply))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Hapus entri satu user (atau semua bila user_id None)."""
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Hapus semua namespace berawalan prefix (mis. "kak:"); kembalikan jumlahnya."""
+        stale = [ns for ns in self._entries if ns.startswith(prefix)]
+        for ns in stale:
+            del self._entries[ns]
+        return len(stale)
+
+
+def openai_embedder(client, model: str) -> EmbedFn:
+    """EmbedFn berbasis AsyncOpenAI.embeddings.create."""
+
+    async def _embed(text: str) -> List[float]:
+        resp = await client.embeddings.create(model=model, input=text)
+        return resp.data[0].embedding
+
+    return _embed
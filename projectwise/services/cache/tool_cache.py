@@ -0,0 +1,77 @@
+# projectwise/services/cache/tool_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+from projectwise.utils.logger import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class _Entry(NamedTuple):
+    tool: str
+    result: Any
+    expires_at: float
+
+
+class ToolResultCache:
+    """
+    Cache exact-match hasil MCP tool: kunci = SHA-256 dari (nama tool, args JSON
+    ter-sort), TTL per tool. Hanya tool yang terdaftar di `ttl_by_tool` yang dicache.
+
+    Pelengkap SemanticCache (kemiripan pertanyaan per user): cache ini lintas user
+    dan berlaku untuk query identik, mis. hasil template query yang sama.
+    """
+
+    def __init__(self, ttl_by_tool: Mapping[str, float], *, max_entries: int = 1024):
+        self.ttl_by_tool: Dict[str, float] = {
+            name: float(ttl) for name, ttl in ttl_by_tool.items() if ttl > 0
+        }
+        self.max_entries = int(max_entries)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+
+    @staticmethod
+    def _key(tool: str, args: Dict[str, Any]) -> str:
+        payload = json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(f"{tool}\x00{payload}".encode("utf-8")).hexdigest()
+
+    def cacheable(self, tool: str) -> bool:
+        return tool in self.ttl_by_tool
+
+    def get(self, tool: str, args: Dict[str, Any]) -> Optional[Any]:
+        """Hasil tersimpan bila ada & belum kedaluwarsa; None bila miss."""
+        if tool not in self.ttl_by_tool:
+            return None
+        key = self._key(tool, args)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        logger.info("ToolResultCache hit | tool=%s", tool)
+        return entry.result
+
+    def put(self, tool: str, args: Dict[str, Any], result: Any) -> None:
+        ttl = self.ttl_by_tool.get(tool)
+        if ttl is None:
+            return
+        key = self._key(tool, args)
+        self._entries[key] = _Entry(tool, result, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, tool: Optional[str] = None) -> None:
+        """Hapus entri satu tool (mis. retrieval_tool setelah ingestion) atau semua."""
+        if tool is None:
+            self._entries.clear()
+            return
+        for key in [k for k, e in self._entries.items() if e.tool == tool]:
+            del self._entries[key]
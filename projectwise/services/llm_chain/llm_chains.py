@@ -2,7 +2,21 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, List, Optional, Literal, Callable, Awaitable, Type, Tuple
+import hashlib
+import json
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+)
 from pydantic import BaseModel
 from openai import AsyncOpenAI
 from openai import (
@@ -14,7 +28,7 @@ from openai import (
     InternalServerError,
 )
 from projectwise.utils.logger import get_logger
-from projectwise.config import ServiceConfigs
+from projectwise.config import get_service_configs
 from .llm_utils import (
     ensure_responses_input,
     extract_assistant_text_chat,
@@ -23,10 +37,12 @@ from .llm_utils import (
     pydantic_parse,
     extract_tool_calls_chat,
     extract_tool_calls_responses,
+    serialize_tool_output,
+    tool_args_error,
 )
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
+settings = get_service_configs()
 Prefer = Literal["responses", "chat", "auto"]
 
 ToolExecutor = Callable[[str, Dict[str, Any]], Awaitable[Any]]
@@ -55,6 +71,8 @@ class LLMChains:
         self.tool_timeout = float(tool_timeout)
         self.tool_retries = int(tool_retries)
         self.client = client or AsyncOpenAI(base_url=llm_base_url, api_key=api_key)
+        # Single-flight: request identik yang sedang berjalan dipakai bersama
+        self._inflight: Dict[str, asyncio.Task] = {}
 
     # ====================================================
     # Helper low-level untuk panggil API OpenAI SDK
@@ -79,6 +97,42 @@ class LLMChains:
         json_schema: Optional[Dict[str, Any]] = None,
         max_tokens: Optional[int] = None,
     ) -> str:
+        """
+        Teks jawaban chat completion. Panggilan identik yang bersamaan digabung
+        (lihat _single_flight) — juga saat temperature > 0, sehingga pemanggil
+        tersebut menerima sampel yang sama, bukan sampel independen.
+        """
+        args = self._chat_text_args(messages, json_schema, max_tokens)
+        return await self._single_flight(args)
+
+    async def chat_completions_stream(
+        self,
+        messages: List[Dict[str, Any]],
+        *,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Versi streaming chat_completions_text: yield potongan teks (delta)
+        begitu diterima dari provider. Timeout hanya untuk membuka stream.
+        """
+        args = self._chat_text_args(messages, None, max_tokens)
+        stream = await self.chat_completions(**args, stream=True)
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            await stream.close()
+
+    def _chat_text_args(
+        self,
+        messages: List[Dict[str, Any]],
+        json_schema: Optional[Dict[str, Any]],
+        max_tokens: Optional[int],
+    ) -> Dict[str, Any]:
         args: Dict[str, Any] = {
             "model": self.model,
             "messages": messages,
@@ -95,8 +149,33 @@ class LLMChains:
                     "strict": True,
                 },
             }
-        resp = await self.chat_completions(**args)
-        return extract_assistant_text_chat(resp)
+        return args
+
+    async def _single_flight(self, args: Dict[str, Any]) -> str:
+        """
+        Gabungkan panggilan chat_completions_text yang identik dan bersamaan
+        (mis. prompt query-rewrite yang sama dari beberapa request) menjadi satu
+        request ke provider; semua pemanggil menerima hasil yang sama
+        (berlaku untuk semua temperature, bukan hanya 0).
+        """
+        key = hashlib.blake2b(
+            json.dumps(args, sort_keys=True, ensure_ascii=False, default=str).encode(),
+            digest_size=16,
+        ).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+
+            async def _run() -> str:
+                resp = await self.chat_completions(**args)
+                return extract_assistant_text_chat(resp)
+
+            task = asyncio.create_task(_run())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+            # Semua pemanggil batal → error task tak di-await jangan jadi warning asyncio
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        # shield: pembatalan satu pemanggil tidak membatalkan pemanggil lain
+        return await asyncio.shield(task)
 
     async def responses_text(
         self,
@@ -258,6 +337,55 @@ class LLMChains:
         tool_calls = extract_tool_calls_chat(resp)
         return tool_calls, resp
 
+    async def chat_tool_round(
+        self,
+        messages: List[Dict[str, Any]],
+        *,
+        tools: List[Dict[str, Any]],
+        executor: ToolExecutor,
+        tool_choice: Literal["auto", "none"] | Dict[str, Any] = "auto",
+        validators: Optional[Mapping[str, Any]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Satu putaran function-calling lengkap dalam satu await:
+        minta tool_calls → eksekusi semua tool secara paralel → lampirkan hasil.
+        Bila `validators` (lihat compile_tool_validators) diberikan, argumen yang
+        tidak sesuai skema tidak dieksekusi; pesan tool berisi error validasi.
+
+        Return (messages, direct_text):
+        - messages: salinan messages + pesan assistant (tool_calls) + pesan role="tool".
+        - direct_text: terisi bila model langsung menjawab tanpa tool, sehingga
+          pemanggil dapat melewati panggilan LLM final.
+        """
+        tool_calls, resp = await self.chat_function_call(
+            messages, tools=tools, tool_choice=tool_choice
+        )
+        messages = list(messages)
+        if not tool_calls:
+            return messages, (extract_assistant_text_chat(resp) or None)
+
+        # Pesan assistant berisi tool_calls wajib mendahului pesan role="tool"
+        messages.append(resp.choices[0].message.model_dump(exclude_none=True))
+
+        async def _run(call: Dict[str, Any]) -> Any:
+            if validators:
+                error = tool_args_error(validators, call["name"], call["arguments"])
+                if error is not None:
+                    return error
+            return await executor(call["name"], call["arguments"])
+
+        outputs = await asyncio.gather(*(_run(call) for call in tool_calls))
+        for call, out in zip(tool_calls, outputs):
+            messages.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": call["id"],
+                    "name": call["name"],
+                    "content": serialize_tool_output(out),
+                }
+            )
+        return messages, None
+
     async def responses_function_call(
         self,
         input_messages: List[Dict[str, Any]] | str,
@@ -2,8 +2,10 @@
 from __future__ import annotations
 
 import json
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 from pydantic import BaseModel
-from typing import Any, Dict, List, Optional, Type, TypeVar
+from typing import Any, Dict, List, Mapping, Optional, Type, TypeVar
 
 from projectwise.utils.logger import get_logger
 from projectwise.services.memory.long_term_memory import Mem0Manager
@@ -48,6 +50,79 @@ def short_str(obj: Any, n: int = 400) -> str:
     return s if len(s) <= n else s[: n - 3] + "..."
 
 
+# Batas ukuran output tool yang masuk prompt (token input ∝ ukuran → prefill/biaya)
+MAX_TOOL_BYTES = 8192
+_TRUNCATED_MARK = "…[truncated]"
+
+
+def _tool_json_default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(exclude_none=True)
+    return str(obj)
+
+
+def serialize_tool_output(out: Any, max_bytes: int = MAX_TOOL_BYTES) -> str:
+    """
+    Serialisasi hasil MCP tool untuk prompt LLM:
+    - list content MCP bertipe "text" → gabungan teksnya (tanpa repr objek);
+    - selain itu JSON (pydantic via model_dump, field None dibuang);
+    - dipotong ke max_bytes UTF-8 di batas karakter + penanda "…[truncated]".
+    """
+    if isinstance(out, str):
+        text = out
+    elif (
+        isinstance(out, list)
+        and out
+        and all(getattr(c, "type", None) == "text" for c in out)
+    ):
+        text = "\n".join(getattr(c, "text", "") or "" for c in out)
+    else:
+        try:
+            text = json.dumps(out, ensure_ascii=False, default=_tool_json_default)
+        except Exception:
+            text = str(out)
+
+    raw = text.encode("utf-8")
+    if len(raw) <= max_bytes:
+        return text
+    return raw[:max_bytes].decode("utf-8", errors="ignore") + _TRUNCATED_MARK
+
+
+# ---------------- Validasi argumen tool (JSON Schema) ----------------
+def compile_tool_validators(tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Validator jsonschema per nama tool dari skema `parameters` (format Chat
+    Completions). Skema dicek & validator dibangun sekali; panggil saat import.
+    """
+    validators: Dict[str, Any] = {}
+    for tool in tools:
+        fn = tool.get("function") or {}
+        schema = fn.get("parameters")
+        if not fn.get("name") or not schema:
+            continue
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        validators[fn["name"]] = cls(schema)
+    return validators
+
+
+def tool_args_error(
+    validators: Mapping[str, Any], name: str, args: Any
+) -> Optional[Dict[str, str]]:
+    """Dict error ringkas bila argumen tool tidak sesuai skema; None bila valid."""
+    validator = validators.get(name)
+    if validator is None:
+        return None
+    error = best_match(validator.iter_errors(args))
+    if error is None:
+        return None
+    logger.warning("Argumen tool '%s' tidak valid: %s", name, error.message)
+    return {
+        "status": "error",
+        "message": f"Argumen tool '{name}' tidak valid: {error.message}",
+    }
+
+
 def json_loads_safe(s: Optional[str]) -> Any:
     if not s:
         return {}
@@ -1,12 +1,44 @@
 # projectwise/services/mcp/adapter.py
 from __future__ import annotations
 
-from typing import Any, Dict, List, Callable, Awaitable
+import asyncio
+from typing import Any, Dict, List, Callable, Awaitable, Optional, Sequence, Set, Tuple
 from quart import Quart
 from projectwise.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Batas default panggilan MCP paralel bila service_configs tidak tersedia
+_DEFAULT_MAX_PARALLEL = 8
+
+
+def _topo_layers(n: int, dependencies: Sequence[Set[int]]) -> List[List[int]]:
+    """Kelompokkan index 0..n-1 menjadi layer; tiap layer hanya bergantung ke layer sebelumnya."""
+    remaining = {
+        i: set(dependencies[i]) if i < len(dependencies) else set() for i in range(n)
+    }
+    for i, deps in remaining.items():
+        bad = [d for d in deps if not 0 <= d < n or d == i]
+        if bad:
+            raise ValueError(f"Dependensi tidak valid untuk call[{i}]: {bad}")
+
+    layers: List[List[int]] = []
+    done: Set[int] = set()
+    while remaining:
+        ready = sorted(i for i, deps in remaining.items() if deps <= done)
+        if not ready:
+            raise ValueError(f"Siklus dependensi terdeteksi: {sorted(remaining)}")
+        layers.append(ready)
+        done.update(ready)
+        for i in ready:
+            del remaining[i]
+    return layers
+
+
+def bump_tools_version(app: Quart) -> None:
+    """Tandai daftar tools MCP berubah (connect/disconnect/reload) → cache katalog invalid."""
+    app.extensions["mcp_tools_version"] = app.extensions.get("mcp_tools_version", 0) + 1
+
 
 class MCPToolAdapter:
     """
@@ -31,6 +63,56 @@ class MCPToolAdapter:
         logger.info("Eksekusi MCP tool: %s | args=%s", name, args)
         return await client.call_tool(name, args or {})
 
+    def _call_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore per-app agar total panggilan MCP paralel tidak melebihi plafon server."""
+        sem = self.app.extensions.get("mcp_call_semaphore")
+        if sem is None:
+            cfg = self.app.extensions.get("service_configs")
+            limit = getattr(cfg, "max_concurrent_proccess", _DEFAULT_MAX_PARALLEL)
+            sem = asyncio.Semaphore(max(1, int(limit)))
+            self.app.extensions["mcp_call_semaphore"] = sem
+        return sem
+
+    # === PANGGIL BANYAK TOOL SEKALIGUS (PARALEL) ===
+    async def call_tools_parallel(
+        self,
+        calls: Sequence[Tuple[str, Dict[str, Any]]],
+        *,
+        dependencies: Optional[Sequence[Set[int]]] = None,
+        return_exceptions: bool = True,
+    ) -> List[Any]:
+        """
+        Eksekusi beberapa tool MCP secara konkuren; hasil berurutan sesuai `calls`.
+        - `dependencies[i]` = set index call yang harus selesai sebelum call ke-i.
+          Call tanpa dependensi dijalankan bersamaan (per layer topologis).
+        - Jumlah call yang berjalan bersamaan dibatasi semaphore per-app.
+        - `return_exceptions=True`: exception dikembalikan sebagai item hasil.
+        """
+        if not calls:
+            return []
+        client = await self._acquire_mcp()
+        sem = self._call_semaphore()
+
+        async def _one(i: int) -> Any:
+            name, args = calls[i]
+            async with sem:
+                logger.info("Eksekusi MCP tool (paralel): %s | args=%s", name, args)
+                return await client.call_tool(name, args or {})
+
+        layers = (
+            _topo_layers(len(calls), dependencies)
+            if dependencies
+            else [list(range(len(calls)))]
+        )
+        results: List[Any] = [None] * len(calls)
+        for layer in layers:
+            outs = await asyncio.gather(
+                *(_one(i) for i in layer), return_exceptions=return_exceptions
+            )
+            for i, out in zip(layer, outs):
+                results[i] = out
+        return results
+
     # === AMBIL TOOLS APA ADANYA DARI MCP ===
     async def get_tools(self) -> List[Dict[str, Any]]:
         client = await self._acquire_mcp()
@@ -38,6 +120,30 @@ class MCPToolAdapter:
         logger.info("MCP tool_cache terdeteksi: %d tool.", len(tools))
         return tools
 
+    @property
+    def tools_version(self) -> int:
+        return self.app.extensions.get("mcp_tools_version", 0)
+
+    # === TOOLS + TURUNANNYA (registry, katalog) DI-CACHE PER VERSI ===
+    async def get_tools_and_catalog(
+        self, build: Callable[[List[Dict[str, Any]]], Tuple[Any, ...]]
+    ) -> Tuple[Any, ...]:
+        """
+        Kembalikan `build(tools)` yang di-cache di app.extensions selama versi tools
+        sama dan list tool_cache MCP masih objek yang sama. Request berikutnya
+        memakai ulang objek yang identik (tools payload, registry, katalog).
+        """
+        tools = await self.get_tools()
+        version = self.tools_version
+        cached = self.app.extensions.get("mcp_tools_catalog")
+        if cached is not None and cached[0] == version and cached[1] is tools:
+            return cached[2]
+        # Normalisasi schema (CPU) di thread agar tidak menahan event loop
+        built = await asyncio.to_thread(build, tools)
+        self.app.extensions["mcp_tools_catalog"] = (version, tools, built)
+        logger.info("Katalog tools MCP dibangun ulang (versi %d).", version)
+        return built
+
     # === OPSIONAL: KONVERSI SHAPE KE OPENAI "tools" TANPA UBAH SCHEMA ===
     async def get_openai_tools(self) -> List[Dict[str, Any]]:
         """
@@ -6,19 +6,26 @@ from contextlib import AsyncExitStack, suppress
 from typing import Any, Dict, List, Optional
 
 from anyio import ClosedResourceError
-from dotenv import load_dotenv
 
 from projectwise.utils.logger import get_logger
-from projectwise.config import ServiceConfigs
+from projectwise.config import get_service_configs
 
 from openai import AsyncOpenAI
 from mcp import ClientSession, JSONRPCError
 from mcp.client.streamable_http import streamablehttp_client
 from jsonschema import validate, ValidationError
 
-load_dotenv()
 logger = get_logger(__name__)
-settings = ServiceConfigs()
+settings = get_service_configs()
+
+
+class MCPToolError(RuntimeError):
+    """Tool MCP mengembalikan CallToolResult.isError (gagal di sisi tool)."""
+
+    def __init__(self, tool: str, content: Any) -> None:
+        super().__init__(f"Tool MCP '{tool}' mengembalikan error.")
+        self.tool = tool
+        self.content = content
 
 
 class MCPClient:
@@ -416,7 +423,9 @@ class MCPClient:
             self._connected = False
 
     # ————— CALL TOOL —————
-    async def call_tool(self, name: str, args: Dict[str, Any]) -> Any:
+    async def call_tool(
+        self, name: str, args: Dict[str, Any], *, raise_on_error: bool = False
+    ) -> Any:
         """
         Memanggil tool pada MCP server dengan penanganan koneksi dan error:
 
@@ -426,6 +435,9 @@ class MCPClient:
         4. Jika ClosedResourceError (stream tertutup), tandai disconnected, reconnect, lalu retry sekali.
         5. Jika JSONRPCError, log error spesifik dan lempar kembali.
         6. Untuk error lain, log unexpected error, tandai disconnected, dan lempar exception.
+        7. raise_on_error=True: hasil tool dengan isError (error di sisi tool, koneksi
+           sehat) dilempar sebagai MCPToolError agar pemanggil (mis. cache) tidak
+           memperlakukannya sebagai sukses.
         """
         # Ensure connection
         if not self._connected or self.session is None:
@@ -433,15 +445,11 @@ class MCPClient:
         try:
             logger.info('call_tool "%s" args=%s', name, args)
             res = await self.session.call_tool(name, args)  # type: ignore
-            # raw: Any = res.content
-            return res.content
         except ClosedResourceError:
             logger.warning("Stream closed, triggering reconnect")
             self._connected = False
             await self._ensure_reconnected()
             res = await self.session.call_tool(name, args)  # type: ignore
-            # raw = res.content
-            return res.content
         except JSONRPCError as e:  # type: ignore
             logger.error("RPC error [%s]: %s", e.code, e.message)  # type: ignore
             raise
@@ -449,3 +457,8 @@ class MCPClient:
             logger.error("Unexpected call_tool error: %s", e, exc_info=True)
             self._connected = False
             raise
+
+        if raise_on_error and getattr(res, "isError", False):
+            logger.warning('call_tool "%s" mengembalikan isError', name)
+            raise MCPToolError(name, res.content)
+        return res.content
@@ -10,6 +10,7 @@ from collections import deque
 from mem0 import AsyncMemory
 from mem0.configs.base import MemoryConfig
 from .noop_memory import NoOpAsyncMemory
+from projectwise.services.cache.embedding_cache import EmbeddingCache
 from projectwise.utils.logger import get_logger
 from projectwise.services.workflow.prompt_instruction import DEFAULT_SYSTEM_PROMPT
 
@@ -57,11 +58,20 @@ def _extract_text_from_mem_item(item: Dict[str, Any]) -> Optional[str]:
 class Mem0Manager:
     """Wrapper asinkron untuk mem0 AsyncMemory agar lebih modular & defensif."""
 
-    def __init__(self, service_configs, config: Optional[Dict[str, Any]] = None):
+    def __init__(
+        self,
+        service_configs,
+        config: Optional[Dict[str, Any]] = None,
+        *,
+        embedding_cache: Optional[EmbeddingCache] = None,
+    ):
         self._service_configs = service_configs
         self._config = config or self._default_config()
         self._memory: Optional[AsyncMemory] = None
         self._init_lock = asyncio.Lock()
+        # Cache embedding bersama (SemanticCache): query search/add yang sama
+        # tidak di-embed ulang ke provider
+        self._embedding_cache = embedding_cache
 
         # ADD: status & resilience state
         self._ready: bool = False
@@ -314,6 +324,7 @@ class Mem0Manager:
             )
             try:
                 self._memory = AsyncMemory(config=self._default_config())
+                self._install_embedding_cache()
                 self._ready = True
                 self._degraded = False
                 self._last_error = None
@@ -335,6 +346,13 @@ class Mem0Manager:
                     self._last_error,
                 )
 
+    def _install_embedding_cache(self) -> None:
+        """Bungkus embedder Mem0 (sinkron, dipanggil via to_thread) dengan cache."""
+        embedder = getattr(self._memory, "embedding_model", None)
+        if self._embedding_cache is None or not hasattr(embedder, "embed"):
+            return
+        embedder.embed = self._embedding_cache.wrap_sync(embedder.embed)  # type: ignore
+
     # ADD: schedule flush pending jika belum berjalan
     def _schedule_flush(self) -> None:
         if self._flush_task and not self._flush_task.done():
@@ -0,0 +1,175 @@
+# projectwise/services/memory/persist_queue.py
+from __future__ import annotations
+
+import asyncio
+import weakref
+from typing import List, NamedTuple, Optional
+
+from projectwise.utils.logger import get_logger
+from projectwise.services.memory.long_term_memory import Mem0Manager
+from projectwise.services.memory.short_term_memory import ShortTermMemory
+
+
+logger = get_logger(__name__)
+
+
+class _PersistJob(NamedTuple):
+    user_id: str
+    user_text: str
+    reply: str
+    long_term: bool
+
+
+class MemoryPersistQueue:
+    """
+    Antrian in-process untuk persist STM/LTM di luar jalur response HTTP.
+
+    - submit(): non-blocking (put_nowait); bila antrian penuh, job dibuang dan
+      submit() mengembalikan False (pemanggil dapat memberi peringatan).
+    - STM: satu writer mengumpulkan hingga `batch_size` giliran (menunggu maks.
+      `linger_sec`) lalu menyimpannya dalam satu transaksi (ShortTermMemory.save_many).
+    - LTM: diteruskan ke worker pool; lock per user menjaga urutan tulis per user
+      tetap FIFO, sementara user berbeda diproses paralel.
+    - Error di writer/worker hanya dicatat (best-effort, sama seperti sebelumnya).
+    """
+
+    def __init__(
+        self,
+        *,
+        short_term: ShortTermMemory,
+        long_term: Mem0Manager,
+        workers: int = 4,
+        maxsize: int = 1000,
+        batch_size: int = 32,
+        linger_sec: float = 0.05,
+    ) -> None:
+        self.short_term = short_term
+        self.long_term = long_term
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.linger_sec = max(0.0, float(linger_sec))
+
+        self._queue: asyncio.Queue[_PersistJob] = asyncio.Queue(maxsize=maxsize)
+        self._ltm_queue: asyncio.Queue[_PersistJob] = asyncio.Queue(maxsize=maxsize)
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        self._tasks: List[asyncio.Task] = []
+
+    # ---------- Lifecycle ----------
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._stm_writer(), name="memory-persist-stm")]
+        self._tasks += [
+            asyncio.create_task(self._ltm_worker(), name=f"memory-persist-ltm-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(
+            "MemoryPersistQueue started | batch=%d | ltm_workers=%d",
+            self.batch_size,
+            self.workers,
+        )
+
+    async def aclose(self, timeout: Optional[float] = 10.0) -> None:
+        """Tunggu antrian kosong (maks. timeout detik), lalu hentikan worker."""
+        if not self._tasks:
+            return
+
+        async def _drain() -> None:
+            await self._queue.join()  # STM dulu: job LTM diteruskan dari sini
+            await self._ltm_queue.join()
+
+        try:
+            await asyncio.wait_for(_drain(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "MemoryPersistQueue: %d job belum tersimpan saat shutdown.",
+                self._queue.qsize() + self._ltm_queue.qsize(),
+            )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ---------- API utama ----------
+    def submit(
+        self, user_id: str, user_text: str, reply: str, *, long_term: bool = True
+    ) -> bool:
+        """Jadwalkan persist (STM, lalu LTM bila long_term=True) tanpa menunggu."""
+        try:
+            self._queue.put_nowait(_PersistJob(user_id, user_text, reply, long_term))
+        except asyncio.QueueFull:
+            logger.warning("MemoryPersistQueue penuh; persist dilewati | user=%s", user_id)
+            return False
+        return True
+
+    # ---------- STM: single writer, batch per transaksi ----------
+    async def _next_batch(self) -> List[_PersistJob]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.linger_sec
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _stm_writer(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.short_term.save_many(
+                    [(job.user_id, job.user_text, job.reply) for job in batch]
+                )
+                logger.info("STM batch persisted | turns=%d", len(batch))
+            except Exception:
+                logger.exception("Gagal menyimpan STM (batch=%d)", len(batch))
+            finally:
+                # LTM independen dari hasil STM; urutan FIFO tetap terjaga
+                for job in batch:
+                    if job.long_term:
+                        self._forward_ltm(job)
+                    self._queue.task_done()
+
+    # ---------- LTM: worker pool, lock per user ----------
+    def _forward_ltm(self, job: _PersistJob) -> None:
+        try:
+            self._ltm_queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.warning("Antrian LTM penuh; LTM dilewati | user=%s", job.user_id)
+
+    def _lock_for(self, user_id: str) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    async def _ltm_worker(self) -> None:
+        while True:
+            job = await self._ltm_queue.get()
+            try:
+                # get() + acquire tanpa yield di antaranya → urutan per user terjaga
+                async with self._lock_for(job.user_id):
+                    await self.long_term.add_memory_v2(
+                        [
+                            {"role": "user", "content": job.user_text},
+                            {"role": "assistant", "content": job.reply},
+                        ],
+                        user_id=job.user_id,
+                    )
+                logger.info("LTM persisted | user=%s", job.user_id)
+            except Exception:
+                logger.exception("Gagal menyimpan LTM | user=%s", job.user_id)
+            finally:
+                self._ltm_queue.task_done()
@@ -1,10 +1,20 @@
 # projectwise/services/memory/short_term_memory.py
 from __future__ import annotations
 
-from typing import Optional, List, Any, Dict
-
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func, select
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from typing import Optional, List, Any, Dict, Sequence, Tuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+    select,
+)
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -31,18 +41,36 @@ class Message(Base):
     timestamp = Column(DateTime, server_default=func.now())
 
 
+# History per user: WHERE user_id=? ORDER BY id DESC LIMIT n → index range scan
+ix_messages_user_id_id = Index("ix_messages_user_id_id", Message.user_id, Message.id.desc())
+
+
 class ShortTermMemory:
     """
     Menyimpan dan mengambil chat history jangka pendek.
     Menggunakan SQLAlchemy Async Engine untuk non-blocking DB access.
     """
 
-    def __init__(self, db_url: str, echo: bool = False, max_history: int = 20):
-        self.db_url = db_url
+    def __init__(
+        self,
+        db_url: Optional[str] = None,
+        echo: bool = False,
+        max_history: int = 20,
+        engine: Optional[AsyncEngine] = None,
+    ):
+        """
+        engine: AsyncEngine yang sudah ada (mis. milik ModelDB) agar satu pool
+        & PRAGMA dipakai bersama; bila None, engine dibuat dari db_url.
+        """
+        if engine is None and not db_url:
+            raise ValueError("ShortTermMemory butuh db_url atau engine.")
+        self.db_url = db_url or str(engine.url)  # type: ignore[union-attr]
         self.max_history = max_history
+        # Engine pinjaman (mis. milik ModelDB) di-dispose oleh pemiliknya
+        self._owns_engine = engine is None
 
         try:
-            self.engine = create_async_engine(db_url, echo=echo, future=True)
+            self.engine = engine or create_async_engine(db_url, echo=echo, future=True)  # type: ignore[arg-type]
             self.SessionLocal = sessionmaker(
                 bind=self.engine,  # type: ignore
                 class_=AsyncSession,
@@ -53,32 +81,70 @@ class ShortTermMemory:
             logger.error("Gagal inisialisasi database: %s", e)
             raise
 
+    async def aclose(self) -> None:
+        """Dispose engine bila dibuat sendiri (engine bersama tidak disentuh)."""
+        if self._owns_engine:
+            await self.engine.dispose()
+
     async def init_models(self):
         """Buat tabel jika belum ada."""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            # create_all melewati index untuk tabel yang sudah ada (DB lama)
+            await conn.run_sync(ix_messages_user_id_id.create, checkfirst=True)
 
     async def save(self, user_id: str, role: str, content: str) -> None:
         """Simpan pesan baru ke memory. Buat ChatSession jika belum ada."""
-        if role not in ("user", "assistant", "system"):
-            raise ValueError(f"Role tidak valid: {role}")
+        await self._save_rows([(user_id, role, content)])
+
+    async def save_turn(
+        self, user_id: str, user_msg: str, assistant_msg: str
+    ) -> None:
+        """Simpan satu giliran (user + assistant) dalam satu transaksi/commit."""
+        await self.save_many([(user_id, user_msg, assistant_msg)])
+
+    async def save_many(self, turns: Sequence[Tuple[str, str, str]]) -> None:
+        """
+        Simpan banyak giliran (user_id, user_msg, assistant_msg) — boleh lintas
+        user — dalam satu transaksi/commit (dipakai writer batch persist_queue).
+        """
+        rows: List[Tuple[str, str, str]] = []
+        for user_id, user_msg, assistant_msg in turns:
+            rows.append((user_id, "user", user_msg))
+            rows.append((user_id, "assistant", assistant_msg))
+        await self._save_rows(rows)
+
+    async def _save_rows(self, rows: List[Tuple[str, str, str]]) -> None:
+        if not rows:
+            return
+        for _user_id, role, _content in rows:
+            if role not in ("user", "assistant", "system"):
+                raise ValueError(f"Role tidak valid: {role}")
+        user_ids = list(dict.fromkeys(user_id for user_id, _r, _c in rows))
 
         async with self.SessionLocal() as session:  # type: ignore
             try:
-                # Pastikan session ada
+                # Pastikan session ada (satu SELECT ... IN untuk semua user di batch)
                 result = await session.execute(
-                    select(ChatSession).filter_by(user_id=user_id)
+                    select(ChatSession.user_id).where(ChatSession.user_id.in_(user_ids))
                 )
-                chat_session = result.scalars().first()
-                if not chat_session:
-                    session.add(ChatSession(user_id=user_id))
-                    await session.commit()
-
-                session.add(Message(user_id=user_id, role=role, content=content))
-                await session.commit()
+                existing = set(result.scalars().all())
+                missing = [uid for uid in user_ids if uid not in existing]
+                if missing:
+                    session.add_all(ChatSession(user_id=uid) for uid in missing)
+                    # flush (bukan commit): FK terlihat di transaksi yang sama
+                    await session.flush()
+
+                session.add_all(
+                    Message(user_id=user_id, role=role, content=content)
+                    for user_id, role, content in rows
+                )
+                await session.commit()  # satu commit/fsync untuk semua pesan
             except Exception as ex:
                 await session.rollback()
-                logger.error("Gagal simpan memory untuk user %s: %s", user_id, ex)
+                logger.error(
+                    "Gagal simpan memory untuk user %s: %s", ", ".join(user_ids), ex
+                )
                 raise
 
     async def get_history(
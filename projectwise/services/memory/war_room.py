@@ -7,11 +7,11 @@ from mem0 import AsyncMemory
 from mem0.configs.base import MemoryConfig, VectorStoreConfig, LlmConfig, EmbedderConfig
 
 from projectwise.services.llm_chain.llm_chains import LLMChains
-from projectwise.config import ServiceConfigs
+from projectwise.config import get_service_configs
 from projectwise.utils.logger import get_logger
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
+settings = get_service_configs()
 
 # Shared project context
 RUN_ID = "project-war-room"
@@ -216,6 +216,7 @@ class CollaborativeAgent:
     def __init__(self, run_id):
         self.run_id = run_id
         self.mem = mem
+        self.llm = LLMChains(prefer="chat")
 
     async def add_message(self, role, name, content):
         msg = {"role": role, "name": name, "content": content}
@@ -228,12 +229,11 @@ class CollaborativeAgent:
         context = "\n".join(
             f"- {m['memory']} (by {m.get('actor_id', 'Unknown')})" for m in memories
         )
-        client = LLMChains(prefer="chat")
         messages = [
             {"role": "system", "content": "You are a helpful project assistant."},
             {"role": "user", "content": f"Prompt: {prompt}\nContext:\n{context}"},
         ]
-        reply = await client.chat_completions_text(messages=messages)
+        reply = await self.llm.chat_completions_text(messages=messages)
         await self.add_message("assistant", "assistant", reply)
         return reply
 
@@ -0,0 +1,81 @@
+# projectwise/services/retrieval/query_synthesis.py
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Sequence
+
+
+# Batas panjang query retrieval/websearch (setara instruksi "maksimal 300 text")
+MAX_QUERY_CHARS = 300
+# Jumlah giliran user terakhir dari STM yang ikut membentuk query
+HISTORY_TURNS = 2
+# Pertanyaan lebih pendek dari ini dianggap ambigu → tetap lewat LLM
+MIN_QUERY_WORDS = 4
+
+# Token: kata + sambungan '.', '-', '/' (mis. "x.509", "cisco-9300", "tcp/ip")
+_TOKEN_RE = re.compile(r"\w+(?:[.\-/]\w+)*")
+
+_STOPWORDS = frozenset(
+    """
+    yang dan di ke dari untuk dengan pada adalah atau juga dalam akan sudah telah
+    bisa dapat apa apakah bagaimana berapa mohon tolong saya kami kita anda aku
+    jelaskan sebutkan berikan tampilkan tentang seperti oleh karena agar jika kalau
+    saja lebih sangat harus sebagai secara bahwa hal para ya dong sih nah
+    the a an of to in on for and or is are was were be been what how which who
+    please me my can could would should do does did about with
+    """.split()
+)
+
+# Kata ganti/rujukan: maknanya bergantung pada konteks percakapan
+_PRONOUNS = frozenset(
+    """
+    itu ini tersebut dia ia mereka beliau nya begitu sana situ
+    it this that these those they them he she its their
+    """.split()
+)
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.casefold())
+
+
+def contains_pronoun(q: str) -> bool:
+    """True bila pertanyaan memuat kata ganti yang merujuk ke konteks sebelumnya."""
+    return not _PRONOUNS.isdisjoint(_tokens(q))
+
+
+def needs_llm_rewrite(q: str) -> bool:
+    """Heuristik ambiguitas: pertanyaan sangat pendek atau berisi kata ganti."""
+    return len(q.split()) < MIN_QUERY_WORDS or contains_pronoun(q)
+
+
+def build_retrieval_query(
+    q: str,
+    history: Sequence[Dict[str, Any]],
+    *,
+    max_chars: int = MAX_QUERY_CHARS,
+) -> str:
+    """
+    Susun query retrieval secara deterministik (tanpa LLM):
+    `q` + pesan user dari HISTORY_TURNS giliran terakhir STM, lowercase,
+    tanpa stopword & duplikat, dipotong di batas kata ≤ max_chars.
+    """
+    recent_user = [
+        str(m.get("content") or "") for m in history if m.get("role") == "user"
+    ][-HISTORY_TURNS:]
+
+    seen: set[str] = set()
+    parts: List[str] = []
+    size = 0
+    # q lebih dulu agar tidak terpotong; history (terbaru dulu) sebagai pelengkap
+    for text in (q, *reversed(recent_user)):
+        for tok in _tokens(text):
+            if tok in _STOPWORDS or tok in seen:
+                continue
+            extra = len(tok) + (1 if parts else 0)
+            if size + extra > max_chars:
+                return " ".join(parts)
+            seen.add(tok)
+            parts.append(tok)
+            size += extra
+    return " ".join(parts) or q[:max_chars]
@@ -8,12 +8,11 @@ from projectwise.utils.logger import get_logger
 from projectwise.services.memory.long_term_memory import Mem0Manager
 from projectwise.services.memory.short_term_memory import ShortTermMemory
 from projectwise.services.llm_chain.llm_chains import LLMChains
-from projectwise.config import ServiceConfigs
+from projectwise.config import ServiceConfigs, get_service_configs
 
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
-LLM = LLMChains(prefer="chat")
+settings = get_service_configs()
 
 
 class ChatWithMemory:
@@ -46,6 +45,8 @@ class ChatWithMemory:
         )
         self.llm_model = llm_model or service_configs.llm_model
         self.max_history = max_history
+        # Satu LLMChains per instance, memakai client (pool HTTP) yang sama
+        self.chain = LLMChains(self.llm_model, prefer="chat", client=self.llm)
 
         logger.info(
             "ChatWithMemory initialized | model=%s | max_history=%d",
@@ -92,6 +93,8 @@ class ChatWithMemory:
         user_id: str,
         user_message: str,
         assistant_message: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        memories: Any = None,
     ) -> str:
         """
         Kirim pesan ke LLM dengan memanfaatkan STM & LTM.
@@ -102,6 +105,9 @@ class ChatWithMemory:
         4. Panggil LLM chat completions.
         5. Kembalikan balasan assistant.
 
+        history/memories: STM/LTM yang sudah diambil pemanggil (prefetch);
+        bila None diambil di sini.
+
         Return:
             string balasan dari LLM
         """
@@ -112,13 +118,15 @@ class ChatWithMemory:
         )
         # Siapkan messages Relevan Memory, history, user message, (opsional) assistant message
         # 1. Ambil LTM (mem0)
-        ltm = await self.long_term.get_memories_v2(
-            query=user_message, user_id=user_id, limit=5
-        )
-        # 2. Ambil STM (SQLite)
-        messages: List[Dict[str, Any]] = await self.short_term.get_history(
-            user_id, limit=5
-        )
+        ltm = memories
+        if ltm is None:
+            ltm = await self.long_term.get_memories_v2(
+                query=user_message, user_id=user_id, limit=5
+            )
+        # 2. Ambil STM (SQLite); disalin karena list di-mutasi di bawah
+        if history is None:
+            history = await self.short_term.get_history(user_id, limit=5)
+        messages: List[Dict[str, Any]] = list(history)
         # 3. Bentuk messages
         messages.insert(0, self._shape("system", f"Relevan memory:\n{ltm}"))
         # 4. User message
@@ -131,7 +139,7 @@ class ChatWithMemory:
 
         # Panggil LLM
         try:
-            resp = await LLM.chat_completions_text(messages=messages)
+            resp = await self.chain.chat_completions_text(messages=messages)
             assistant_reply = resp.strip() or "[Tidak ada respon]"
         except APIConnectionError:
             logger.error("LLM APIConnectionError.")
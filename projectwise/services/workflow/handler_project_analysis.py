@@ -17,7 +17,7 @@ import json
 from quart import Quart
 
 from projectwise.utils.logger import get_logger
-from projectwise.config import ServiceConfigs
+from projectwise.config import get_service_configs
 
 # Prompt policy
 from projectwise.services.workflow.prompt_instruction import (
@@ -47,7 +47,7 @@ from projectwise.services.llm_chain.llm_utils import (
 )
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
+settings = get_service_configs()
 
 
 # ============================= Tool helpers ============================= #
@@ -169,7 +169,6 @@ class ProjectAnalysisHandler:
             app,
             model=self.model,
             prefer=self.prefer,
-            max_history=max_history,
         )
 
     async def _seed_once(self, prompt: str) -> Tuple[str, Dict[str, Any]]:
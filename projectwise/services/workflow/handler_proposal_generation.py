@@ -1,12 +1,13 @@
 # projectwise/services/workflow/handler_proposal_generation.py
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple, Callable, Awaitable
 
 from quart import Quart
 
 from projectwise.utils.logger import get_logger
-from projectwise.config import ServiceConfigs
+from projectwise.config import get_service_configs
 
 # Prompt policy terpusat
 from .prompt_instruction import PROMPT_PROPOSAL_GUIDELINES
@@ -35,7 +36,7 @@ except Exception:  # tetap aman jika util belum ada
 
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
+settings = get_service_configs()
 
 
 # ============================= Tooling builder ============================= #
@@ -85,6 +86,7 @@ async def _prepare_tooling(
     return [], None
 
 
+@lru_cache(maxsize=16)
 def _build_system_prompt(extra_rules: Optional[str] = None) -> str:
     """System prompt untuk Proposal Generation (mengacu ke prompt terpusat)."""
     rules = "- Ikuti prosedur 1→4 dengan tertib."
@@ -262,7 +264,7 @@ async def run(
     """Entry‑point fungsional agar route bisa memanggil langsung tanpa membuat instance.
 
     Contoh di `routes/chat.py`:
-        client = type("C", (), {"llm": llm, "model": model})
+        client = SimpleNamespace(llm=llm, model=model)
         data = await handler_proposal_generation.run(
             client=client,
             project_name=project_name or "Untitled",
@@ -5,16 +5,20 @@ from typing import Optional, Tuple, Callable, Awaitable, Any, Literal
 from pydantic import BaseModel, Field
 
 from projectwise.utils.logger import get_logger
-from projectwise.config import ServiceConfigs
+from projectwise.config import get_service_configs
 from projectwise.services.llm_chain.llm_chains import LLMChains, Prefer
 from projectwise.services.workflow.prompt_instruction import (
     PROMPT_WORKFLOW_INTENT,
     FEW_SHOT_INTENT,
 )
+from projectwise.services.workflow.intent_fastpath import (
+    FASTPATH_MIN_CONFIDENCE,
+    predict_intent,
+)
 
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
+settings = get_service_configs()
 
 
 # ==========================================
@@ -37,6 +41,7 @@ class IntentResult(BaseModel):
 # ==========================================
 # Utils untuk membangun pesan klasifikasi
 # ==========================================
+_SYSTEM_MSG = {"role": "system", "content": PROMPT_WORKFLOW_INTENT()}
 _DEF_FEWSHOT = FEW_SHOT_INTENT()
 
 
@@ -47,11 +52,7 @@ def _build_messages(query: str) -> list[dict]:
     - few-shot: contoh tanya-jawab (pesan role user/assistant)
     - user: pesan query aktual
     """
-    msgs: list[dict] = []
-    msgs.append({"role": "system", "content": PROMPT_WORKFLOW_INTENT()})
-    msgs.extend(_DEF_FEWSHOT)
-    msgs.append({"role": "user", "content": query})
-    return msgs
+    return [_SYSTEM_MSG, *_DEF_FEWSHOT, {"role": "user", "content": query}]
 
 
 # ==========================================
@@ -144,14 +145,25 @@ async def route_based_on_intent(
     prefer: Prefer = "auto",
     model: Optional[str] = None,
     timeout: Optional[float] = None,
+    llm: Optional[LLMChains] = None,
+    fast_path: bool = True,
 ) -> Tuple[Any, IntentResult]:
-    # 1) Klasifikasi
-    cls = await classify_intent(
-        query,
-        prefer=prefer,
-        model=model,
-        timeout=timeout or 45.0,
-    )
+    # 1) Klasifikasi: rule fast-path (tanpa LLM) untuk kasus jelas, selain itu LLM
+    fast = predict_intent(query) if fast_path else None
+    if fast is not None and fast.confidence >= FASTPATH_MIN_CONFIDENCE:
+        cls = IntentResult(
+            intent=fast.intent,  # type: ignore[arg-type]
+            confidence=fast.confidence,
+            reasoning=f"fast-path rule: {fast.cue!r}",
+        )
+    else:
+        cls = await classify_intent(
+            query,
+            prefer=prefer,
+            model=model,
+            timeout=timeout or 45.0,
+            llm=llm,
+        )
 
     logger.info(
         "[intent] decision | %s %.2f thr=%.2f",
@@ -0,0 +1,98 @@
+# projectwise/services/workflow/intent_fastpath.py
+from __future__ import annotations
+
+import re
+from typing import Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+# Ambang minimal fast-path; rule dengan confidence di bawahnya hanya "petunjuk"
+# dan query tetap diklasifikasi oleh LLM
+FASTPATH_MIN_CONFIDENCE = 0.85
+
+
+class FastIntent(NamedTuple):
+    intent: str
+    confidence: float
+    cue: str  # potongan teks yang memicu rule (untuk log/reasoning)
+
+
+# ==========================================
+# Pola kata kunci per intent + confidence per pola (dikompilasi sekali saat import)
+# ==========================================
+_RULES: Dict[str, List[Tuple[Pattern[str], float]]] = {
+    "kak_analyzer": [
+        # "KAK"/"TOR" huruf besar = dokumen ("kak" kecil = sapaan, mis. "kak, tolong...")
+        (re.compile(r"\b(?:KAK|TOR)\b"), 0.90),
+        (re.compile(r"kerangka acuan|terms? of reference", re.I), 0.95),
+        # Kata kerja bebas huruf besar/kecil; "kak" wajib huruf besar (bukan sapaan)
+        (
+            re.compile(
+                r"(?i:\b(?:analisa|analisis|review|ringkas(?:an|kan)?|dokumen|isi))"
+                r"\s+(?:KAK|TOR|tor)\b"
+            ),
+            0.92,
+        ),
+    ],
+    "proposal_generation": [
+        # Hanya bentuk perintah; sekadar menyebut "proposal" diserahkan ke LLM
+        (
+            re.compile(
+                r"\b(?:buat(?:kan)?|bikin(?:kan)?|susun(?:kan)?|generate)\s+"
+                r"(?:(?:sebuah|dokumen|draft|draf)\s+)?proposal\b",
+                re.I,
+            ),
+            0.92,
+        ),
+        (re.compile(r"\bbuat(?:kan)?\s+(?:dokumen\s+)?penawaran\b", re.I), 0.88),
+    ],
+    "product_calculator": [
+        (
+            re.compile(
+                r"\b(?:estimasi|hitung(?:kan)?|kalkulasi|perhitungan|berapa)\b.*"
+                r"\b(?:biaya|harga|tarif)\b",
+                re.I,
+            ),
+            0.90,
+        ),
+        # Bandwidth saja belum tentu minta harga → di bawah ambang (LLM memutuskan)
+        (re.compile(r"\b\d+\s*(?:mbps|gbps)\b", re.I), 0.75),
+    ],
+    "web_search": [
+        (re.compile(r"\bdi\s+(?:internet|web|google)\b", re.I), 0.88),
+        (
+            re.compile(
+                r"\b(?:googling|browsing|berita\s+terbaru|search\s+web)\b", re.I
+            ),
+            0.86,
+        ),
+    ],
+}
+
+
+def _matches(query: str) -> List[FastIntent]:
+    """Match terkuat per intent (confidence tertinggi di antara polanya)."""
+    hits: List[FastIntent] = []
+    for intent, rules in _RULES.items():
+        best: Optional[FastIntent] = None
+        for pattern, confidence in rules:
+            if best is not None and best.confidence >= confidence:
+                continue
+            m = pattern.search(query)
+            if m:
+                best = FastIntent(intent, confidence, m.group(0))
+        if best is not None:
+            hits.append(best)
+    return hits
+
+
+def predict_intent(query: str) -> Optional[FastIntent]:
+    """
+    Klasifikasi intent tanpa LLM untuk kasus yang jelas (< 1 ms).
+
+    Mengembalikan FastIntent (confidence = confidence pola yang cocok) bila tepat
+    satu intent cocok; None bila tidak ada / lebih dari satu intent cocok (ambigu).
+    Pemanggil tetap memakai LLM bila confidence < FASTPATH_MIN_CONFIDENCE.
+    """
+    hits = _matches(query)
+    if len(hits) != 1:
+        return None
+    return hits[0]
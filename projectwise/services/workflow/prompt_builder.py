@@ -0,0 +1,186 @@
+# projectwise/services/workflow/prompt_builder.py
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from projectwise.services.llm_chain.llm_utils import (
+    compile_tool_validators,
+    serialize_tool_output,
+)
+
+
+Message = Dict[str, str]
+
+# ------------------------------------------------------------
+# Prompt sistem & skema tools statis (dibangun sekali saat import).
+# Dict ini hanya direferensikan dari list messages per-request dan tidak
+# pernah dimutasi (SDK OpenAI hanya membacanya untuk serialisasi).
+# ------------------------------------------------------------
+KAK_QUERY_REWRITE_MSG: Message = {
+    "role": "system",
+    "content": (
+        "Hasilkan maksimal '300 text' query instruction untuk pencarian retrieval "
+        "vectordb yang tepat berdasarkan informasi yang diberikan. "
+        "Output hanya text query tanpa penjelasan dan format apapun."
+    ),
+}
+KAK_SYSTEM_MSG: Message = {
+    "role": "system",
+    "content": (
+        "Anda adalah asisten yang membantu menjawab pertanyaan berdasarkan hasil analysis proyek. "
+        "Gunakan tools yang tersedia untuk mendapatkan informasi yang dibutuhkan."
+    ),
+}
+KAK_FINALIZE_MSG: Message = {
+    "role": "user",
+    "content": "Gunakan hasil tool di atas lalu berikan jawaban final.",
+}
+KAK_TOOLS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "read_kak_analysis_tool",
+            "description": "Read KAK analysis.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "filename": {
+                        "type": "string",
+                        "description": "Nama file KAK.",
+                    },
+                    "pelanggan": {
+                        "type": "string",
+                        "description": "Nama pelanggan.",
+                    },
+                    "project": {
+                        "type": "string",
+                        "description": "Nama project.",
+                    },
+                    "tahun": {
+                        "type": "string",
+                        "description": "Tahun project KAK (YYYY).",
+                    },
+                },
+                "required": ["filename", "pelanggan", "project", "tahun"],
+                "additionalProperties": False,
+            },
+        },
+    }
+]
+# Validator argumen tool KAK (skema di atas), dikompilasi sekali
+KAK_TOOL_VALIDATORS: Dict[str, Any] = compile_tool_validators(KAK_TOOLS)
+WEB_QUERY_REWRITE_MSG: Message = {
+    "role": "system",
+    "content": (
+        "Hasilkan maksimal '300 text' query instruction untuk pencarian web yang tepat "
+        "berdasarkan informasi memory. Output hanya text query tanpa penjelasan dan format apapun."
+    ),
+}
+# Web & kalkulator: instruksi + konteks digabung ke satu pesan system
+WEB_ANSWER_SYSTEM = (
+    "Bertindak sebagai asisten yang membantu menjawab pertanyaan berdasarkan hasil pencarian. "
+    "Berikan informasi apapun yang dapat Anda temukan beserta sumbernya."
+)
+CALC_SYSTEM = (
+    "Tugas Anda adalah menghitung harga produk berdasarkan panduan yang tersedia. "
+    "Berikan jawaban yang jelas dan ringkas. Jika ada asumsi yang Anda buat, sebutkan secara eksplisit."
+)
+
+# Label blok konteks (konstanta → tidak dibentuk ulang per request)
+_HISTORY_LABEL = "Conversation History:\n"
+_MEMORY_LABEL = "Relevan memory:\n"
+_WEB_MEMORY_LABEL = "Memory:\n"
+_MCP_CONTEXT_LABEL = "Context dari MCP:\n"
+_WEB_RESULTS_LABEL = "\n\nHasil pencarian web:\n"
+_CALC_GUIDE_LABEL = "\n\nPanduan menghitung harga:\n"
+_QUESTION_LABEL = "Pertanyaan: "
+_SECTION_SEP = "\n\n"
+
+
+# ==========================================
+# Helper blok konten
+# ==========================================
+def _block(role: str, label: str, body: Any) -> Message:
+    """Satu pesan = satu `"".join` (label konstan + isi), tanpa f-string berantai."""
+    return {"role": role, "content": "".join((label, str(body)))}
+
+
+def _user(q: str) -> Message:
+    return {"role": "user", "content": q}
+
+
+# ==========================================
+# Builder per handler (routes/chat.py)
+# ==========================================
+def build_kak_query_rewrite_messages(
+    q: str, history: Any, memories: Any
+) -> List[Message]:
+    return [
+        KAK_QUERY_REWRITE_MSG,
+        _block("system", _HISTORY_LABEL, history),
+        _block("system", _MEMORY_LABEL, memories),
+        _user(q),
+    ]
+
+
+def build_kak_messages(q: str, retrieve: Any, memories: Any) -> List[Message]:
+    """Pesan awal KAK: prompt sistem, konteks retrieval (MCP), memori, pertanyaan."""
+    return [
+        KAK_SYSTEM_MSG,
+        _block("system", _MCP_CONTEXT_LABEL, serialize_tool_output(retrieve)),
+        _block("system", _MEMORY_LABEL, memories),
+        _user(q),
+    ]
+
+
+def build_web_query_rewrite_messages(q: str, history: Any) -> List[Message]:
+    return [
+        WEB_QUERY_REWRITE_MSG,
+        _block("system", _WEB_MEMORY_LABEL, history),
+        _user(q),
+    ]
+
+
+def build_web_answer_messages(
+    q: str, search_results: Any, memories: Any
+) -> List[Message]:
+    """Dua pesan: system (instruksi + memori), user (pertanyaan + hasil pencarian)."""
+    return [
+        {
+            "role": "system",
+            "content": "".join(
+                (WEB_ANSWER_SYSTEM, _SECTION_SEP, _MEMORY_LABEL, str(memories))
+            ),
+        },
+        {
+            "role": "user",
+            "content": "".join(
+                (
+                    _QUESTION_LABEL,
+                    q,
+                    _WEB_RESULTS_LABEL,
+                    serialize_tool_output(search_results),
+                )
+            ),
+        },
+    ]
+
+
+def build_calc_messages(q: str, sizing: Any, history: Any) -> List[Message]:
+    """Dua pesan: system (instruksi + panduan harga + history), user (pertanyaan)."""
+    return [
+        {
+            "role": "system",
+            "content": "".join(
+                (
+                    CALC_SYSTEM,
+                    _CALC_GUIDE_LABEL,
+                    serialize_tool_output(sizing),
+                    _SECTION_SEP,
+                    _HISTORY_LABEL,
+                    str(history),
+                )
+            ),
+        },
+        _user(q),
+    ]
@@ -6,6 +6,9 @@ Satu-satunya sumber "policy/prompt" yang boleh di-import modul lain.
 Pastikan modul lain TIDAK menulis prompt hardcode; selalu import dari sini.
 """
 
+from functools import lru_cache
+
+# Semua prompt di bawah konstan → fungsi str di-cache (dibangun sekali per proses)
 DEFAULT_SYSTEM_PROMPT = (
     'Anda adalah "ProjectWise", asisten Presales & Project Manager.\n'
     "- Gunakan bahasa Indonesia profesional dan berbasis analisis.\n"
@@ -17,6 +20,7 @@ DEFAULT_SYSTEM_PROMPT = (
 
 
 # ——— Peran untuk skema Reflection (Actor/Critic) ———
+@lru_cache(maxsize=1)
 def ACTOR_SYSTEM() -> str:
     return (
         DEFAULT_SYSTEM_PROMPT + "\n# PERAN: ACTOR\n"
@@ -26,6 +30,7 @@ def ACTOR_SYSTEM() -> str:
     )
 
 
+@lru_cache(maxsize=1)
 def CRITIC_SYSTEM() -> str:
     return (
         DEFAULT_SYSTEM_PROMPT + "\n# PERAN: CRITIC\n"
@@ -35,6 +40,7 @@ def CRITIC_SYSTEM() -> str:
 
 
 # ——— Proposal ———
+@lru_cache(maxsize=1)
 def PROMPT_PROPOSAL_GUIDELINES() -> str:
     return (
         DEFAULT_SYSTEM_PROMPT + "\n# TUGAS: SUSUN FILE PROPOSAL .DOCX DARI TEMPLATE\n"
@@ -55,6 +61,7 @@ def PROMPT_PROPOSAL_GUIDELINES() -> str:
 
 
 # ——— KAK Analyzer ———
+@lru_cache(maxsize=1)
 def PROMPT_KAK_ANALYZER() -> str:
     return (
         DEFAULT_SYSTEM_PROMPT + "\n# TUGAS: ANALISIS KAK/TOR\n"
@@ -63,6 +70,7 @@ def PROMPT_KAK_ANALYZER() -> str:
 
 
 # ——— Product Calculator ———
+@lru_cache(maxsize=1)
 def PROMPT_PRODUCT_CALCULATOR() -> str:
     return (
         DEFAULT_SYSTEM_PROMPT + "\n# TUGAS: KALKULASI BIAYA LAYANAN\n"
@@ -73,11 +81,13 @@ def PROMPT_PRODUCT_CALCULATOR() -> str:
 
 
 # ——— Summary ———
+@lru_cache(maxsize=1)
 def PROMPT_SUMMARY_GUIDELINES() -> str:
     return DEFAULT_SYSTEM_PROMPT + "\n# TUGAS: RINGKASAN DOKUMEN (bullet/poin inti)."
 
 
 # ——— Intent Classifier ———
+@lru_cache(maxsize=1)
 def PROMPT_WORKFLOW_INTENT() -> str:
     return (
         DEFAULT_SYSTEM_PROMPT + "\n# KLASIFIKASI INTENT\n"
@@ -124,6 +134,7 @@ def FEW_SHOT_INTENT():
 
 
 # ——— War Room ———
+@lru_cache(maxsize=1)
 def PROMPT_WAR_ROOM() -> str:
     return (
         DEFAULT_SYSTEM_PROMPT + "\n# MODE: WAR ROOM\n"
@@ -133,6 +144,7 @@ def PROMPT_WAR_ROOM() -> str:
     )
 
 
+@lru_cache(maxsize=1)
 def PROMPT_USER_CONTEXT_ROOM() -> str:
     return (
         "# MODE: Analyst Context\n"
@@ -145,6 +157,7 @@ def PROMPT_USER_CONTEXT_ROOM() -> str:
     )
 
 
+@lru_cache(maxsize=1)
 def PROMPT_USER_CONTEXT() -> str:
     return (
         "# MODE: Project Analysis — Memory Briefing\n"
@@ -11,13 +11,13 @@ from quart import current_app
 
 from projectwise.services.llm_chain.llm_chains import LLMChains, Prefer
 
-from projectwise.config import ServiceConfigs
+from projectwise.config import get_service_configs
 from projectwise.utils.logger import get_logger
 from projectwise.services.mcp.adapter import MCPToolAdapter
 
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
+settings = get_service_configs()
 
 
 # ===============================================
@@ -172,6 +172,39 @@ class ReflectionActor:
         )  # diasumsikan adapter memegang koneksi
         self.prefer = prefer
 
+    # ---------- Factory per-app (dipakai ulang antar request) ----------
+    @classmethod
+    def from_quart_app(
+        cls,
+        app,
+        *,
+        model: Optional[str] = None,
+        prefer: Prefer = "auto",
+        temperature: Optional[float] = None,
+        request_timeout: float = 90.0,
+    ) -> "ReflectionActor":
+        """
+        Ambil instance dari `app.extensions["actors"]` (dibuat sekali per konfigurasi)
+        dengan LLMChains di atas shared OpenAI client. Aman dipakai ulang: state
+        per-request (user_id, messages) hanya hidup di argumen/variabel lokal.
+        """
+        model = model or settings.llm_model
+        temperature = settings.llm_temperature if temperature is None else temperature
+        key = f"reflection:{model}:{prefer}:{temperature}:{request_timeout}"
+
+        actors: Dict[str, Any] = app.extensions.setdefault("actors", {})
+        actor = actors.get(key)
+        if actor is None:
+            llm = LLMChains(
+                model=model,
+                prefer=prefer,
+                client=app.extensions.get("openai_client"),
+                temperature=temperature,
+                request_timeout=request_timeout,
+            )
+            actor = actors[key] = cls(llm=llm, mcp=MCPToolAdapter(app), prefer=prefer)
+        return actor
+
     # ===============================================
     # Util internal — MCP tools & panggilan
     # ===============================================
@@ -10,11 +10,11 @@ from quart import current_app
 
 from projectwise.services.llm_chain.llm_chains import LLMChains, Prefer
 from projectwise.services.mcp.adapter import MCPToolAdapter
-from projectwise.config import ServiceConfigs
+from projectwise.config import get_service_configs
 from projectwise.utils.logger import get_logger
 
 logger = get_logger(__name__)
-settings = ServiceConfigs()
+settings = get_service_configs()
 
 
 # ---------- Data Models ----------
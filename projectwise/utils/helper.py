@@ -3,25 +3,36 @@ from __future__ import annotations
 
 import json
 import tiktoken
+from functools import lru_cache
 from typing import Any
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from quart import jsonify
 
 
+@lru_cache(maxsize=8)
+def _encoding_for(model: str) -> tiktoken.Encoding:
+    """Encoding tiktoken per model (fallback cl100k_base bila tidak dikenali)."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return tiktoken.get_encoding("cl100k_base")
+
+
 def truncate_by_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
     """
     Potong teks berdasarkan jumlah token agar aman untuk dimasukkan ke prompt.
     Fallback encoding: cl100k_base bila model tidak dikenali tiktoken.
     """
-    try:
-        enc = tiktoken.encoding_for_model(model)
-    except Exception:
-        enc = tiktoken.get_encoding("cl100k_base")
+    text = text or ""
+    # BPE byte-level: jumlah token <= jumlah byte UTF-8 → pasti muat, tanpa tokenisasi
+    if len(text) <= max_tokens and len(text.encode("utf-8")) <= max_tokens:
+        return text
 
-    tokens = enc.encode(text or "")
+    enc = _encoding_for(model)
+    tokens = enc.encode(text)
     if len(tokens) <= max_tokens:
-        return text or ""
+        return text
 
     return enc.decode(tokens[:max_tokens])
 
@@ -0,0 +1,63 @@
+# projectwise/utils/json_provider.py
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from quart import Quart
+
+# JSON cepat (opsional): orjson bila tersedia, fallback ke provider bawaan
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """JSON ringkas sebagai bytes (orjson bila ada) untuk body response."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads_bytes(data: bytes | str) -> Any:
+    """Parse JSON dari body mentah (orjson bila ada) tanpa lewat request.get_json."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def install_orjson_provider(app: Quart) -> None:
+    """
+    Ganti ``app.json`` dengan provider berbasis orjson (jsonify, websocket JSON,
+    request.get_json).
+
+    Provider dibangun di atas provider aktif (mis. milik QuartSchema), sehingga
+    ``default()`` untuk pydantic/dataclass/datetime tetap dipakai: orjson diminta
+    meneruskan datetime & dataclass ke ``default`` agar format output tidak berubah.
+    Output terformat (indent, mode debug) tetap lewat provider asal.
+    """
+    if orjson is None:
+        return
+
+    base = type(app.json)
+    passthrough = (
+        orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_NON_STR_KEYS
+    )
+
+    class OrjsonProvider(base):  # type: ignore[misc, valid-type]
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            if kwargs.get("indent") is not None:
+                return super().dumps(obj, **kwargs)
+            sort_keys = getattr(self, "sort_keys", False)
+            option = passthrough | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+
+        def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
@@ -21,6 +21,7 @@ import sys
 import threading
 import time
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Callable
 
@@ -37,7 +38,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 # ==========
-# ENV loader
+# Project root
 # ==========
 def _detect_project_root() -> Path:
     """
@@ -57,32 +58,6 @@ def _detect_project_root() -> Path:
     return here.parents[2] if len(here.parents) >= 3 else here.parent
 
 
-def _load_env_from_project_root_once() -> None:
-    """
-    Muat .env dari akar proyek → os.environ (jika ada).
-    Tidak menimpa variabel yang sudah ada.
-    """
-    # sentinel sederhana agar hanya sekali
-    if getattr(_load_env_from_project_root_once, "_done", False):
-        return
-
-    root = _detect_project_root()
-    env_path = root / ".env"
-    if env_path.exists():
-        try:
-            for line in env_path.read_text(encoding="utf-8").splitlines():
-                s = line.strip()
-                if not s or s.startswith("#") or "=" not in s:
-                    continue
-                k, v = s.split("=", 1)
-                key = k.strip()
-                val = v.strip().strip("'").strip('"')
-                os.environ.setdefault(key, val)
-        except Exception:
-            pass
-    _load_env_from_project_root_once._done = True  # type: ignore[attr-defined]
-
-
 # ==========
 # Settings
 # ==========
@@ -107,7 +82,7 @@ class ProjectwiseLogSettings(BaseSettings):
     model_config = SettingsConfigDict(
         env_prefix="LOG_",
         extra="ignore",
-        env_file=".env",  # fallback; kita juga muat manual dari project root
+        env_file=".env",  # default CWD; _base_settings memakai .env di project root
         env_file_encoding="utf-8",
     )
 
@@ -125,9 +100,11 @@ class ProjectwiseLogSettings(BaseSettings):
     socket_port: int = 9020
 
 
+@lru_cache(maxsize=1)
 def _base_settings() -> ProjectwiseLogSettings:
-    _load_env_from_project_root_once()
-    return ProjectwiseLogSettings()
+    """ENV/.env cukup diparse sekali; get_logger dipanggil di banyak modul.
+    .env project root dibaca pydantic-settings (tanpa menulis ke os.environ)."""
+    return ProjectwiseLogSettings(_env_file=_detect_project_root() / ".env")
 
 
 def _overlay_with_quart(s: ProjectwiseLogSettings) -> ProjectwiseLogSettings:
@@ -173,6 +150,12 @@ def _to_level(level: str) -> int:
     return getattr(logging, str(level).upper(), logging.INFO)
 
 
+@lru_cache(maxsize=8)
+def _formatter(fmt: str, datefmt: str) -> logging.Formatter:
+    """Satu instance Formatter per (format, datefmt), dipakai bersama semua handler."""
+    return logging.Formatter(fmt=fmt, datefmt=datefmt)
+
+
 def _monthly_dir_factory_for(s: ProjectwiseLogSettings) -> Callable[[datetime], Path]:
     """
     Kembalikan fungsi factory direktori bulanan sesuai settings s.
@@ -325,7 +308,7 @@ def get_logger(name: str) -> logging.Logger:
         if name in _inited_loggers and logger.handlers:
             return logger
 
-        formatter = logging.Formatter(fmt=s.format, datefmt=s.datefmt)
+        formatter = _formatter(s.format, s.datefmt)
 
         if mode == "stdout":
             ch = logging.StreamHandler(sys.stdout)